@@ -1,16 +1,32 @@
 #!/usr/bin/env python
 #import pyximport
 #pyximport.install()
+import importlib
 
-from .tokenizer import Tokenizer
-from .embedding import Embedding
-from .vocab import Vocab
-from .translate import Translate
-from .tfidf import TFIDF
-from .vectfidf import VecTFIDF
-from .synonyms import Synonyms
-from .annoysearch import AnnoySearch
-from .acorasearch import AcoraSearch
-from .ner import NER
+# public names are resolved lazily, importing one name will not import the heavy dependencies of the others
+_modules = {"Tokenizer": ".tokenizer",
+            "Embedding": ".embedding",
+            "AsyncEmbedding": ".asyncembedding",
+            "Vocab": ".vocab",
+            "HashVocab": ".hashvocab",
+            "Translate": ".translate",
+            "TFIDF": ".tfidf",
+            "VecTFIDF": ".vectfidf",
+            "Synonyms": ".synonyms",
+            "AnnoySearch": ".annoysearch",
+            "AcoraSearch": ".acorasearch",
+            "NER": ".ner"}
 
-__all__ = ["Tokenizer", 'Embedding', 'Vocab', 'TFIDF', 'VecTFIDF', 'Synonyms', 'AnnoySearch', 'AcoraSearch', 'Translate', 'NER']
+__all__ = ["Tokenizer", 'Embedding', 'AsyncEmbedding', 'Vocab', 'HashVocab', 'TFIDF', 'VecTFIDF', 'Synonyms', 'AnnoySearch', 'AcoraSearch', 'Translate', 'NER']
+
+
+def __getattr__(name):
+    if name in _modules:
+        value = getattr(importlib.import_module(_modules[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -60,8 +60,13 @@ class AnnoySearch:
                 - list, format like [(keyword, location), ...] 
 
         '''
+        sentence_offsets = None
         if isinstance(sentence, str):
-            sentence_seg = self.tokenizer.seg(sentence, remove_stopwords=remove_stopwords)['tokens']
+            if location and self.tokenizer.support_offsets:
+                infos = self.tokenizer.seg(sentence, remove_stopwords=remove_stopwords, offsets=True)
+                sentence_seg, sentence_offsets = infos['tokens'], infos['offsets']
+            else:
+                sentence_seg = self.tokenizer.seg(sentence, remove_stopwords=remove_stopwords)['tokens']
         else:
             sentence_seg = sentence
         match = []
@@ -71,7 +76,9 @@ class AnnoySearch:
             if similarity < self.annoy_filter:
                 continue
             if location:
-                if isinstance(sentence, str):
+                if sentence_offsets is not None:
+                    loc = sentence_offsets[i][0]
+                elif isinstance(sentence, str):
                     loc = sentence.index(s)
                 else:
                     loc = i
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+    Author: Pengjia Zhu (zhupengjia@gmail.com)
+    asyncio clients of word2vec wrapper
+'''
+
+import asyncio, threading
+import numpy as np
+from .embedding import Embedding_Redis, Embedding_Dynamodb, Embedding_Rest
+
+
+class AsyncEmbedding_Base(object):
+    '''
+        Parent class for asyncio embedding clients, used together with an embedding class, please don't use this class directly.
+
+        The words not in cache are read in chunks of *fetch_size*, at most *max_concurrency* requests are in flight, and each request is cancelled after *timeout* seconds. If a word is already being read by another coroutine, the lookup waits for that request instead of sending a new one. The requests run in their own task, cancelling one caller doesn't cancel the requests other callers are waiting for.
+
+        Input:
+            - max_concurrency: int, max number of requests in flight, default is 10
+            - timeout: float, timeout of each request in seconds, default is 30
+            - fetch_size: int, max number of words in each request, default is 100
+            - any parameters mentioned in the embedding class
+
+        Usage:
+            - await emb_ins.aget(word): return the vector or BASE64 format vector
+            - await emb_ins.aget_many(words): return 2d array of vectors, or list of BASE64 format vectors
+            - await emb_ins.aclose(): close the connections
+    '''
+    def __init__(self, max_concurrency=10, timeout=30, fetch_size=100, **args):
+        super().__init__(**args)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.fetch_size = fetch_size
+        self._inflight = {}
+        self._tasks = set()
+        self._semaphore = None
+
+
+    async def aget(self, word):
+        '''
+            Get vector of word
+
+            Input:
+                - word: string
+
+            Output:
+                - 1d numpy array, or BASE64 string if *base64* is True
+        '''
+        return (await self.aget_many([word]))[0]
+
+
+    async def aget_many(self, words):
+        '''
+            Get vectors for a list of words
+
+            Input:
+                - words: list of string
+
+            Output:
+                - 2d numpy array with shape (len(words), dim), or list of BASE64 strings if *base64* is True
+        '''
+        uniq = list(dict.fromkeys(words))
+        vectors, waiting, missing = {}, {}, []
+        for w in uniq:
+            v = self.cached_vec.get(w)
+            if v is not None:
+                vectors[w] = v
+            elif w in self._inflight:
+                waiting[w] = self._inflight[w]
+            else:
+                missing.append(w)
+        if len(missing) > 0:
+            loop = asyncio.get_running_loop()
+            futures = {w:loop.create_future() for w in missing}
+            for f in futures.values():
+                # the error is raised to the caller, mark it retrieved for the futures nobody waits
+                f.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight.update(futures)
+            task = loop.create_task(self._afetch_fill(missing, futures))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            waiting.update(futures)
+        for w, f in waiting.items():
+            vectors[w] = await asyncio.shield(f)
+        vectors = [vectors[w] for w in words]
+        if self.base64:
+            return vectors
+        if len(vectors) < 1:
+            return np.zeros((0, self.dim))
+        return np.stack(vectors)
+
+
+    async def _afetch_fill(self, words, futures):
+        '''
+            read words in a task owning the shared futures, the results are kept in cache and set to futures
+        '''
+        try:
+            for w, v in zip(words, self._fill_many(words, await self._afetch_all(words))):
+                futures[w].set_result(v)
+        except BaseException as err:
+            for f in futures.values():
+                if f.done():
+                    continue
+                if isinstance(err, asyncio.CancelledError):
+                    f.cancel()
+                else:
+                    f.set_exception(err)
+            if isinstance(err, asyncio.CancelledError):
+                raise
+        finally:
+            for w in words:
+                self._inflight.pop(w, None)
+
+
+    async def _afetch_all(self, words):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(chunk):
+            async with self._semaphore:
+                return await asyncio.wait_for(self._afetch(chunk), self.timeout)
+
+        chunks = [words[i:i+self.fetch_size] for i in range(0, len(words), self.fetch_size)]
+        tasks = [asyncio.ensure_future(fetch(c)) for c in chunks]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather doesn't cancel the other requests when one fails or times out
+            for t in tasks:
+                t.cancel()
+            raise
+        return [v for r in results for v in r]
+
+
+    async def _afetch(self, words):
+        '''
+            read vectors of distinct words from data source, default is the bulk read of embedding class in a thread
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._get_many, words)
+
+
+    async def aclose(self):
+        '''
+            close the connections
+        '''
+        pass
+
+
+class AsyncEmbedding_Redis(AsyncEmbedding_Base, Embedding_Redis):
+    '''
+        Read the word vectors from redis with redis.asyncio, each request is one MGET
+
+        Input:
+            - redis_host: redis host
+            - redis port: redis port
+            - redis_db: database in redis
+            - pool_size: int, max connections to redis, default is 10
+            - any parameters mentioned in AsyncEmbedding_Base and Embedding_Redis
+    '''
+    def __init__(self, redis_host, redis_port, redis_db, pool_size=10, fetch_size=1000, **args):
+        import redis.asyncio
+        super().__init__(redis_host=redis_host, redis_port=redis_port, redis_db=redis_db, fetch_size=fetch_size, **args)
+        self.aredis_ins = redis.asyncio.Redis(connection_pool=redis.asyncio.ConnectionPool(host=redis_host, port=redis_port, db=redis_db, max_connections=pool_size))
+
+    async def _afetch(self, words):
+        return [self._decode(v) for v in await self.aredis_ins.mget(words)]
+
+    async def aclose(self):
+        await self.aredis_ins.close()
+
+
+class AsyncEmbedding_Dynamodb(AsyncEmbedding_Base, Embedding_Dynamodb):
+    '''
+        Read the word vectors from aws dynamodb. boto3 has no asyncio api, each batch_get_item runs in a thread of the event loop's executor with its own resource
+
+        Input:
+            - dynamodb: dynamodb database name
+            - any parameters mentioned in AsyncEmbedding_Base and Embedding_Dynamodb
+    '''
+    def __init__(self, dynamodb, **args):
+        super().__init__(dynamodb=dynamodb, **args)
+        self._local = threading.local()
+
+    def _thread_get_many(self, words):
+        # boto3 resources are not thread safe
+        if not hasattr(self._local, 'client'):
+            import boto3
+            self._local.client = boto3.resource('dynamodb')
+        return self._get_many(words, self._local.client)
+
+    async def _afetch(self, words):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._thread_get_many, words)
+
+
+class AsyncEmbedding_Rest(AsyncEmbedding_Base, Embedding_Rest):
+    '''
+        Read the word vectors from restapi with aiohttp, each request posts {'text':[word, ...]}
+
+        Input:
+            - embedding_restapi: string, restapi url
+            - pool_size: int, max keep-alive connections to the server, default is 10
+            - any parameters mentioned in AsyncEmbedding_Base and Embedding_Rest
+    '''
+    def __init__(self, embedding_restapi, pool_size=10, fetch_size=1000, **args):
+        super().__init__(embedding_restapi=embedding_restapi, fetch_size=fetch_size, **args)
+        self.pool_size = pool_size
+        self._session = None
+
+    async def _apost(self, data):
+        import aiohttp
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        async with self._session.post(self.rest_url, json=data) as response:
+            try:
+                return await response.json(content_type=None)
+            except ValueError:
+                return None
+
+    async def _afetch(self, words):
+        vectors = await self._apost({'text':words})
+        if not isinstance(vectors, list) or len(vectors) != len(words):
+            # api doesn't support word list
+            vectors = await asyncio.gather(*[self._apost({'text':w}) for w in words])
+        return [self._decode(v) for v in vectors]
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncEmbedding(object):
+    '''
+        asyncio clients of word vectors from different database sources
+
+        Input:
+            - automatically choose embedding from parameters, if exists:
+                1. *dynamodb* read the wordvec from amazon's dynamodb
+                2. *redis_host* read from redis
+                3. *embedding_restapi* read from restapi
+    '''
+    def __new__(cls, **args):
+        if 'dynamodb' in args:
+            return AsyncEmbedding_Dynamodb(**args)
+        elif 'redis_host' in args:
+            return AsyncEmbedding_Redis(**args)
+        elif 'embedding_restapi' in args:
+            return AsyncEmbedding_Rest(**args)
+        raise ValueError('no async embedding source in parameters, need one of dynamodb, redis_host, embedding_restapi')
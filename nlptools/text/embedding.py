@@ -5,10 +5,200 @@
     Word2vec wrapper
 '''
 
-import time, base64, os, h5py
+import time, base64, os
 import numpy as np
-from scipy.spatial.distance import cosine
-from ..utils import zload, zdump, restpost
+from collections import OrderedDict
+from ..utils import zload, zdump, restpost, get_session, hashwords, mix64
+
+
+_MISSING = object()
+
+
+def _hash_normal(keys, dim):
+    '''
+        standard normal vectors generated from uint64 keys, the same key always gets the same vector. Uniform numbers are from splitmix64 of key and position, then Box-Muller transform
+    '''
+    half = (dim + 1) // 2
+    with np.errstate(over='ignore'):
+        counters = np.arange(1, 2 * half + 1, dtype='uint64') * np.uint64(0x9e3779b97f4a7c15)
+        bits = mix64(keys.astype('uint64')[:, None] + counters)
+    u = ((bits >> np.uint64(11)).astype('float64') + 0.5) * 2.0**-53
+    r = np.sqrt(-2 * np.log(u[:, :half]))
+    theta = 2 * np.pi * u[:, half:]
+    return np.concatenate((r * np.cos(theta), r * np.sin(theta)), axis=1)[:, :dim]
+
+
+class VectorCache(object):
+    '''
+        Bounded cache of word vectors, used as *cached_vec* of embedding classes
+
+        Input:
+            - max_entries: int, max number of cached words, default is None (no limit)
+            - max_bytes: int, max bytes of cached vectors, default is None (no limit)
+            - policy: string, eviction policy, 'lru' (least recently used) or 'lfu' (least frequently used), default is 'lru'
+            - slab: bool, if True, vectors are packed as float32 rows of one preallocated matrix instead of separate arrays. The matrix grows by doubling until the limit. Default is False
+
+        Usage:
+            - cache[word], cache.get(word), word in cache, cache[word] = vector: like a dictionary
+            - hits, misses, evictions: counters of get
+            - stats(): return the counters, number of entries and bytes
+    '''
+    def __init__(self, max_entries=None, max_bytes=None, policy='lru', slab=False):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError('unknown cache policy ' + str(policy))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.slab = slab
+        self.clear()
+
+
+    def clear(self):
+        '''
+            remove all entries and reset counters
+        '''
+        self.hits, self.misses, self.evictions, self.nbytes = 0, 0, 0, 0
+        self._data = OrderedDict()
+        # lfu: word -> frequency, and frequency -> words in insert order
+        self._freq, self._buckets, self._min_freq = {}, {}, 0
+        # slab: float32 matrix, and its free rows. Slab entries in _data are row numbers
+        self._slab, self._free, self._nrow = None, [], 0
+
+
+    def _size(self, v):
+        if isinstance(v, int):
+            return self._slab.shape[1] * 4
+        return v.nbytes if hasattr(v, 'nbytes') else len(v)
+
+
+    def _slab_put(self, v):
+        v = np.asarray(v, 'float32').reshape(-1)
+        if self._slab is None:
+            self._slab = np.zeros((16, len(v)), 'float32')
+        if len(v) != self._slab.shape[1]:
+            raise ValueError('vector length {} is different with cache slab {}'.format(len(v), self._slab.shape[1]))
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = self._nrow
+            self._nrow += 1
+            if row >= len(self._slab):
+                slab = np.zeros((2 * len(self._slab), self._slab.shape[1]), 'float32')
+                slab[:len(self._slab)] = self._slab
+                self._slab = slab
+        self._slab[row] = v
+        return row
+
+
+    def _touch(self, word):
+        if self.policy == 'lru':
+            self._data.move_to_end(word)
+            return
+        f = self._freq[word]
+        del self._buckets[f][word]
+        if not self._buckets[f]:
+            del self._buckets[f]
+            if self._min_freq == f:
+                self._min_freq = f + 1
+        self._freq[word] = f + 1
+        self._buckets.setdefault(f + 1, OrderedDict())[word] = None
+
+
+    def _pop(self, word):
+        v = self._data.pop(word)
+        self.nbytes -= self._size(v)
+        if isinstance(v, int):
+            self._free.append(v)
+        if self.policy == 'lfu':
+            f = self._freq.pop(word)
+            del self._buckets[f][word]
+            if not self._buckets[f]:
+                del self._buckets[f]
+
+
+    def _evict(self):
+        if self.policy == 'lru':
+            word = next(iter(self._data))
+        else:
+            if self._min_freq not in self._buckets:
+                self._min_freq = min(self._buckets)
+            word = next(iter(self._buckets[self._min_freq]))
+        self._pop(word)
+        self.evictions += 1
+
+
+    def _value(self, v):
+        if isinstance(v, int):
+            return self._slab[v].copy()
+        return v
+
+
+    def get(self, word, default=None):
+        v = self._data.get(word, _MISSING)
+        if v is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._touch(word)
+        return self._value(v)
+
+
+    def __getitem__(self, word):
+        v = self.get(word, _MISSING)
+        if v is _MISSING:
+            raise KeyError(word)
+        return v
+
+
+    def __setitem__(self, word, v):
+        if word in self._data:
+            self._pop(word)
+        slab = self.slab and isinstance(v, np.ndarray)
+        size = v.size * 4 if slab else self._size(v)
+        # evict before insert, so the new word is always kept
+        while self._data and ((self.max_entries is not None and len(self._data) >= self.max_entries) or (self.max_bytes is not None and self.nbytes + size > self.max_bytes)):
+            self._evict()
+        if slab:
+            v = self._slab_put(v)
+        self._data[word] = v
+        self.nbytes += size
+        if self.policy == 'lfu':
+            self._freq[word] = 1
+            self._buckets.setdefault(1, OrderedDict())[word] = None
+            self._min_freq = 1
+
+
+    def __contains__(self, word):
+        return word in self._data
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def __iter__(self):
+        return iter(self._data)
+
+
+    def items(self):
+        for word, v in self._data.items():
+            yield word, self._value(v)
+
+
+    def update(self, data):
+        '''
+            add all items of a dictionary
+        '''
+        for word, v in data.items():
+            self[word] = v
+
+
+    def stats(self):
+        '''
+            return dictionary of hits, misses, evictions, hit_rate, entries and bytes
+        '''
+        total = self.hits + self.misses
+        return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'hit_rate':self.hits/total if total else 0., 'entries':len(self._data), 'bytes':self.nbytes}
 
 
 class Embedding_Base(object):
@@ -21,8 +211,19 @@ class Embedding_Base(object):
             - cached_data: the cache path in local, default is ''
             - additional_dim: 0 for random, 1 for random but with additional dim, default is 0
             - base64: bool, if True, will return BASE64 instead of vector
+            - cache_size: int, max number of words in vector cache, default is None (no limit)
+            - cache_bytes: int, max bytes of vectors in cache, default is None (no limit)
+            - cache_policy: string, 'lru' or 'lfu', eviction policy of cache, default is 'lru'
+            - cache_slab: bool, store cached vectors in one float32 matrix, default is False. See VectorCache
+            - oov: string, how to get vectors of words not in data source, default is 'random':
+                - 'random': random vector, kept in the cache, an evicted word will get a new random vector
+                - 'hash': random vector generated from the hash of word, the same on every process, not cached
+                - 'subword': sum of the hashed character ngram vectors from a fixed random table, divided by sqrt of the number of ngrams. Words with common ngrams get similar vectors. It is the same on every process and not cached
+            - oov_buckets: int, rows of the character ngram table for 'subword', default is 2**16. The table is float32 with size oov_buckets*dim
+            - oov_ngram: (min, max) length of character ngrams for 'subword', the word is wrapped with '<' and '>' like fasttext, default is (3, 6)
+            - oov_seed: int, seed of hash and ngram table, default is 0
     '''
-    def __init__(self, dim=300, data_type='float64', cached_data='', additional_dim=0, base64=False, **args):
+    def __init__(self, dim=300, data_type='float64', cached_data='', additional_dim=0, base64=False, cache_size=None, cache_bytes=None, cache_policy='lru', cache_slab=False, oov='random', oov_buckets=2**16, oov_ngram=(3, 6), oov_seed=0, **args):
         if additional_dim:
             self.dim = int(dim) + 1
         else:
@@ -31,6 +232,14 @@ class Embedding_Base(object):
         self.data_type =data_type
         self.additional_dim = additional_dim
         self.base64 = base64
+        if oov not in ('random', 'hash', 'subword'):
+            raise ValueError('unknown oov mode ' + str(oov))
+        self.oov = oov
+        self.oov_buckets = oov_buckets
+        self.oov_ngram = oov_ngram
+        self.oov_seed = oov_seed
+        self._oov_table = None
+        self.cached_vec = VectorCache(cache_size, cache_bytes, cache_policy, cache_slab)
         self.__get_cached_vec()
    
 
@@ -42,6 +251,7 @@ class Embedding_Base(object):
                 - word1: string
                 - word2: string
         '''
+        from scipy.spatial.distance import cosine
         vec1 = self.__getitem__(word1)
         vec2 = self.__getitem__(word2)
         return cosine(vec1, vec2)
@@ -51,24 +261,105 @@ class Embedding_Base(object):
         return self.dim
 
 
+    def get_many(self, words):
+        '''
+            Get vectors for a list of words. The words not in cache are read together with one bulk request to the data source
+
+            Input:
+                - words: list of string
+
+            Output:
+                - 2d numpy array with shape (len(words), dim), or list of BASE64 strings if *base64* is True
+        '''
+        uniq = list(dict.fromkeys(words))
+        vectors = {}
+        for w in uniq:
+            v = self.cached_vec.get(w)
+            if v is not None:
+                vectors[w] = v
+        missing = [w for w in uniq if w not in vectors]
+        if len(missing) > 0:
+            vectors.update(zip(missing, self._fill_many(missing, self._get_many(missing))))
+        vectors = [vectors[w] for w in words]
+        if self.base64:
+            return vectors
+        if len(vectors) < 1:
+            return np.zeros((0, self.dim))
+        return np.stack(vectors)
+
+
+    def _get_many(self, words):
+        '''
+            read vectors of distinct words not in cache, subclasses override it with the bulk api of data source. Default is one by one. Return None for the words not in data source
+        '''
+        return [self[w] for w in words]
+
+
+    def _fill(self, word, v):
+        '''
+            keep the vector read from data source in cache. If v is None, the word is not in data source, its vector is generated by *oov*, only random vectors are cached
+        '''
+        return self._fill_many([word], [v])[0]
+
+
+    def _fill_many(self, words, vectors):
+        '''
+            _fill for a list of words, the vectors of words not in data source are generated together
+        '''
+        vectors = list(vectors)
+        oov = [i for i, v in enumerate(vectors) if v is None]
+        if len(oov) > 0:
+            for i, v in zip(oov, self._oov_vectors([words[i] for i in oov])):
+                vectors[i] = base64.b64encode(v.tobytes()).decode() if self.base64 else v
+        oov = set(oov) if self.oov != 'random' else set()
+        for i, (w, v) in enumerate(zip(words, vectors)):
+            if i not in oov:
+                self.cached_vec[w] = v
+        return vectors
+
+
     def __get_cached_vec(self):
         if os.path.exists(self.cached_data):
-            self.cached_vec = zload(self.cached_data)
-        else:
-            self.cached_vec = {}
+            self.cached_vec.update(zload(self.cached_data))
    
     
-    def _postdeal(self, v = None, returnbase64 = False):
-        if self.additional_dim:
-            if v:
-                v = np.concatenate((v, np.zeros(1)))
-            else:
-                v = np.concatenate((np.random.randn(self.dim - 1), np.ones(1)))
+    def _oov_vectors(self, words, chunk_size=1000):
+        '''
+            vectors of words not in data source, generated by *oov*
+        '''
+        dim = self.dim - 1 if self.additional_dim else self.dim
+        if self.oov == 'random' or None in words:
+            vectors = np.random.randn(len(words), dim)
+        elif self.oov == 'hash':
+            keys = (hashwords(words, seed=self.oov_seed).astype('uint64') << np.uint64(32)) | hashwords(words, seed=self.oov_seed + 1).astype('uint64')
+            vectors = _hash_normal(keys, dim)
         else:
-            if v is None:
-                v = np.random.randn(self.dim)
+            if self._oov_table is None:
+                self._oov_table = np.random.default_rng(self.oov_seed).standard_normal((self.oov_buckets, dim), dtype='float32')
+            vectors = np.zeros((len(words), dim))
+            minn, maxn = self.oov_ngram
+            for start in range(0, len(words), chunk_size):
+                grams, counts = [], []
+                for w in words[start:start+chunk_size]:
+                    w = '<' + w + '>'
+                    g = [w[i:i+n] for n in range(minn, maxn+1) for i in range(len(w)-n+1)] or [w]
+                    grams.extend(g)
+                    counts.append(len(g))
+                counts = np.array(counts)
+                rows = self._oov_table[hashwords(grams, hashsize=self.oov_buckets, seed=self.oov_seed)]
+                vectors[start:start+len(counts)] = np.add.reduceat(rows, np.cumsum(counts) - counts, axis=0, dtype='float64') / np.sqrt(counts)[:, None]
+        if self.additional_dim:
+            vectors = np.concatenate((vectors, np.ones((len(words), 1))), axis=1)
+        return vectors
+
+
+    def _postdeal(self, v = None, returnbase64 = False, word = None):
+        if v is None:
+            v = self._oov_vectors([word])[0]
+        elif self.additional_dim:
+            v = np.concatenate((v, np.zeros(1)))
         if returnbase64:
-            v = base64.b64encode(v.tostring()).decode()
+            v = base64.b64encode(v.tobytes()).decode()
         return v
     
 
@@ -77,7 +368,7 @@ class Embedding_Base(object):
             Save the word vectors in memory to *cached_data*
         '''
         if len(self.cached_data) > 0:
-            zdump(self.cached_vec, self.cached_data)
+            zdump(dict(self.cached_vec.items()), self.cached_data)
 
 
 class Embedding_File(Embedding_Base):
@@ -94,6 +385,7 @@ class Embedding_File(Embedding_Base):
             - word in emb_ins: check if word existed in file
     '''
     def __init__(self, w2v_word2idx, w2v_idx2vec, **args):
+        import h5py
         Embedding_Base.__init__(self, **args)
         h5file = h5py.File(w2v_idx2vec, 'r')
         self.weight = h5file["word2vec"]
@@ -101,17 +393,119 @@ class Embedding_File(Embedding_Base):
         self.dim = self.weight.shape[1]
 
     def __getitem__(self, word):
-        if word in self.cached_vec:
-            return self.cached_vec[word]
-        v = self.weight[self.lookup[word]] if word in self.lookup else None
-        v = self._postdeal(v, self.base64)
-        self.cached_vec[word] = v
-        #print(v)
+        cached = self.cached_vec.get(word)
+        if cached is not None:
+            return cached
+        v = self._postdeal(self.weight[self.lookup[word]], self.base64) if word in self.lookup else None
+        return self._fill(word, v)
+
+    def _get_many(self, words):
+        '''
+            read rows of all words with one hdf5 read, h5py needs sorted unique indexes
+        '''
+        known = [i for i, w in enumerate(words) if w in self.lookup]
+        vectors = [None] * len(words)
+        if len(known) > 0:
+            rows, inverse = np.unique([self.lookup[words[i]] for i in known], return_inverse=True)
+            if rows[-1] - rows[0] < 4 * len(rows):
+                # dense rows, one contiguous slice is faster than fancy read
+                data = self.weight[rows[0]:rows[-1]+1][rows - rows[0]]
+            else:
+                data = self.weight[rows]
+            for i, j in zip(known, inverse.reshape(-1).tolist()):
+                vectors[i] = data[j]
+        return [None if v is None else self._postdeal(v, self.base64) for v in vectors]
+
+    def __contains__(self, word):
+        return word in self.lookup
+
+
+class Embedding_Mmap(Embedding_Base):
+    '''
+        Read the word vectors from a memory mapped matrix. The matrix is a .npy file of float32 or float16 opened with numpy.memmap, the word-idx mapping is a binary vocab file (see Vocab.save), both are mapped read only, so all worker processes share one copy in page cache and it is safe after fork. Use *convert* to create them from the files of Embedding_File
+
+        Input:
+            - w2v_mmap_word2idx: binary vocab filepath for word-idx mapping, the word id is the row of matrix. FileNotFoundError is raised if it doesn't exist
+            - w2v_mmap_idx2vec: .npy filepath for idx-vector matrix
+            - any parameters mentioned in Embedding_Base
+
+        Usage:
+            - emb_ins[word]: return the vector or BASE64 format vector
+            - word in emb_ins: check if word existed in file
+    '''
+    def __init__(self, w2v_mmap_word2idx, w2v_mmap_idx2vec, **args):
+        from .vocab import Vocab
+        Embedding_Base.__init__(self, **args)
+        if not os.path.exists(w2v_mmap_word2idx):
+            raise FileNotFoundError('vocab file {} not found, use Embedding_Mmap.convert to create it'.format(w2v_mmap_word2idx))
+        self.weight = np.load(w2v_mmap_idx2vec, mmap_mode='r')
+        self.lookup = Vocab(cached_vocab=w2v_mmap_word2idx, special_char=False)._word2id
+        self.dim = self.weight.shape[1] + (1 if self.additional_dim else 0)
+
+    def __getitem__(self, word):
+        # rows of matrix are not cached, they are already in the shared page cache
+        i = self.lookup.get(word)
+        if i is not None:
+            return self._postdeal(self.weight[i].astype(self.data_type), self.base64)
+        v = self.cached_vec.get(word)
+        if v is None:
+            v = self._fill(word, None)
         return v
 
+    def get_many(self, words):
+        '''
+            Get vectors for a list of words, the rows are gathered from matrix at once
+
+            Input:
+                - words: list of string
+
+            Output:
+                - 2d numpy array with shape (len(words), dim), or list of BASE64 strings if *base64* is True
+        '''
+        if self.base64:
+            return [self[w] for w in words]
+        ids = self.lookup.get_many(words)
+        known = np.flatnonzero(ids >= 0)
+        vectors = np.zeros((len(ids), self.dim), self.data_type)
+        vectors[known, :self.weight.shape[1]] = self.weight[ids[known]]
+        for i in np.flatnonzero(ids < 0).tolist():
+            vectors[i] = self[words[i]]
+        return vectors
+
     def __contains__(self, word):
         return word in self.lookup
 
+    @staticmethod
+    def convert(w2v_word2idx, w2v_idx2vec, w2v_mmap_word2idx, w2v_mmap_idx2vec, dtype='float32', chunk_size=100000):
+        '''
+            Convert the files of Embedding_File to the files of Embedding_Mmap
+
+            Input:
+                - w2v_word2idx: pickle filepath for word-idx mapping
+                - w2v_idx2vec: hdf5 dump for idx-vector mapping
+                - w2v_mmap_word2idx: output binary vocab filepath
+                - w2v_mmap_idx2vec: output .npy filepath
+                - dtype: vector type in output matrix, float32 or float16, default is float32
+                - chunk_size: int, rows copied each time, default is 100000
+        '''
+        import h5py
+        from .vocab import Vocab
+        from .wordindex import WordIndex
+        with h5py.File(w2v_idx2vec, 'r') as h5file:
+            weight = h5file["word2vec"]
+            matrix = np.lib.format.open_memmap(w2v_mmap_idx2vec, mode='w+', dtype=dtype, shape=weight.shape)
+            for i in range(0, weight.shape[0], chunk_size):
+                matrix[i:i+chunk_size] = weight[i:i+chunk_size]
+            matrix.flush()
+            del matrix
+        lookup = zload(w2v_word2idx)
+        nrow = int(max(lookup.values(), default=-1)) + 1
+        vocab = Vocab(vocab_size=max(nrow+1, 30), special_char=False)
+        vocab._word2id = WordIndex.from_words(list(lookup.keys()), list(lookup.values()))
+        vocab._id2tf = np.zeros(nrow, 'int')
+        vocab.cached_vocab = w2v_mmap_word2idx
+        vocab.save(binary=True)
+
 
 class Embedding_Redis(Embedding_Base):
     '''
@@ -121,29 +515,41 @@ class Embedding_Redis(Embedding_Base):
             - redis_host: redis host
             - redis port: redis port
             - redis_db: database in redis
+            - batch_size: int, max keys of one MGET in get_many, default is 1000
             - any parameters mentioned in Embedding_Base
 
         Usage:
             - emb_ins[word]: return the vector or BASE64 format vector
             - word in emb_ins: check if word existed in database
     '''
-    def __init__(self, redis_host, redis_port, redis_db, **args):
+    def __init__(self, redis_host, redis_port, redis_db, batch_size=1000, **args):
         import redis
         Embedding_Base.__init__(self, **args)
+        self.batch_size = batch_size
         self.redis_ins = redis.Redis(connection_pool = redis.ConnectionPool(host=redis_host, port=redis_port, db=redis_db))
 
-    def __getitem__(self, word):
-        if word in self.cached_vec:
-            return self.cached_vec[word]
-        v = self.redis_ins.get(word)
+    def _decode(self, v):
         if v is None:
-            v = self._postdeal(v, self.base64)
-        else:
-            if not self.base64:
-                v = self._postdeal(np.fromstring(base64.b64decode(v)), self.base64)
-        self.cached_vec[word] = v
+            return None
+        if not self.base64:
+            v = self._postdeal(np.frombuffer(base64.b64decode(v)).copy(), self.base64)
         return v
 
+    def __getitem__(self, word):
+        cached = self.cached_vec.get(word)
+        if cached is not None:
+            return cached
+        return self._fill(word, self._decode(self.redis_ins.get(word)))
+
+    def _get_many(self, words):
+        '''
+            read with MGET, *batch_size* keys each round trip
+        '''
+        vectors = []
+        for i in range(0, len(words), self.batch_size):
+            vectors.extend(self._decode(v) for v in self.redis_ins.mget(words[i:i+self.batch_size]))
+        return vectors
+
     def __contains__(self, word):
         v = self.redis_ins.get(word)
         return v is not None
@@ -165,11 +571,13 @@ class Embedding_Random(Embedding_Base):
         self.dim = int(self.dim)
 
     def __getitem__(self, word):
-        if word in self.cached_vec:
-            return self.cached_vec[word]
-        v = self._postdeal(None, self.base64)
-        self.cached_vec[word] = v
-        return v
+        cached = self.cached_vec.get(word)
+        if cached is not None:
+            return cached
+        return self._fill(word, None)
+
+    def _get_many(self, words):
+        return [None] * len(words)
 
     def __contains__(self, word):
         return word in self.cached_vec
@@ -181,36 +589,64 @@ class Embedding_Dynamodb(Embedding_Base):
 
         Input:
             - dynamodb: dynamodb database name
+            - max_retries: int, max times to request the unprocessed keys of batch_get_item again, default is 8
+            - retry_delay: float, seconds to wait before the first retry, doubled after each retry, default is 0.05
             - all keys mentioned in Embedding_Base
 
         Usage:
             - emb_ins[word]: return the vector or BASE64 format vector
             - word in emb_ins: check if word existed in database
     '''
-    def __init__(self, dynamodb, **args):
+    def __init__(self, dynamodb, max_retries=8, retry_delay=0.05, **args):
         import boto3
         Embedding_Base.__init__(self, **args)
-        self.client = boto3.resource(dynamodb)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.client = boto3.resource('dynamodb')
         self.table = self.client.Table(dynamodb)
 
-    def __getitem__(self, word):
+    def _decode(self, item):
         import boto3
-        if word in self.cached_vec:
-            return self.cached_vec[word]
+        if item is None:
+            return None
+        vector_binary = item['vector']
+        if isinstance(vector_binary, boto3.dynamodb.types.Binary):
+            vector_binary = vector_binary.value
+        if self.base64:
+            return vector_binary
+        vector = np.frombuffer(base64.b64decode(vector_binary), dtype=self.data_type).copy()
+        return self._postdeal(vector)
+
+    def __getitem__(self, word):
+        cached = self.cached_vec.get(word)
+        if cached is not None:
+            return cached
         v = self.table.get_item(Key={"word":word})
-        if not "Item" in v:
-            v = self._postdeal(None, self.base64)
-        else:
-            vector_binary = v['Item']['vector']
-            if isinstance(vector_binary, boto3.dynamodb.types.Binary):
-                vector_binary = vector_binary.value
-            if self.base64:
-                v = vector_binary
-            else:
-                vector = np.fromstring(base64.b64decode(vector_binary), dtype=self.data_type)
-                v = self._postdeal(vector)
-        self.cached_vec[word] = v
-        return v
+        return self._fill(word, self._decode(v.get("Item", None)))
+
+    def _get_many(self, words, client=None):
+        '''
+            read with batch_get_item, 100 keys each request. Unprocessed keys are requested again with exponential backoff, RuntimeError is raised after *max_retries* retries. *client* is the dynamodb resource, default is None, means self.client
+        '''
+        if client is None:
+            client = self.client
+        items = {}
+        for i in range(0, len(words), 100):
+            request = {self.table.name: {'Keys': [{'word':w} for w in words[i:i+100]]}}
+            retries = 0
+            while True:
+                response = client.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self.table.name, []):
+                    items[item['word']] = item
+                request = response.get('UnprocessedKeys', None)
+                if not request:
+                    break
+                if retries >= self.max_retries:
+                    raise RuntimeError('dynamodb keys still unprocessed after {} retries'.format(retries))
+                # unprocessed keys mean the table is throttled, wait before asking again
+                time.sleep(self.retry_delay * 2**retries)
+                retries += 1
+        return [self._decode(items.get(w, None)) for w in words]
 
     def __contains__(self, word):
         v = self.table.get_item(Key={"word":word})
@@ -222,28 +658,44 @@ class Embedding_Rest(Embedding_Base):
         Read the word vectors from restapi
 
         Input:
-            - embedding_restapi: string, restapi url 
+            - embedding_restapi: string, restapi url. The api accepts {'text':word} and returns the BASE64 vector. For get_many, it accepts {'text':[word, ...]} and returns a list of BASE64 vectors
             - data_type: the type of vector used in restapi, float64, float32, float
+            - timeout: float, request timeout in seconds, default is 30
          
         Usage:
             - emb_ins[word]: return the vector or BASE64 format vector
             - word in emb_ins: check if word existed in database
     '''
-    def __init__(self, embedding_restapi, **args):
+    def __init__(self, embedding_restapi, timeout=30, **args):
         Embedding_Base.__init__(self, **args)
         self.rest_url = embedding_restapi
-    
-    def __getitem__(self, word):
-        if word in self.cached_vec:
-            return self.cached_vec[word]
-        vector = restpost(self.rest_url, {'text':word})
-        if not base64:
-            vector = np.fromstring(base64.b64decode(vector), dtype=self.data_type)
+        self.timeout = timeout
+        self.session = get_session()
+
+    def _decode(self, vector):
+        if vector is None:
+            return None
+        if not self.base64:
+            vector = np.frombuffer(base64.b64decode(vector), dtype=self.data_type).copy()
             vector = self._postdeal(vector)
-        self.cached_vec[word] = vector
         return vector
+    
+    def __getitem__(self, word):
+        cached = self.cached_vec.get(word)
+        if cached is not None:
+            return cached
+        return self._fill(word, self._decode(restpost(self.rest_url, {'text':word}, session=self.session, timeout=self.timeout)))
 
-    def __contains(self, word):
+    def _get_many(self, words):
+        '''
+            read all words with one request. If the api doesn't return a list, will fall back to one request per word
+        '''
+        vectors = restpost(self.rest_url, {'text':words}, session=self.session, timeout=self.timeout)
+        if not isinstance(vectors, list) or len(vectors) != len(words):
+            vectors = [restpost(self.rest_url, {'text':w}, session=self.session, timeout=self.timeout) for w in words]
+        return [self._decode(v) for v in vectors]
+
+    def __contains__(self, word):
         return True
 
 
@@ -253,14 +705,17 @@ class Embedding(object):
 
         Input:
             - automatically choose embedding from parameters, if exists:
-                1. *w2v_word2idx* *w2v_idx2vec* read the wordvec from file
-                2. *dynamodb* read the wordvec from amazon's dynamodb
-                3. *redis_host* read from redis
-                4. *embedding_restapi* read from restapi
-                5. default: random generated
+                1. *w2v_mmap_word2idx* *w2v_mmap_idx2vec* read the wordvec from memory mapped file
+                2. *w2v_word2idx* *w2v_idx2vec* read the wordvec from file
+                3. *dynamodb* read the wordvec from amazon's dynamodb
+                4. *redis_host* read from redis
+                5. *embedding_restapi* read from restapi
+                6. default: random generated
     '''
     def __new__(cls, **args):
-        if 'w2v_word2idx' in args and 'w2v_idx2vec' in args:
+        if 'w2v_mmap_word2idx' in args and 'w2v_mmap_idx2vec' in args:
+            return Embedding_Mmap(**args)
+        elif 'w2v_word2idx' in args and 'w2v_idx2vec' in args:
             return Embedding_File(**args)
         elif 'dynamodb' in args:
             return Embedding_Dynamodb(**args)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+import numpy, os
+from .vocab import Vocab
+from .wordindex import WordIndex
+from ..utils import zload, zdump, hashwords
+
+'''
+    Author: Pengjia Zhu (zhupengjia@gmail.com)
+'''
+
+
+class HashVocab(Vocab):
+    '''
+        Vocab using hashing trick, word id is calculated from murmurhash3 of word, so there is no dictionary growth. Memory is constant (only the tf array) and workers need no shared state. The ids are in range [0, vocab_size), can be directly used for TFIDF(vocab_size=vocab.vocab_size) or embedding matrix with vocab_size rows
+
+        Input:
+            - cached_vocab: string, cached vocab file path for tf and sample, default is ''
+            - vocab_size: int, number of hash buckets (special characters included), default is 2**20. If the number<30, then the size is 2**vocab_size, else the size is *vocab_size*.
+            - signed: bool, if True, use signed hashing: bucket is abs(hash) % n, and the sign of hash is returned by words2sign, for feature hashing with less collision bias. Default is False
+            - reverse_sample: int, keep at most *reverse_sample* buckets with the words hashed into them, used by id2word and reverse_lookup for debugging. Default is 0
+            - seed: int, hash seed, default is 0
+            - embedding: instance of text.embedding, default is None(use random vector). Vector of a bucket is the vector of its first sampled word, or "#id" if not sampled
+            - special_char: bool, check if add 4 special characters, they take the first 4 ids. Default is True
+    '''
+    def __init__(self, cached_vocab='', vocab_size=2**20, signed=False, reverse_sample=0, seed=0, embedding=None, special_char=True):
+        self.signed = signed
+        self.reverse_sample = reverse_sample
+        self.seed = seed
+        self._reverse = {}
+        super().__init__(cached_vocab=cached_vocab, vocab_size=vocab_size, embedding=embedding, special_char=special_char)
+
+
+    def _get_cached_vocab(self):
+        self._word2id = WordIndex()
+        self._id2tf = numpy.zeros(self.vocab_size, 'int')
+        if os.path.exists(self.cached_vocab):
+            try:
+                data = zload(self.cached_vocab)
+                self.vocab_size, self.signed, self.seed = data['vocab_size'], data['signed'], data['seed']
+                self._id2tf = data['id2tf']
+                self._reverse = data['reverse']
+            except Exception as err:
+                print('warning!!! cached vocab read failed!!! will build a new vocab. ' + str(err))
+
+
+    def save(self):
+        '''
+            Save tf and reverse sample to *cached_vocab*
+        '''
+        if len(self.cached_vocab) > 0:
+            zdump({'vocab_size':self.vocab_size, 'signed':self.signed, 'seed':self.seed, 'id2tf':self._id2tf, 'reverse':self._reverse}, self.cached_vocab)
+
+
+    def addBE(self):
+        '''
+            Add 4 special characters, they take the ids before hash buckets
+        '''
+        self._word_spec = [self.PAD, self.BOS, self.EOS, self.UNK]
+        self._id_spec = list(range(len(self._word_spec)))
+
+
+    def _hash(self, words):
+        '''
+            return bucket ids and signs of distinct words
+        '''
+        nspec = len(self._id_spec)
+        hashes = hashwords(words, positive=not self.signed, seed=self.seed).astype('int64')
+        ids = numpy.abs(hashes) % (self.vocab_size - nspec) + nspec
+        signs = numpy.where(hashes >= 0, 1, -1).astype('int8')
+        for i, w in enumerate(self._word_spec):
+            if w in words:
+                ids[words.index(w)], signs[words.index(w)] = i, 1
+        return ids, signs
+
+
+    def _sample(self, words, ids):
+        '''
+            keep words of at most *reverse_sample* buckets
+        '''
+        if len(self._reverse) >= self.reverse_sample:
+            return
+        for w, i in zip(words, ids.tolist()):
+            if i in self._reverse:
+                if w not in self._reverse[i]:
+                    self._reverse[i].append(w)
+            elif len(self._reverse) < self.reverse_sample:
+                self._reverse[i] = [w]
+
+
+    def words2id_csr(self, tokens, lengths=None, count=None, return_signs=False):
+        '''
+            Bulk tokens to token ids, each distinct token is hashed once
+
+            Input:
+                - tokens: flat token list, or list of token lists
+                - lengths: list of int, sentence lengths of the flat token list. Default is None, means one sentence for flat token list
+                - count: bool, if accumulate term frequency, default is None, means count only when vocab allows update
+                - return_signs: bool, if also return signs of hash, default is False
+
+            Output:
+                - ids: int32 numpy array of all token ids
+                - offsets: int64 numpy array, ids of sentence i are ids[offsets[i]:offsets[i+1]]
+                - signs: int8 numpy array of 1 or -1, only returned when return_signs is True
+        '''
+        tokens, offsets, uniq, inverse = self._unique_tokens(tokens, lengths)
+        uniq_ids, uniq_signs = self._hash(uniq)
+        if self.reverse_sample > 0:
+            self._sample(uniq, uniq_ids)
+        if count is None:
+            count = self.update
+        if count and len(tokens) > 0:
+            self._writable()
+            # counts of distinct tokens, added in O(tokens) instead of a vocab_size vector per call
+            numpy.add.at(self._id2tf, uniq_ids, numpy.bincount(inverse, minlength=len(uniq)))
+        ids = uniq_ids[inverse].astype('int32')
+        if return_signs:
+            return ids, offsets, uniq_signs[inverse]
+        return ids, offsets
+
+
+    def words2sign(self, tokens):
+        '''
+            get signs of hash for a token list, used with signed hashing
+
+            Input:
+                - tokens: token list
+
+            Output:
+                - int8 numpy array of 1 or -1
+        '''
+        return self.words2id_csr(tokens, count=False, return_signs=True)[2]
+
+
+    def word2id(self, word):
+        '''
+            Convert word to id
+
+            Input:
+                - word: string
+
+            Output:
+                - wordid: int
+        '''
+        if word is None: return None
+        return int(self.words2id_csr([word])[0][0])
+
+
+    def words2id(self, tokens, batch=False):
+        '''
+            tokens to token ids
+
+            Input:
+                - tokens: token list
+                - batch: if the input sequence is a batches, default is False
+
+            Output:
+                - list of ids
+        '''
+        if batch:
+            tokens = [[x for x in t if x is not None] for t in tokens]
+            ids, offsets = self.words2id_csr(tokens)
+            return numpy.asarray([ids[offsets[i]:offsets[i+1]].astype('int') for i in range(len(tokens))], dtype=object)
+        return self.words2id_csr([t for t in tokens if t is not None])[0].astype('int')
+
+
+    def update_counts(self, counts):
+        '''
+            merge term frequencies into vocab
+
+            Input:
+                - counts: dictionary with format {word:tf, ...}, e.g. a collections.Counter
+        '''
+        if len(counts) < 1:
+            return
+        words = list(counts.keys())
+        ids, _ = self._hash(words)
+        if self.reverse_sample > 0:
+            self._sample(words, ids)
+        self._writable()
+        numpy.add.at(self._id2tf, ids, numpy.fromiter(counts.values(), dtype='int64', count=len(words)))
+
+
+    def __add__(self, other):
+        '''
+            merge another hash vocab with the same buckets, the term frequencies are summed
+        '''
+        assert isinstance(other, HashVocab) and other.vocab_size == self.vocab_size and other.signed == self.signed and other.seed == self.seed, 'only hash vocabs with same settings can be merged'
+        self._writable()
+        self._id2tf += other._id2tf
+        for i, words in other._reverse.items():
+            self._sample(words, numpy.full(len(words), i))
+        return self
+
+
+    def reverse_lookup(self, i):
+        '''
+            get all sampled words hashed into bucket i
+
+            Input:
+                - i: wordid
+
+            Output:
+                - list of string
+        '''
+        if 0 <= i < len(self._id_spec):
+            return [self._word_spec[i]]
+        return list(self._reverse.get(i, []))
+
+
+    def id2word(self, i):
+        '''
+            convert id to word. It is the first sampled word of the bucket
+
+            Input:
+                - i: wordid
+
+            Output:
+                - string. If no word is sampled for the bucket, will return None
+        '''
+        words = self.reverse_lookup(i)
+        return words[0] if words else None
+
+
+    def id2words(self, ids, batch=False):
+        '''
+            convert ids to word, buckets without sampled word are skipped
+
+            Input:
+                - ids: list of ids
+                - batch: if the input sequence is a batches, default is False
+        '''
+        if batch:
+            return numpy.asarray([self.id2words(i) for i in ids], dtype=object)
+        words = [self.id2word(i) for i in ids]
+        return [w for w in words if w is not None]
+
+
+    def _bucket_word(self, i):
+        w = self.id2word(i)
+        return '#{}'.format(i) if w is None else w
+
+
+    def id2vec(self, word_id):
+        '''
+            get the vector of bucket
+
+            Input:
+                - word_id: int
+
+            Output:
+                - 1d numpy array
+        '''
+        return self.embedding[self._bucket_word(word_id)]
+
+
+    def ids2vec(self, ids):
+        '''
+            get vectors for each bucket in id list
+
+            Input:
+                - ids: id list
+
+            Output:
+                - numpy array. The array index is the id index in input
+        '''
+        if self.embedding is None:
+            return None
+        vec = numpy.zeros((len(ids), self.embedding.dim), 'float')
+        if len(ids) > 0:
+            vec[:] = self.embedding.get_many([self._bucket_word(i) for i in ids])
+        return vec
+
+
+    def dense_vectors(self):
+        '''
+            return a numpy array of bucket vectors with shape (vocab_size, dim)
+        '''
+        vectors = self.ids2vec(range(self.vocab_size))
+        vectors[0] = 0
+        return vectors
+
+
+    def reduce(self, vocab_size=None, reorder=False):
+        '''
+            hash vocab has no dictionary to reduce, only freeze it. Returns the identity remap
+        '''
+        self.freeze()
+        return numpy.arange(self.vocab_size, dtype='int32')
+
+
+    def __len__(self):
+        return self.vocab_size
+
+
+    def __contains__(self, word):
+        '''
+            every word has a bucket
+        '''
+        return isinstance(word, str)
+
+
+    def __eq__(self, other):
+        return isinstance(other, HashVocab) and (self.vocab_size, self.signed, self.seed) == (other.vocab_size, other.signed, other.seed)
+
+
+    def __str__(self):
+        info = '-'*30
+        info += '\nhash buckets: {}'.format(self.vocab_size)
+        info += '\nsigned hashing: {}'.format(self.signed)
+        info += '\nsampled buckets: {}'.format(len(self._reverse))
+        info += '\nallow update: {}'.format(self.update)
+        info += '\n' + '-'*30
+        return info
@@ -2,8 +2,6 @@
 #-*- coding: utf-8 -*-
 import os, re, uuid, shutil, glob, traceback
 from collections import defaultdict
-from spacy.matcher import PhraseMatcher
-from spacy.tokens import Span
 from .tokenizer import Tokenizer_Spacy, Tokenizer_LTP
 
 
@@ -48,6 +46,7 @@ class KeywordsMatcher:
                 - nlp: spacy instance
                 - keywords: keyword dictionary, like {"key":[words]}
         '''
+        from spacy.matcher import PhraseMatcher
         self.matcher = PhraseMatcher(nlp.vocab)
         patterns = {}
         for k in keywords:
@@ -55,6 +54,7 @@ class KeywordsMatcher:
             self.matcher.add(k, None, *patterns[k])
     
     def __call__(self, doc):
+        from spacy.tokens import Span
         matches = self.matcher(doc)
         for match_id, start, end in matches:
             span = Span(doc, start, end, label=match_id)
@@ -112,13 +112,25 @@ class NER_Base(object):
                 - sentence: string
                 - return_dict: bool, True will return like {entityname:entity,}, False will return like [(entityname:entity), ...], default is False
         '''
-        entities = self.entities(sentence)
-        for en, ev in entities:
-            try:
-                sentence = re.sub(ev, r"{"+en+r"}", sentence)
-            except:
-                err = traceback.format_exc()
-                print(err)
+        if self.support_offsets:
+            entities = self.entities(sentence, offsets=True)
+            marked, pos = [], 0
+            for en, ev, start, end in sorted(entities, key=lambda x: x[2]):
+                if start < pos:
+                    continue
+                marked += [sentence[pos:start], "{" + en + "}"]
+                pos = end
+            marked.append(sentence[pos:])
+            sentence = "".join(marked)
+            entities = [(en, ev) for en, ev, start, end in entities]
+        else:
+            entities = self.entities(sentence)
+            for en, ev in entities:
+                try:
+                    sentence = re.sub(ev, r"{"+en+r"}", sentence)
+                except:
+                    err = traceback.format_exc()
+                    print(err)
         if return_dict:
             entities_dict = defaultdict(list)
             for en, ev in entities:
@@ -167,21 +179,18 @@ class NER_Spacy(NER_Base, Tokenizer_Spacy):
                 self.nlp.add_pipe(entity_matcher, last=True)
 
 
-    def entities(self, sentence):
-        '''
-            return needed entities
-
-            Input:
-                - sentence: string
-        '''
+    def _doc2entities(self, doc, offsets=False):
         entities = []
-        for ent in self.nlp(sentence).ents:
+        for ent in doc.ents:
             label = ent.label_
             if label in self.ner_name_replace:
                 label = self.ner_name_replace[label]
             if not label in self.ner_names:
                 continue
-            entities.append((label, ent.text))
+            if offsets:
+                entities.append((label, ent.text, ent.start_char, ent.end_char))
+            else:
+                entities.append((label, ent.text))
         return entities
 
 
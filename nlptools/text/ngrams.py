@@ -1,19 +1,63 @@
 #!/usr/bin/env python
 import numpy
 from .vocab import Vocab 
+from ..utils import mix64
 
 '''
     Author: Pengjia Zhu (zhupengjia@gmail.com)
 '''
 
+_PRIME = numpy.uint64(0x100000001b3)
+
+
+def hash_ngrams(ids, offsets, ngrams, ngram_size, start_id=0):
+    '''
+        Hash ngrams of token ids with a polynomial rolling hash, no string is built. The hash of order n is extended from order n-1 in one vectorized step
+
+        Input:
+            - ids: unigram id array of all sentences
+            - offsets: int array, ids of sentence i are ids[offsets[i]:offsets[i+1]]
+            - ngrams: int, max order
+            - ngram_size: int, number of ngram hash buckets
+            - start_id: int, the ngram ids are in range [start_id, start_id+ngram_size), default is 0
+
+        Output:
+            - dictionary with format {n: (ngram_ids, ngram_offsets), ...} for n in 2...ngrams, ngram_ids is int64 array, ngrams crossing sentences are excluded
+    '''
+    ids = numpy.asarray(ids).astype('uint64') + numpy.uint64(1)
+    offsets = numpy.asarray(offsets, 'int64')
+    lengths = numpy.diff(offsets)
+    sentence = numpy.repeat(numpy.arange(len(lengths)), lengths)
+    h = ids
+    result = {}
+    with numpy.errstate(over='ignore'):
+        for n in range(2, ngrams+1):
+            # h[j] covers tokens j...j+n-2, extend each window with token j+n-1
+            h = h[:-1] * _PRIME + ids[n-1:]
+            valid = sentence[:len(h)] == sentence[n-1:]
+            ngram_offsets = numpy.zeros(len(lengths)+1, 'int64')
+            numpy.cumsum(numpy.maximum(lengths - n + 1, 0), out=ngram_offsets[1:])
+            ngram_ids = (mix64(h[valid]) % numpy.uint64(ngram_size)).astype('int64') + start_id
+            result[n] = (ngram_ids, ngram_offsets)
+    return result
+
+
 class Ngrams(Vocab):
     '''
         vocab support ngrams
+
+        Input:
+            - ngrams: int, max order of ngrams, default is 1
+            - ngram_size: int, if not None, ngrams (n>=2) are hashed from unigram ids to *ngram_size* buckets, the ids are in range [vocab_size, vocab_size+ngram_size) and no ngram string is added to dictionary. If None, the ngram is joined to string and added to dictionary. Default is None
+            - any parameters mentioned in Vocab
     '''
 
-    def __init__(self, ngrams=1, **args):
+    def __init__(self, ngrams=1, ngram_size=None, **args):
         super().__init__(**args)
         self.ngrams = ngrams
+        self.ngram_size = ngram_size
+        if ngram_size is not None:
+            self._ngram2tf = numpy.zeros(ngram_size, 'int')
 
 
     def words2id(self, tokens, batch=False):
@@ -25,23 +69,71 @@ class Ngrams(Vocab):
                 - batch: if the input sequence is a batches, default is False
 
             Output:
-                - list of ids
+                - dictionary with format {n: id array, ...}
 
         '''
         if batch:
-            return numpy.asarray([self.words2id(t) for t in tokens], dtype=numpy.object) 
+            return numpy.asarray([self.words2id(t) for t in tokens], dtype=object) 
+        tokens = [t for t in tokens if t is not None]
+        if self.ngram_size is not None:
+            return {n:ids for n, (ids, offsets) in self.ngrams2id_csr(tokens).items()}
         ids = {}
-        ids[1] = [self.word2id(t) for t in tokens]
-        ids[1] = numpy.array([i for i in ids[1] if i is not None], 'int')
+        ids[1] = super().words2id(tokens)
         for i in range(2, self.ngrams+1):
             ids[i] = []
             for j in range(len(ids[1])-i+1):
                 new_token = "".join(tokens[j:j+i])
                 ids[i].append(self.word2id(new_token)) 
+            ids[i] = numpy.array(ids[i], 'int')
         return ids
 
+
+    def ngrams2id_csr(self, tokens, lengths=None):
+        '''
+            Bulk tokens to ngram ids for a batch of sentences
+
+            Input:
+                - tokens: flat token list, or list of token lists
+                - lengths: list of int, sentence lengths of the flat token list. Default is None, means one sentence for flat token list
+
+            Output:
+                - dictionary with format {n: (ids, offsets), ...}, ngram ids of sentence i are ids[offsets[i]:offsets[i+1]]
+        '''
+        ids, offsets = self.words2id_csr(tokens, lengths)
+        result = {1: (ids.astype('int64'), offsets)}
+        if self.ngram_size is not None:
+            result.update(hash_ngrams(ids, offsets, self.ngrams, self.ngram_size, self.vocab_size))
+            if self.update:
+                for n in range(2, self.ngrams+1):
+                    self._ngram2tf += numpy.bincount(result[n][0] - self.vocab_size, minlength=self.ngram_size)
+            return result
+        # ngrams joined to string
+        tokens, offsets, _, _ = self._unique_tokens(tokens, lengths)
+        for n in range(2, self.ngrams+1):
+            sentences = [tokens[offsets[i]:offsets[i+1]] for i in range(len(offsets)-1)]
+            grams = [["".join(s[j:j+n]) for j in range(len(s)-n+1)] for s in sentences]
+            result[n] = self.words2id_csr([g for s in grams for g in s], [len(s) for s in grams])
+            result[n] = (result[n][0].astype('int64'), result[n][1])
+        return result
+
+
+    def ids2tf(self, ids):
+        '''
+            get counts for each ids, include hashed ngram ids
+            
+            Input:
+                - ids: id list
+
+            Output:
+                - count list
+        '''
+        if self.ngram_size is None:
+            return super().ids2tf(ids)
+        return [self._ngram2tf[x - self.vocab_size] if x >= self.vocab_size else (self._id2tf[x] if x < len(self._id2tf) else 0) for x in ids]
+
+
     @staticmethod
-    def cast(vocab, ngrams=1, vocab_size=None, cached_vocab=''):
+    def cast(vocab, ngrams=1, vocab_size=None, cached_vocab='', ngram_size=None):
         '''
             Cast a Vocab to Ngrams vocab
             
@@ -50,19 +142,19 @@ class Ngrams(Vocab):
                 - ngrams: int, default is 1
                 - vocab_size: if int, will use vocab_size, default is None
                 - cached_vocab: string, cached vocab file path, default is ''
+                - ngram_size: int, number of hashed ngram buckets, default is None, see Ngrams
         '''
         adjust_size = False if vocab_size is None else True
         vocab_size = vocab.vocab_size if vocab_size is None else vocab_size
-        ngrams_vocab = Ngrams(ngrams, cached_vocab=cached_vocab, 
+        ngrams_vocab = Ngrams(ngrams, ngram_size=ngram_size, cached_vocab=cached_vocab, 
                 vocab_size=vocab_size, outofvocab=vocab.outofvocab, 
-                embedding=vocab.embedding)
+                embedding=vocab.embedding, fast_lookup=vocab.fast_lookup)
         vocab_size = ngrams_vocab.vocab_size
         ngrams_vocab._word2id = vocab._word2id
-        if not adjust_size:
-            ngrams_vocab._id2tf = vocab._id2tf
-        else:
+        if adjust_size:
             assert vocab_size > len(vocab._word2id)
-            ngrams_vocab._id2tf = numpy.concatenate([vocab._id2tf, numpy.zeros(vocab_size-len(vocab._id2tf), "int")])
+        # tf array grows with the vocab
+        ngrams_vocab._id2tf = vocab._id2tf
         ngrams_vocab._word_spec = vocab._word_spec
         ngrams_vocab._id_spec = vocab._id_spec
         ngrams_vocab.PAD = vocab.PAD
@@ -76,4 +168,3 @@ class Ngrams(Vocab):
         return ngrams_vocab
          
 
-
@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 import numpy, multiprocessing, os
-from tqdm import tqdm
-from scipy.sparse import csr_matrix
 from functools import partial
 from ..utils import zload, zdump
 
@@ -48,6 +46,8 @@ class TFIDF:
             Output:
                 - count matrix (scipy.sparse.csr_matrix)
         '''
+        from tqdm import tqdm
+        from scipy.sparse import csr_matrix
         row, col, data = [], [], []
         pool = multiprocessing.Pool(
             max(multiprocessing.cpu_count()-2, 1)
@@ -102,8 +102,7 @@ class TFIDF:
         if corpus_len is None:
             corpus_len = len(corpus_ids)
         count_matrix = self.get_count_matrix(corpus_ids, corpus_len)
-        word_freqs = self.get_doc_freqs(count_matrix)
-        word_idfs = numpy.log(count_matrix.shape[1] - word_freqs + 0.5) - numpy.log(word_freqs + 0.5)
+        word_idfs = self.get_idfs(count_matrix)
         if not local_use:
             self.count_matrix = count_matrix
             self.word_idfs = word_idfs
@@ -112,6 +111,25 @@ class TFIDF:
         else:
             return count_matrix, word_idfs
 
+    def get_idfs(self, count_matrix):
+        '''
+            idf of each word from count matrix
+        '''
+        word_freqs = self.get_doc_freqs(count_matrix)
+        return numpy.log(count_matrix.shape[1] - word_freqs + 0.5) - numpy.log(word_freqs + 0.5)
+
+    def load_bow(self, bow):
+        '''
+            Build index from bag of words sparse matrix, instead of counting corpus_ids again
+
+            Input:
+                - bow: scipy.sparse matrix with one document per row, the output from text.vocab.corpus2bow
+        '''
+        count_matrix = bow.T.tocsr()
+        self.set_index(count_matrix, self.get_idfs(count_matrix))
+        if self.cached_index:
+            zdump((self.count_matrix, self.word_idfs), self.cached_index)
+
     def get_index(self):
         """
             return index file
@@ -126,6 +144,35 @@ class TFIDF:
         self.word_idfs = word_idfs
         self.vocab_size = self.count_matrix.shape[0]
 
+    def reindex(self, remap, vocab_size=None):
+        """
+            re-index the count matrix rows and idfs after the vocab is reduced, without rebuilding from corpus
+
+            Input:
+                - remap: int array, the new id of each old id, -1 for removed words. It is the output of Vocab.reduce
+                - vocab_size: int, new vocab size, default is None, means max(remap)+1
+        """
+        from scipy.sparse import csr_matrix
+        remap = numpy.asarray(remap)
+        if vocab_size is None:
+            vocab_size = int(remap.max()) + 1
+        # rows out of remap range have no word, treated as removed
+        row_map = numpy.full(self.count_matrix.shape[0], -1, 'int64')
+        n = min(len(remap), len(row_map))
+        row_map[:n] = remap[:n]
+        counts = self.count_matrix.tocoo()
+        rows = row_map[counts.row]
+        keep = rows >= 0
+        self.count_matrix = csr_matrix(
+            (counts.data[keep], (rows[keep], counts.col[keep])), shape=(vocab_size, self.count_matrix.shape[1])
+        )
+        old_ids = numpy.flatnonzero(row_map >= 0)
+        # words without any document get the idf of zero doc frequency
+        word_idfs = numpy.full(vocab_size, numpy.log(self.count_matrix.shape[1] + 0.5) - numpy.log(0.5))
+        word_idfs[row_map[old_ids]] = self.word_idfs[old_ids]
+        self.word_idfs = word_idfs
+        self.vocab_size = vocab_size
+
     def search_index(self, word_ids, corpus_ids=None, topN=1, global_idfs=True):
         '''
             traditional tf-idf algorithm
@@ -191,6 +238,7 @@ class TFIDF:
         '''
             Used in search_index
         '''
+        from scipy.sparse import csr_matrix
         # Count 
         wids_unique, wids_counts = numpy.unique(word_ids, return_counts=True)
         tfs = numpy.log1p(wids_counts)
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
-import os, string, numpy, re, glob, json, requests, copy
+import os, string, numpy, re, glob, json, multiprocessing, inspect, unicodedata, queue, hashlib
+from multiprocessing.pool import ThreadPool
+from collections import deque
+from itertools import islice, chain
 from string import punctuation
-from ..utils import restpost
+from ..utils import restpost, get_session, LRUCache
 
 '''
     Author: Pengjia Zhu (zhupengjia@gmail.com)
@@ -15,9 +18,14 @@ def format_sentence(sentence, vocab, tokenizer=None, max_seq_len=50):
         Input:
             - sentence: string or list of tokens/token ids, 
             - vocab:  instance of nlptools.text.vocab
-            - tokenizer:  instance of nlptools.text.tokenizer, default is None
+            - tokenizer:  instance of nlptools.text.tokenizer, default is None. If it is a BERT/GPT2 tokenizer with use_fast=True and without stopwords, the ids will come from its encode_batch directly
             - max_seq_len: int, default is 50
     """
+    if isinstance(sentence, str) and getattr(tokenizer, "use_fast", False) and not tokenizer.stopwords:
+        encoded = tokenizer.encode_batch([sentence], max_seq_len, vocab.BOS_ID, vocab.EOS_ID)
+        if encoded["lengths"][0] < 1:
+            return None
+        return encoded["ids"][0], encoded["mask"][0]
     import torch
     if tokenizer is None:
         token_ids = sentence
@@ -29,14 +37,7 @@ def format_sentence(sentence, vocab, tokenizer=None, max_seq_len=50):
         else:
             tokens = sentence
         if not isinstance(sentence[0], int):
-            if len(tokens) > max_seq_len - 2:
-                tokens_bak = copy.deepcopy(tokens)
-                tokens = list(tokens)
-                while len(tokens) > 0 and tokens[-1][-1] in punctuation:
-                    tokens.pop()
-                if len(tokens) < 1:
-                    tokens = tokens_bak
-            token_ids = vocab.words2id(tokens)
+            token_ids = vocab.words2id(_trim_punctuation(tokens, max_seq_len - 2))
         token_ids = token_ids[:max_seq_len-2]
     if isinstance(token_ids, torch.Tensor):
         token_ids = token_ids.cpu().detach().numpy()
@@ -50,6 +51,124 @@ def format_sentence(sentence, vocab, tokenizer=None, max_seq_len=50):
     sentence_mask[:seq_len] = 1
     return sentence, sentence_mask
 
+
+def _trim_punctuation(tokens, max_len):
+    '''
+        remove the ending punctuations of a too long token list, keep the tokens if nothing left
+    '''
+    if len(tokens) <= max_len:
+        return tokens
+    n = len(tokens)
+    while n > 0 and tokens[n-1][-1] in punctuation:
+        n -= 1
+    return tokens[:n] if n > 0 else tokens
+
+
+def format_sentences(sentences, vocab, tokenizer=None, max_seq_len=50, bucket_size=None, return_tensors=None):
+    """
+        Batch version of format_sentence, write token ids of sentences directly to preallocated int32 id and mask matrices
+
+        Input:
+            - sentences: list of string, list of token lists, or list of token id lists if tokenizer is None
+            - vocab:  instance of nlptools.text.vocab
+            - tokenizer:  instance of nlptools.text.tokenizer, default is None. If it is a BERT/GPT2 tokenizer with use_fast=True and without stopwords, the ids will come from its fast tokenizer directly
+            - max_seq_len: int, default is 50
+            - bucket_size: int, if not None, sentences will be sorted by length and split to buckets with bucket_size sentences, each bucket is padded to its longest sentence. Default is None
+            - return_tensors: 'pt' will return torch tensors, default is None for numpy arrays
+
+        Output:
+            - if bucket_size is None: id matrix (N, max_seq_len) and mask matrix (N, max_seq_len). Empty sentence will only have BOS and EOS
+            - else: list of (indexes, id matrix, mask matrix) for each bucket, indexes are the positions of bucket rows in input
+    """
+    max_len = max_seq_len - 2
+    if tokenizer is not None and getattr(tokenizer, "use_fast", False) and not tokenizer.stopwords:
+        seqs = tokenizer.tokenizer(list(sentences), add_special_tokens=False, truncation=True, max_length=max_len, return_attention_mask=False, return_token_type_ids=False)["input_ids"]
+    else:
+        seqs = []
+        for sentence in sentences:
+            tokens = sentence
+            if tokenizer is not None:
+                if isinstance(sentence, str):
+                    tokens = tokenizer(sentence)
+                if len(tokens) > 0 and isinstance(tokens[0], str):
+                    tokens = vocab.words2id(_trim_punctuation(tokens, max_len))
+            seqs.append(tokens[:max_len])
+
+    def output(seqs, seq_len):
+        encoded = pad_ids(seqs, seq_len, vocab.BOS_ID, vocab.EOS_ID)
+        if return_tensors == "pt":
+            import torch
+            return torch.from_numpy(encoded["ids"]).long(), torch.from_numpy(encoded["mask"])
+        return encoded["ids"], encoded["mask"]
+
+    if bucket_size is None:
+        return output(seqs, max_seq_len)
+    lengths = numpy.fromiter((len(x) for x in seqs), 'int64', len(seqs))
+    order = numpy.argsort(lengths, kind="stable")
+    buckets = []
+    for i in range(0, len(order), bucket_size):
+        indexes = order[i:i+bucket_size]
+        buckets.append((indexes, *output([seqs[j] for j in indexes], int(lengths[indexes].max()) + 2)))
+    return buckets
+
+
+def pad_ids(seqs, max_seq_len, bos_id=None, eos_id=None, offsets=None):
+    '''
+        Write token id sequences to a padded id matrix and mask matrix, without python loop over tokens
+
+        Input:
+            - seqs: list of token id lists, each length should be no more than max_seq_len minus the number of bos/eos
+            - max_seq_len: int
+            - bos_id: int, added to the begin of each sequence if not None, default is None
+            - eos_id: int, added to the end of each sequence if not None, default is None
+            - offsets: list of (start, end) lists with same shape as seqs, default is None
+
+        Output: dictionary with keys:
+            - ids: int32 array (N, max_seq_len), padded with 0
+            - mask: int32 array (N, max_seq_len)
+            - lengths: int array, number of token ids in each sequence, without bos/eos
+            - offsets: int32 array (N, max_seq_len, 2), (0, 0) for bos/eos and paddings. Only if offsets is not None
+    '''
+    n = len(seqs)
+    lengths = numpy.fromiter((len(x) for x in seqs), 'int64', n)
+    total = int(lengths.sum())
+    start = 0 if bos_id is None else 1
+    rows = numpy.repeat(numpy.arange(n), lengths)
+    cols = numpy.arange(total) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths) + start
+    ids = numpy.zeros((n, max_seq_len), 'int32')
+    ids[rows, cols] = numpy.fromiter(chain.from_iterable(seqs), 'int32', total)
+    if bos_id is not None:
+        ids[:, 0] = bos_id
+    if eos_id is not None:
+        ids[numpy.arange(n), lengths + start] = eos_id
+    seq_len = lengths + start + (0 if eos_id is None else 1)
+    mask = (numpy.arange(max_seq_len) < seq_len[:, None]).astype('int32')
+    encoded = {"ids": ids, "mask": mask, "lengths": lengths}
+    if offsets is not None:
+        encoded["offsets"] = numpy.zeros((n, max_seq_len, 2), 'int32')
+        if total > 0:
+            encoded["offsets"][rows, cols] = numpy.array(list(chain.from_iterable(offsets)), 'int32').reshape(-1, 2)
+    return encoded
+
+
+_worker_tokenizer = None
+
+def _init_worker(config):
+    '''
+        rebuild the tokenizer from config once in each worker process
+    '''
+    global _worker_tokenizer
+    _worker_tokenizer = Tokenizer(**config)
+
+
+def _seg_chunk(chunk):
+    '''
+        tokenize a chunk of sentences in worker process
+    '''
+    sentences, args = chunk
+    return [_worker_tokenizer.seg(s, **args)['tokens'] for s in sentences]
+
+
 class Tokenizer_Base(object):
     '''
         Parent class for other tokenizer classes, please don't use this class directly
@@ -57,41 +176,177 @@ class Tokenizer_Base(object):
         Input:
             - stopwords_path: the path of stopwords, default is None
             - ner_name_replace: dictionary, replace the entity name to the mapped name. Default is None
+            - cache_size: int, if larger than 0, the results of *seg* will be cached in a LRU cache with this size, keyed by tokenizer class, tokenizer config, the loaded stopwords, sentence and all seg arguments. Default is 0
+            - cache_path: string, sqlite file path used as a shared on-disk backing of the cache, only used when cache_size > 0. Different tokenizers can share one file. Default is None
+            - cache_disk_size: int, max number of entries in the sqlite file, default is None (no limit)
     '''
-    def __init__(self, stopwords_path = None, ner_name_replace = None):
-        self.stopwords = {}
+    support_offsets = False
+
+    def __init__(self, stopwords_path = None, ner_name_replace = None, cache_size = 0, cache_path = None, cache_disk_size = None):
+        self.stopwords = frozenset()
         self.ner_name_replace = {} if ner_name_replace is None else ner_name_replace
         self.__loadStopwords(stopwords_path)
         self.config = {"stopwords_path": stopwords_path,
-                "ner_name_replace": ner_name_replace} 
+                "ner_name_replace": ner_name_replace,
+                "cache_size": cache_size,
+                "cache_path": cache_path,
+                "cache_disk_size": cache_disk_size} 
+        self.cache = None
+        if cache_size > 0:
+            self.cache = LRUCache(cache_size, cache_path, cache_disk_size)
+            self.seg = self.__cached(self.seg)
 
 
     def __loadStopwords(self, stopwords_path):
         if stopwords_path is not None and os.path.exists(stopwords_path):
             with open(stopwords_path, encoding='utf-8') as f:
-                for i in f.readlines():
-                    self.stopwords[i.strip()] = ''
+                self.stopwords = frozenset(i.strip() for i in f)
+
+
+    def __cached(self, seg):
+        signature = inspect.signature(seg)
+        # digest of the loaded stopwords, recomputed when the set is replaced or its size changes
+        stopwords_digest = [None, -1, ""]
+        def cached_seg(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            stopwords = self.stopwords
+            if stopwords is not stopwords_digest[0] or len(stopwords) != stopwords_digest[1]:
+                digest = hashlib.sha1("\n".join(sorted(stopwords)).encode("utf-8")).hexdigest()
+                stopwords_digest[:] = [stopwords, len(stopwords), digest]
+            # config is completed by subclasses after this wrapper is built, so read it per call
+            config = tuple((k, v) for k, v in self.config.items() if not k.startswith("cache_"))
+            key = repr((type(self).__name__, config, stopwords_digest[2], tuple(bound.arguments.items())))
+            infos = self.cache.get(key)
+            if infos is None:
+                infos = seg(*args, **kwargs)
+                self.cache.set(key, infos)
+            return {k: list(v) for k, v in infos.items()}
+        cached_seg.__doc__ = seg.__doc__
+        return cached_seg
+
+
+    def pool(self, n_process=None, batch_size=100, max_pending=None):
+        '''
+            start persistent worker processes with this tokenizer, see Tokenizer_Pool
+
+            Input:
+                - n_process: int, number of worker processes, default is None (cpu_count - 2)
+                - batch_size: int, number of sentences sent to a worker per batch, default is 100
+                - max_pending: int, max number of batches in flight, default is None (2 * n_process)
+
+            Output:
+                - Tokenizer_Pool instance
+        '''
+        return Tokenizer_Pool(self.config, n_process, batch_size, max_pending)
+
+
+    def cache_info(self):
+        '''
+            return the cache counters of *seg*, None if cache is disabled
+
+            Output: dictionary with keys hits, misses, disk_hits, size, maxsize
+        '''
+        if self.cache is None:
+            return None
+        return self.cache.info()
 
 
     def __call__(self, sentence, batch=False):
-        if batch: return numpy.asarray([self.seg(s)['tokens'] for s in sentence], dtype=numpy.object)
+        if batch: return numpy.asarray([self.seg(s)['tokens'] for s in sentence], dtype=object)
         return self.seg(sentence)['tokens']
 
+    def pipe(self, sentences, n_process=None, batch_size=1000, **args):
+        '''
+            tokenize an iterable of sentences with a process pool, the tokenizer is rebuilt from *config* in each worker
+
+            Input:
+                - sentences: any iterable of string, will be consumed lazily
+                - n_process: int, number of worker processes, default is None (cpu_count - 2). If 1, will tokenize in current process
+                - batch_size: int, number of sentences sent to a worker per chunk, default is 1000
+                - **args: any arguments for *seg*, like remove_stopwords
+
+            Output: generator of token lists, in the same order as input
+        '''
+        if n_process is None:
+            n_process = max(multiprocessing.cpu_count()-2, 1)
+        sentences = iter(sentences)
+        chunks = iter(lambda: list(islice(sentences, batch_size)), [])
+        if n_process < 2:
+            for chunk in chunks:
+                for s in chunk:
+                    yield self.seg(s, **args)['tokens']
+            return
+        # keep a bounded number of chunks in flight, so the input is not read into memory at once
+        max_pending = n_process * 2
+        pending = deque()
+        with multiprocessing.Pool(n_process, initializer=_init_worker, initargs=(self.config,)) as pool:
+            for chunk in chunks:
+                pending.append(pool.apply_async(_seg_chunk, ((chunk, args),)))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+
     def tokens2sentence(self, tokens):
         return " ".join(tokens)
 
 
-class Tokenizer_CoreNLP(Tokenizer_Base):
+class Tokenizer_Http(Tokenizer_Base):
+    '''
+        Parent class for tokenizers calling a http server, requests share a keep-alive session pool with timeouts and retries. Please don't use this class directly
+
+        Input:
+            - timeout: float, request timeout in seconds, default is 30
+            - retries: int, retry times for connection errors and 5xx responses, default is 3
+            - pool_size: int, max keep-alive connections to the server, should be no less than n_concurrent in seg_batch. Default is 10
+            - stopwords_path: the path of stopwords, default is None
+            - ner_name_replace: dictionary, replace the entity name to the mapped name. Default is None
+    '''
+    def __init__(self, timeout=30, retries=3, pool_size=10, **args):
+        Tokenizer_Base.__init__(self, **args)
+        config = {"timeout": timeout, "retries": retries, "pool_size": pool_size}
+        self.config = {**config, **self.config}
+        self.timeout = timeout
+        self.session = get_session(pool_size, retries)
+
+    def seg_batch(self, sentences, n_concurrent=8, **args):
+        '''
+            segment a batch of sentences, keep n_concurrent requests in flight against the server
+
+            Input:
+                - sentences: iterable of string
+                - n_concurrent: int, number of concurrent requests, default is 8
+                - **args: any arguments for *seg*
+
+            Output: generator of dictionaries from *seg*, in the same order as input
+        '''
+        pending = deque()
+        with ThreadPool(n_concurrent) as pool:
+            for s in sentences:
+                pending.append(pool.apply_async(self.seg, (s,), args))
+                if len(pending) >= n_concurrent * 2:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+
+
+class Tokenizer_CoreNLP(Tokenizer_Http):
     '''
         Stanford CoreNLP wrapper, Please check `stanford CoreNLP <https://stanfordnlp.github.io/CoreNLP/>`_ for more details
 
         Input:
             - corenlp_url: corenlp api url
+            - timeout: float, request timeout in seconds, default is 30
+            - retries: int, retry times for connection errors and 5xx responses, default is 3
+            - pool_size: int, max keep-alive connections to the server, default is 10
             - stopwords_path: the path of stopwords, default is None
             - ner_name_replace: dictionary, replace the entity name to the mapped name. Default is None
     '''
     def __init__(self, corenlp_url, **args):
-        Tokenizer_Base.__init__(self, **args)
+        Tokenizer_Http.__init__(self, **args)
+        config = {"tokenizer": "corenlp", "corenlp_url": corenlp_url}
+        self.config = {**config, **self.config}
         self.server_url = corenlp_url
 
     def _annotate(self, text, properties=None):
@@ -101,12 +356,12 @@ class Tokenizer_CoreNLP(Tokenizer_Base):
         else:
             assert isinstance(properties, dict)
 
-        r = requests.post(self.server_url, params={'properties': str(properties)}, data=text.encode('utf-8'), headers={'Connection': 'close'})
+        r = self.session.post(self.server_url, params={'properties': str(properties)}, data=text.encode('utf-8'), timeout=self.timeout)
         output = r.text
         if ('outputFormat' in properties
              and properties['outputFormat'] == 'json'):
             try:
-                output = json.loads(output, encoding='utf-8', strict=True)
+                output = json.loads(output, strict=True)
             except:
                 pass
         return output
@@ -118,11 +373,11 @@ class Tokenizer_CoreNLP(Tokenizer_Base):
         return self.regex('/semgrex', text, pattern, filter)
 
     def regex(self, endpoint, text, pattern, filter):
-        r = requests.get(
+        r = self.session.get(
             self.server_url + endpoint, params={
                 'pattern':  pattern,
                 'filter': filter
-            }, data=text)
+            }, data=text, timeout=self.timeout)
         output = r.text
         try:
             output = json.loads(r.text)
@@ -181,6 +436,8 @@ class Tokenizer_Spacy(Tokenizer_Base):
     def __init__(self, spacy_model='en', spacy_pipes=None, model_path=None, **args):
         import spacy
         super().__init__(**args)
+        config = {"tokenizer": "spacy", "spacy_model": spacy_model, "spacy_pipes": spacy_pipes, "model_path": model_path}
+        self.config = {**config, **self.config}
         disabled_pipelines = ['tagger', 'parser', 'ner', 'textcat', 'entity_ruler', 'sentencizer']
         if spacy_pipes is not None:
             disabled_pipelines = list(set(disabled_pipelines) - set(spacy_pipes))
@@ -198,37 +455,26 @@ class Tokenizer_Spacy(Tokenizer_Base):
         self.nlp.add_pipe(custom_pipe, **args)
 
 
-    def entities(self, sentence):
+    support_offsets = True
+
+    def _doc2entities(self, doc, offsets=False):
         entities = []
-        for ent in self.nlp(sentence).ents:
+        for ent in doc.ents:
             label = ent.label_
             if label in self.ner_name_replace:
                 label = self.ner_name_replace[label]
-            entities.append((label_, ent.text))
+            if offsets:
+                entities.append((label, ent.text, ent.start_char, ent.end_char))
+            else:
+                entities.append((label, ent.text))
         return entities
 
 
-    def seg(self, sentence, remove_stopwords = True, tags_filter = None, entities_filter = None, pos_filter = None, dep_filter=None):
-        ''' segment sentence to words
-            
-            Input:
-                - sentence: string
-                - remove_stopwords: bool, default is True
-                - tags_filter: string list, will only main special tag tokens, default is None
-                - entities_filter: string list, will only remain the entity tokens, default is None
-                - pos_filter: string list, will only remain special pos tokens, default is None
-                - dep_filter: string list, will only remain special dep tokens, default is None
-
-            Output: dictionary with keys:
-                - tokens: list of tokens
-                - tags: list of detailed part-of-speech tags
-                - texts: list of raw texts
-                - entities: list of entities from NER
-                - pos: list of simple part-of-speech tags
-                - dep: list of syntactic dependency
-        '''
+    def _doc2infos(self, doc, remove_stopwords = True, tags_filter = None, entities_filter = None, pos_filter = None, dep_filter=None, offsets=False):
         infos = {"tokens":[], "tags":[], "texts":[], "entities":[], "pos":[], "dep":[]}
-        for token in self.nlp(sentence):
+        if offsets:
+            infos["offsets"] = []
+        for token in doc:
             if remove_stopwords and token.text in self.stopwords:
                 continue
             if tags_filter is not None and token.tag_ not in tags_filter:
@@ -239,7 +485,7 @@ class Tokenizer_Spacy(Tokenizer_Base):
                 continue
             entity = token.ent_type_
             if entity in self.ner_name_replace:
-                entitiy = self.ner_name_replace[entity]
+                entity = self.ner_name_replace[entity]
             if entities_filter is not None and entity not in entities_filter:
                 continue
             if len(token.lemma_)<1:
@@ -252,9 +498,95 @@ class Tokenizer_Spacy(Tokenizer_Base):
             infos["entities"].append(entity)
             infos["pos"].append(token.pos_)
             infos["dep"].append(token.dep_)
-            
+            if offsets:
+                start = token.idx + len(token.text) - len(token.text.lstrip())
+                infos["offsets"].append((start, start + len(txt)))
         return infos
 
+
+    def _pipe(self, sentences, batch_size, n_process, disable):
+        args = {"batch_size": batch_size, "disable": [p for p in disable if p in self.nlp.pipe_names]}
+        if n_process != 1:
+            args["n_process"] = n_process
+        return self.nlp.pipe(sentences, **args)
+
+
+    def entities(self, sentence, offsets=False):
+        '''
+            return entities
+
+            Input:
+                - sentence: string
+                - offsets: bool, if True will also return the start and end character offsets, default is False
+
+            Output:
+                - list of (entityname, text), or (entityname, text, start, end) if offsets is True
+        '''
+        return self._doc2entities(self.nlp(sentence), offsets)
+
+
+    def entities_batch(self, sentences, batch_size=1000, n_process=1, offsets=False):
+        '''
+            return entities for a batch of sentences via spacy's nlp.pipe, the tagger and parser are disabled
+
+            Input:
+                - sentences: iterable of string
+                - batch_size: int, spacy pipe batch size, default is 1000
+                - n_process: int, spacy pipe process number, default is 1
+                - offsets: bool, if True will also return the start and end character offsets, default is False
+
+            Output: generator of entity lists, same as *entities*
+        '''
+        for doc in self._pipe(sentences, batch_size, n_process, ["tagger", "parser"]):
+            yield self._doc2entities(doc, offsets)
+
+
+    def seg(self, sentence, remove_stopwords = True, tags_filter = None, entities_filter = None, pos_filter = None, dep_filter=None, offsets=False):
+        ''' segment sentence to words
+            
+            Input:
+                - sentence: string
+                - remove_stopwords: bool, default is True
+                - tags_filter: string list, will only main special tag tokens, default is None
+                - entities_filter: string list, will only remain the entity tokens, default is None
+                - pos_filter: string list, will only remain special pos tokens, default is None
+                - dep_filter: string list, will only remain special dep tokens, default is None
+                - offsets: bool, if True will also return character offsets of texts, default is False
+
+            Output: dictionary with keys:
+                - tokens: list of tokens
+                - tags: list of detailed part-of-speech tags
+                - texts: list of raw texts
+                - entities: list of entities from NER
+                - pos: list of simple part-of-speech tags
+                - dep: list of syntactic dependency
+                - offsets: list of (start, end) in sentence, only if offsets is True
+        '''
+        return self._doc2infos(self.nlp(sentence), remove_stopwords, tags_filter, entities_filter, pos_filter, dep_filter, offsets)
+
+
+    def seg_batch(self, sentences, remove_stopwords = True, tags_filter = None, entities_filter = None, pos_filter = None, dep_filter=None, offsets=False, batch_size=1000, n_process=1, outputs=None):
+        ''' segment a batch of sentences via spacy's nlp.pipe
+
+            Input:
+                - sentences: iterable of string
+                - batch_size: int, spacy pipe batch size, default is 1000
+                - n_process: int, spacy pipe process number, default is 1
+                - outputs: list of extra outputs needed besides tokens, texts, tags and pos, can include 'dep' and 'entities'. The parser is only run if 'dep' is in outputs or dep_filter is given, and the ner only if 'entities' is in outputs or entities_filter is given, otherwise the related fields are empty strings. The tagger is always kept since tokens are lemmas. Default is None, pass ['dep', 'entities'] to get the same output as *seg*
+                - other parameters are same as *seg*
+
+            Output: generator of dictionaries, same as *seg*
+        '''
+        outputs = set() if outputs is None else set(outputs)
+        disable = []
+        if dep_filter is None and "dep" not in outputs:
+            disable.append("parser")
+        if entities_filter is None and "entities" not in outputs:
+            disable.append("ner")
+        for doc in self._pipe(sentences, batch_size, n_process, disable):
+            yield self._doc2infos(doc, remove_stopwords, tags_filter, entities_filter, pos_filter, dep_filter, offsets)
+
+
 class Tokenizer_Jieba(Tokenizer_Base):
     '''
         Jieba wrapper, Please check `Jieba <https://github.com/fxsjy/jieba>`_ for more details
@@ -266,20 +598,39 @@ class Tokenizer_Jieba(Tokenizer_Base):
     def __init__(self, seg_dict_path=None, **args):
         import jieba
         Tokenizer_Base.__init__(self, **args)
+        config = {"tokenizer": "jieba", "seg_dict_path": seg_dict_path}
+        self.config = {**config, **self.config}
         if seg_dict_path is not None:
             jieba.load_userdict(seg_dict_path)
         self.nlp = jieba
 
-    def seg(self, sentence, remove_stopwords=True):
+    support_offsets = True
+
+    def seg(self, sentence, remove_stopwords=True, offsets=False):
         ''' segment sentence to words
             
             Input:
                 - sentence: string
                 - remove_stopwords: bool, default is True
+                - offsets: bool, if True will also return character offsets of tokens via jieba.tokenize, default is False
 
             Output: dictionary with keys:
                 - tokens: list of tokens
+                - offsets: list of (start, end) in sentence, only if offsets is True
         '''
+        if offsets:
+            # replace each char separately to keep the positions
+            sentence = re.sub(r"[^\w\d]", " ", sentence)
+            tokens, spans = [], []
+            for x, start, end in self.nlp.tokenize(sentence):
+                x = x.strip()
+                if remove_stopwords and x in self.stopwords:
+                    continue
+                if len(x)<1:
+                    continue
+                tokens.append(x)
+                spans.append((start, end))
+            return {"tokens":tokens, "offsets":spans}
         sentence = re.sub(r"[^\w\d]+", " ", sentence)
         tokens = []
         for x in self.nlp.cut(sentence, cut_all=False):
@@ -306,6 +657,8 @@ class Tokenizer_LTP(Tokenizer_Base):
     '''
     def __init__(self, cws_model_path, pos_model_path, ner_model_path, parser_model_path, **args):
         Tokenizer_Base.__init__(self, **args)
+        config = {"tokenizer": "ltp", "cws_model_path": cws_model_path, "pos_model_path": pos_model_path, "ner_model_path": ner_model_path, "parser_model_path": parser_model_path}
+        self.config = {**config, **self.config}
         from pyltp import Segmentor, Postagger, NamedEntityRecognizer, Parser
         self.seg_ins = Segmentor()
         self.seg_ins.load(cws_model_path)
@@ -325,12 +678,24 @@ class Tokenizer_LTP(Tokenizer_Base):
                     self.ner_ins[-1].load(path)
             except Exception as err:
                 print(err)
+        self._released = False
 
-    def __del__(self):
+    def release(self):
+        '''
+            release the loaded models
+        '''
+        if getattr(self, "_released", True):
+            return
         self.seg_ins.release()
         self.pos_ins.release()
         for n in self.ner_ins:
             n.release()
+        if self.parser_ins is not None:
+            self.parser_ins.release()
+        self._released = True
+
+    def __del__(self):
+        self.release()
 
     def seg(self, sentence, remove_stopwords = True, tags_filter = None, entities_filter = None, entityjoin=False):
         ''' segment sentence to words
@@ -426,6 +791,8 @@ class Tokenizer_Mecab(Tokenizer_Base):
         import MeCab
         self.mecab_ins = MeCab.Tagger('-d %s ' % seg_dict_path)
         Tokenizer_Base.__init__(self, **args)
+        config = {"tokenizer": "mecab", "seg_dict_path": seg_dict_path}
+        self.config = {**config, **self.config}
 
     
     def seg(self, sentence, remove_stopwords=True, tags_filter=None):
@@ -465,22 +832,27 @@ class Tokenizer_Mecab(Tokenizer_Base):
         return {"tokens":tokens, "tags":tags}
     
 
-class Tokenizer_Rest(Tokenizer_Base):
+class Tokenizer_Rest(Tokenizer_Http):
     '''
         Tokenizer use rest_api
         
         Input:
             - tokenizer: rest_api for tokenizer
+            - timeout: float, request timeout in seconds, default is 30
+            - retries: int, retry times for connection errors and 5xx responses, default is 3
+            - pool_size: int, max keep-alive connections to the server, default is 10
             - stopwords_path: the path of stopwords, default is None
             - ner_name_replace: dictionary, replace the entity name to the mapped name. Default is None
     '''
     def __init__(self, tokenizer, **args):
-        Tokenizer_Base.__init__(self, **args)
+        Tokenizer_Http.__init__(self, **args)
+        config = {"tokenizer": tokenizer}
+        self.config = {**config, **self.config}
         self.rest_url = tokenizer
     
     def seg(self, sentence, remove_stopwords = True, tags_filter = None, entities_filter = None, pos_filter = None, dep_filter=None):
         txts, tokens, entities, pos= [], [], [], []
-        data = restpost(self.rest_url, {'text':sentence})
+        data = restpost(self.rest_url, {'text':sentence}, session=self.session, timeout=self.timeout)
         filtereddata = {}
         for k in data: filtereddata[k] = []
         for i in range(len(data['tokens'])):
@@ -514,27 +886,115 @@ class Tokenizer_Simple(Tokenizer_Base):
     '''
     def __init__(self, tokenizer_regex=None, **args):
         Tokenizer_Base.__init__(self, **args)
+        config = {"tokenizer": "simple", "tokenizer_regex": tokenizer_regex}
+        self.config = {**config, **self.config}
         if tokenizer_regex is None:
             tokenizer_regex = '''[\s\.\:\;\&\'\"\/\\\(\)\[\]\{\}\%\$\#\!\?\^\&\+\`\~（）《》【】「」；：‘“’”？／。、，]'''
         self.re_punc = re.compile(tokenizer_regex)
+        # if the regex is a single character class, match tokens directly with its complement
+        self.re_token, self._lower_first = None, False
+        if re.fullmatch(r'\[[^\^\]](?:\\.|[^\]\\])*\]', tokenizer_regex):
+            inner = tokenizer_regex[1:-1]
+            self.re_token = re.compile('[^' + inner + ']+')
+            # lowercase the whole line before matching only if no letter is used as separator
+            self._lower_first = re.search(r'(?<!\\)[^\W\d_]', inner) is None
     
-    def seg(self, sentence, remove_stopwords = True):
+    support_offsets = True
+
+    def seg(self, sentence, remove_stopwords = True, offsets = False):
         ''' segment sentence to words
             
             Input:
                 - sentence: string
                 - remove_stopwords: bool, default is True
+                - offsets: bool, if True will also return character offsets of tokens, default is False
 
             Output: dictionary with keys:
                 - tokens: list of tokens
+                - offsets: list of (start, end) in sentence, only if offsets is True
         '''
-        tokens = [s.lower() for s in self.re_punc.split(sentence) if len(s)>0]
-        if remove_stopwords:
-            tokens = [s for s in tokens if s not in self.stopwords]
-        return {'tokens': tokens, 'entities':[]}
+        if offsets:
+            tokens, spans = [], []
+            for start, end in self._spans(sentence):
+                token = sentence[start:end].lower()
+                if remove_stopwords and token in self.stopwords:
+                    continue
+                tokens.append(token)
+                spans.append((start, end))
+            return {'tokens': tokens, 'entities':[], 'offsets': spans}
+        return {'tokens': self.seg_lines((sentence,), remove_stopwords)[0], 'entities':[]}
+
+    def _spans(self, sentence):
+        if self.re_token is not None:
+            return [m.span() for m in self.re_token.finditer(sentence)]
+        spans, pos = [], 0
+        for m in self.re_punc.finditer(sentence):
+            if m.start() > pos:
+                spans.append((pos, m.start()))
+            pos = max(pos, m.end())
+        if pos < len(sentence):
+            spans.append((pos, len(sentence)))
+        return spans
+
+    def seg_lines(self, lines, remove_stopwords = True):
+        ''' high-throughput segment for many lines, with one precompiled regex pass per line and lowercasing, stopword removal fused in the same pass
 
+            Input:
+                - lines: list or iterable of string
+                - remove_stopwords: bool, default is True
+
+            Output:
+                - list of token lists
+        '''
+        stopwords = self.stopwords if remove_stopwords else frozenset()
+        if self.re_token is None:
+            split = self.re_punc.split
+            return [[w for w in (t.lower() for t in split(l) if t) if w not in stopwords] for l in lines]
+        findall = self.re_token.findall
+        if self._lower_first:
+            if not stopwords:
+                return [findall(l.lower()) for l in lines]
+            return [[w for w in findall(l.lower()) if w not in stopwords] for l in lines]
+        return [[w for w in (t.lower() for t in findall(l)) if w not in stopwords] for l in lines]
+
+
+class Tokenizer_Transformers(Tokenizer_Base):
+    '''
+        Parent class for tokenizers from huggingface transformers, please don't use this class directly
 
-class Tokenizer_BERT(Tokenizer_Base):
+        Input:
+            - use_fast: bool, use the rust-backed fast tokenizer, which supports encode_batch. Default is False
+            - stopwords_path: the path of stopwords, default is None
+    '''
+    def __init__(self, use_fast=False, **args):
+        Tokenizer_Base.__init__(self, **args)
+        config = {"use_fast": use_fast}
+        self.config = {**config, **self.config}
+        self.use_fast = use_fast
+
+    def encode_batch(self, sentences, max_seq_len=50, bos_id=None, eos_id=None):
+        '''
+            Encode a batch of sentences to padded arrays via the fast tokenizer, need use_fast=True
+
+            Input:
+                - sentences: list of string
+                - max_seq_len: int, sequences will be truncated to this length including bos/eos, default is 50
+                - bos_id: int, added to the begin of each sequence if not None, default is None
+                - eos_id: int, added to the end of each sequence if not None, default is None
+
+            Output: dictionary with keys:
+                - ids: int32 array (N, max_seq_len), padded with 0
+                - mask: int32 array (N, max_seq_len)
+                - offsets: int32 array (N, max_seq_len, 2), character offsets of each id in raw sentence
+                - lengths: int array, number of token ids in each sequence, without bos/eos
+        '''
+        assert self.use_fast, "encode_batch needs use_fast=True"
+        max_len = max_seq_len - (bos_id is not None) - (eos_id is not None)
+        encoded = self.tokenizer(list(sentences), add_special_tokens=False, truncation=True, max_length=max_len, return_offsets_mapping=True, return_attention_mask=False, return_token_type_ids=False)
+        return pad_ids(encoded["input_ids"], max_seq_len, bos_id, eos_id, encoded["offset_mapping"])
+
+
+class Tokenizer_BERT(Tokenizer_Transformers):
     '''
         use BERT tokenizer, with wordpiece
 
@@ -546,28 +1006,82 @@ class Tokenizer_BERT(Tokenizer_Base):
                 - bert-base-multilingual
                 - bert-base-chinese
             - do_lower_case: default True
+            - use_fast: bool, use the rust-backed BertTokenizerFast, which supports encode_batch. Default is False
     '''
     def __init__(self, bert_model_name, do_lower_case=True, **args):
-        from transformers import BertTokenizer 
-        Tokenizer_Base.__init__(self, **args)
-        config = {"bert_model_name": bert_model_name, "do_lower_case": do_lower_case}
+        from transformers import BertTokenizer, BertTokenizerFast
+        Tokenizer_Transformers.__init__(self, **args)
+        config = {"tokenizer": "bert", "bert_model_name": bert_model_name, "do_lower_case": do_lower_case}
         self.config = {**config, **self.config}
-        self.tokenizer = BertTokenizer.from_pretrained(bert_model_name, do_lower_case=do_lower_case)
+        self.do_lower_case = do_lower_case
+        tokenizer_class = BertTokenizerFast if self.use_fast else BertTokenizer
+        self.tokenizer = tokenizer_class.from_pretrained(bert_model_name, do_lower_case=do_lower_case)
 
-    def seg(self, sentence, remove_stopwords = True):
+    support_offsets = True
+
+    def seg(self, sentence, remove_stopwords = True, offsets = False):
         ''' segment sentence to words
             
             Input:
                 - sentence: string
                 - remove_stopwords: bool, default is True
+                - offsets: bool, if True will also return character offsets of wordpieces, default is False
 
             Output: dictionary with keys:
                 - tokens: list of tokens
+                - offsets: list of (start, end) in sentence, only if offsets is True
         '''
-        tokens =  self.tokenizer.tokenize(sentence)
+        if offsets and self.use_fast:
+            encoded = self.tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)
+            tokens = self.tokenizer.convert_ids_to_tokens(encoded["input_ids"])
+            spans = [tuple(x) for x in encoded["offset_mapping"]]
+        else:
+            tokens = self.tokenizer.tokenize(sentence)
+            if offsets:
+                spans = self._align(sentence, tokens)
+        if offsets:
+            if remove_stopwords:
+                keep = [i for i, t in enumerate(tokens) if not t in self.stopwords]
+                tokens, spans = [tokens[i] for i in keep], [spans[i] for i in keep]
+            return {'tokens':tokens, 'entities':[], 'offsets':spans}
         if remove_stopwords:
             tokens = [t for t in tokens if not t in self.stopwords]
         return {'tokens':tokens, 'entities':[]}
+
+    def _align(self, sentence, tokens):
+        '''
+            align wordpieces to character offsets of raw sentence
+        '''
+        # normalize the sentence like BERT basic tokenizer, and keep the raw position of each normalized character
+        chars, index = [], []
+        for i, c in enumerate(sentence):
+            if self.do_lower_case:
+                c = unicodedata.normalize("NFD", c.lower())
+                c = "".join(x for x in c if unicodedata.category(x) != "Mn")
+            chars.append(c)
+            index += [i] * len(c)
+        text = "".join(chars)
+        index.append(len(sentence))
+        spans, pos = [], 0
+        for t in tokens:
+            if t.startswith("##"):
+                t = t[2:]
+            start = -1 if t == self.tokenizer.unk_token else text.find(t, pos)
+            if start < 0:
+                # unknown token covers the rest of current word
+                while pos < len(text) and text[pos].isspace():
+                    pos += 1
+                end = pos + 1
+                while end < len(text) and not text[end].isspace() and not unicodedata.category(text[end]).startswith("P"):
+                    end += 1
+                end = min(end, len(text))
+                spans.append((index[pos], index[end]))
+                pos = end
+                continue
+            end = start + len(t)
+            spans.append((index[start], index[end-1]+1))
+            pos = end
+        return spans
    
     @property
     def vocab(self):
@@ -593,17 +1107,21 @@ class Tokenizer_BERT(Tokenizer_Base):
                 new_tokens.append(t)
         return " ".join(new_tokens)
 
-class Tokenizer_GPT2(Tokenizer_Base):
+class Tokenizer_GPT2(Tokenizer_Transformers):
     '''
         use GPT2 tokenizer, with byte-level BPE
 
         Input:
             - model_name: vocab file location or one of the supported model name:
+            - use_fast: bool, use the rust-backed GPT2TokenizerFast, which supports encode_batch. Default is False
     '''
     def __init__(self, model_name, **args):
-        from transformers import GPT2LMHeadModel, GPT2Tokenizer
-        Tokenizer_Base.__init__(self, **args)
-        self.tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+        from transformers import GPT2Tokenizer, GPT2TokenizerFast
+        Tokenizer_Transformers.__init__(self, **args)
+        config = {"tokenizer": "gpt2", "model_name": model_name}
+        self.config = {**config, **self.config}
+        tokenizer_class = GPT2TokenizerFast if self.use_fast else GPT2Tokenizer
+        self.tokenizer = tokenizer_class.from_pretrained(model_name)
 
     def seg(self, sentence, remove_stopwords = True):
         ''' segment sentence to words
@@ -626,7 +1144,7 @@ class Tokenizer_GPT2(Tokenizer_Base):
             return a nlptools.text.vocab instance, converted from BERT pretrained model
         '''
         from .vocab import Vocab
-        vocab = Vocab.load_from_dict(self.tokenizer.encoder)
+        vocab = Vocab.load_from_dict(self.tokenizer.get_vocab())
         return vocab
 
 
@@ -640,27 +1158,157 @@ class Tokenizer_Char(Tokenizer_Base):
     '''
     def __init__(self, **args):
         Tokenizer_Base.__init__(self, **args)
+        config = {"tokenizer": "char"}
+        self.config = {**config, **self.config}
 
-    def seg(self, sentence, remove_stopwords = True):
+    support_offsets = True
+
+    def seg(self, sentence, remove_stopwords = True, offsets = False):
         ''' segment sentence to characters
             
             Input:
                 - sentence: string
                 - remove_stopwords: bool, default is True
+                - offsets: bool, if True will also return character offsets, default is False
 
             Output: dictionary with keys:
                 - tokens: list of characters
+                - offsets: list of (start, end) in sentence, only if offsets is True
         '''
-        tokens = []
-        for s in sentence:
+        tokens, spans = [], []
+        for i, s in enumerate(sentence):
             s = s.strip().lower()
             if len(s) < 1: continue
             if remove_stopwords and s in self.stopwords:
                 continue
             tokens.append(s)
+            spans.append((i, i+1))
+        if offsets:
+            return {'tokens': tokens, 'entities': [], 'offsets': spans}
         return {'tokens': tokens, 'entities': []}
 
 
+def _pool_worker(config, inputs, outputs):
+    '''
+        worker loop of Tokenizer_Pool, the models are loaded once per worker
+    '''
+    try:
+        tokenizer = Tokenizer(**config)
+    except Exception as err:
+        outputs.put((None, err))
+        return
+    try:
+        while True:
+            task = inputs.get()
+            if task is None:
+                break
+            batch_id, sentences, args = task
+            try:
+                outputs.put((batch_id, [tokenizer.seg(s, **args) for s in sentences]))
+            except Exception as err:
+                outputs.put((batch_id, err))
+    finally:
+        if hasattr(tokenizer, "release"):
+            tokenizer.release()
+
+
+class Tokenizer_Pool(object):
+    '''
+        Persistent worker processes for tokenizers with slow model loading, like ltp and mecab. Each worker builds the tokenizer from config once, then segments the sentence batches sent over a queue
+
+        Input:
+            - config: dictionary, tokenizer config like Tokenizer_Base.config, or the parameters of Tokenizer
+            - n_process: int, number of worker processes, default is None (cpu_count - 2)
+            - batch_size: int, number of sentences sent to a worker per batch, default is 100
+            - max_pending: int, max number of batches in flight, the input iterable will not be read further until a batch returns. Default is None (2 * n_process)
+
+        Usage:
+            - pool.seg_batch(sentences, **args): generator of seg outputs, in the same order as input. Not thread safe
+            - pool.release(): stop the workers and release the models, also called when leaving a with block
+    '''
+    def __init__(self, config, n_process=None, batch_size=100, max_pending=None):
+        # set first, release() is called from __del__ even if __init__ fails
+        self._workers = []
+        if n_process is None:
+            n_process = max(multiprocessing.cpu_count()-2, 1)
+        self.batch_size = batch_size
+        self.max_pending = 2 * n_process if max_pending is None else max_pending
+        self._inputs = multiprocessing.Queue(self.max_pending)
+        self._outputs = multiprocessing.Queue()
+        # batch ids keep increasing across seg_batch calls, results of an abandoned call are dropped by id
+        self._next_id = 0
+        for i in range(n_process):
+            p = multiprocessing.Process(target=_pool_worker, args=(config, self._inputs, self._outputs), daemon=True)
+            p.start()
+            self._workers.append(p)
+
+    def _collect(self, results, batch_id, first_id):
+        while batch_id not in results:
+            try:
+                i, r = self._outputs.get(timeout=1)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._workers):
+                    raise RuntimeError("tokenizer worker exited unexpectedly")
+                continue
+            if i is not None and i < first_id:
+                # left over from a previous seg_batch call closed early
+                continue
+            if isinstance(r, Exception):
+                raise r
+            results[i] = r
+        return results.pop(batch_id)
+
+    def seg_batch(self, sentences, **args):
+        '''
+            segment sentences in worker processes
+
+            Input:
+                - sentences: any iterable of string, will be consumed lazily
+                - **args: any arguments for *seg*
+
+            Output: generator of dictionaries from *seg*, in the same order as input
+        '''
+        assert len(self._workers) > 0, "pool is released"
+        sentences = iter(sentences)
+        first_id = self._next_id
+        results, submitted, returned = {}, first_id, first_id
+        for chunk in iter(lambda: list(islice(sentences, self.batch_size)), []):
+            self._inputs.put((submitted, chunk, args))
+            submitted += 1
+            self._next_id = submitted
+            while submitted - returned >= self.max_pending:
+                yield from self._collect(results, returned, first_id)
+                returned += 1
+        while returned < submitted:
+            yield from self._collect(results, returned, first_id)
+            returned += 1
+
+    def release(self):
+        '''
+            stop the workers gracefully, the models are released inside each worker
+        '''
+        if len(self._workers) < 1:
+            return
+        for p in self._workers:
+            self._inputs.put(None)
+        for p in self._workers:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
+        self._workers = []
+        self._inputs.close()
+        self._outputs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+
 class Tokenizer(object):
     '''
         Tokenizer tool, integrate with several tools 
@@ -689,7 +1337,7 @@ class Tokenizer(object):
         if tokenizer in tokenizers:
             return tokenizers[tokenizer](**args)
         elif 'http' in tokenizer:
-            return Tokenizer_Rest(**args) 
+            return Tokenizer_Rest(tokenizer, **args) 
         return Tokenizer_Simple(**args)
 
 
@@ -15,18 +15,26 @@ class Corpus(interfaces.CorpusABC):
         Corpus class inherit from gensim.interfaces.CorpusABC
         
         Input:
-            - docbow: format of [(id, tf), ...], can be the output from text.vocab.doc2bow
+            - docbow: list with format of [[(id, tf), ...], ...], or scipy.sparse.csr_matrix with one document per row (the output from text.vocab.corpus2bow). The sparse matrix is streamed row by row without building the tuple lists of all documents
                 
     '''
     def __init__(self, docbow):
         super(Corpus, self).__init__()
         self.docbow = docbow
+        self.sparse = hasattr(docbow, 'indptr')
 
     def __iter__(self):
+        if self.sparse:
+            indptr, indices, data = self.docbow.indptr, self.docbow.indices, self.docbow.data
+            for i in range(self.docbow.shape[0]):
+                yield list(zip(indices[indptr[i]:indptr[i+1]].tolist(), data[indptr[i]:indptr[i+1]].tolist()))
+            return
         for i, db in enumerate(self.docbow):
             yield db
 
     def __len__(self):
+        if self.sparse:
+            return self.docbow.shape[0]
         return len(self.docbow)
 
 
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
-import numpy, os, pandas, re
-from sklearn.metrics.pairwise import pairwise_distances
+import numpy, os, re
 from .tfidf import TFIDF
 from .vocab import Vocab
 
@@ -50,6 +49,7 @@ class VecTFIDF(TFIDF):
             output:
                 - 1d numpy array
         '''
+        from sklearn.metrics.pairwise import pairwise_distances
         if len(sentence_ids) < 1:
             return 0
         if isinstance(word_ids, int):
@@ -107,6 +107,7 @@ class VecTFIDF(TFIDF):
                 - [(score, tfidf), ...], ...
 
         '''
+        import pandas
         corpus_ids = pandas.Series(corpus_ids)
         if self.word_idfs is not None and global_idfs:
             word_idfs = self.word_idfs
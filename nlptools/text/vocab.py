@@ -1,10 +1,69 @@
 #!/usr/bin/env python
-import numpy, os, random, re, copy
-from bidict import bidict
+import numpy, os, random, re, copy, mmap, struct, time, multiprocessing, tempfile
 import unicodedata
+from collections import Counter
 from .embedding import Embedding_Random
+from .wordindex import WordIndex, _SECTIONS
 from ..utils import zload, zdump, normalize, flat_list
 
+# binary vocab format: magic, vocab_size, then (offset, nbytes) for every WordIndex array and id2tf, each section aligned to 8 bytes
+_MAGIC = b'NLPVOCB1'
+_HEADER = struct.Struct('<8sq' + 'qq' * (len(_SECTIONS) + 1))
+# bytes.split() separators, as a lookup table of byte values
+_WHITESPACE = numpy.zeros(256, 'bool')
+_WHITESPACE[list(b' \t\n\r\x0b\x0c')] = True
+
+_worker_tokenizer = None
+
+def _init_count_worker(config):
+    '''
+        rebuild the tokenizer from config once in each worker process, None means split by whitespace
+    '''
+    global _worker_tokenizer
+    if config is None:
+        _worker_tokenizer = None
+    else:
+        from .tokenizer import Tokenizer
+        _worker_tokenizer = Tokenizer(**config)
+
+
+def _count_shard(shard):
+    '''
+        count tokens of the lines starting in byte range [start, end) of a file
+    '''
+    filename, start, end, batch_size = shard
+    counts, nlines = Counter(), 0
+
+    def count(lines):
+        if _worker_tokenizer is None:
+            for l in lines:
+                counts.update(l.split())
+        elif hasattr(_worker_tokenizer, 'seg_lines'):
+            for tokens in _worker_tokenizer.seg_lines(lines):
+                counts.update(tokens)
+        else:
+            for l in lines:
+                counts.update(_worker_tokenizer.seg(l)['tokens'])
+
+    with open(filename, 'rb') as f:
+        if start > 0:
+            # the line crossing *start* belongs to the previous shard
+            f.seek(start - 1)
+            f.readline()
+        lines = []
+        while f.tell() < end:
+            l = f.readline()
+            if not l:
+                break
+            lines.append(l.decode('utf-8', errors='ignore').strip())
+            if len(lines) >= batch_size:
+                count(lines)
+                nlines += len(lines)
+                lines = []
+        count(lines)
+        nlines += len(lines)
+    return counts, nlines, end - start
+
 '''
     Author: Pengjia Zhu (zhupengjia@gmail.com)
 '''
@@ -16,11 +75,13 @@ class Vocab(object):
         Vocab dictionary class, also support to accumulate term frequency, return embedding matrix, sentence to id
 
         Input:
-            - cached_vocab: string, cached vocab file path, default is ''
+            - cached_vocab: string, cached vocab file path, default is ''. Both the pickle format and the binary format (see save) are supported, a binary vocab is memory mapped and frozen
             - vocab_size: int, the dictionary size, default is 1M. If the number<30, then the size is 2**vocab_size, else the size is *vocab_size*.
             - outofvocab: string, the behavior of outofvocab token, default is 'unk'. Two options: 'unk' and 'random'. 'unk' will fill with 'unk', 'random' will fill with a random token
             - embedding: instance of text.embedding, default is None(use random vector)
             - special_char: bool, check if add 4 special characters, default is False
+            - cache_vectors: bool, if True, keep a float32 matrix of word vectors indexed by id for ids2vec. Vectors of new words are fetched when vocab grows, the matrix is rebuilt when words are reindexed (e.g. reduce) or embedding is changed. Default is False
+            - fast_lookup: bool, if True, keep all words in dicts besides the compact WordIndex (see WordIndex.set_fast_lookup). word <-> id lookups are as fast as the old bidict storage, but it uses a bit more memory than bidict. Default is False
 
         Some special operation:
             - __add__: join several vocab together
@@ -33,16 +94,19 @@ class Vocab(object):
     PAD, BOS, EOS, UNK = '[PAD]', '[BOS]', '[EOS]', '[UNK]'
     PAD_ID, BOS_ID, EOS_ID, UNK_ID = 0, 1, 2, 3
 
-    def __init__(self, cached_vocab='', vocab_size=1000000, outofvocab='unk', embedding=None, special_char=True):
+    def __init__(self, cached_vocab='', vocab_size=1000000, outofvocab='unk', embedding=None, special_char=True, cache_vectors=False, fast_lookup=False):
         self.cached_vocab = cached_vocab
+        self.cache_vectors = cache_vectors
+        self.fast_lookup = fast_lookup
+        self._vectors = None
         self.outofvocab = outofvocab
         self._word_spec, self._id_spec = [], []
         self.embedding = embedding if embedding is not None else Embedding_Random()
         self.vocab_size = int(vocab_size)
         if self.vocab_size < 30:
             self.vocab_size = 2**int(self.vocab_size)
-        self._get_cached_vocab()
         self.update=True
+        self._get_cached_vocab()
         if special_char:
             self.addBE()
     
@@ -62,16 +126,37 @@ class Vocab(object):
             Input:
                 - v: bool, True for update, False for freeze
         '''
+        if v:
+            self._writable()
         self.update = v
 
 
+    def _writable(self):
+        '''
+            copy the memory mapped data of a binary vocab, so it can be changed
+        '''
+        if self._word2id.readonly:
+            self._word2id = self._word2id.copy()
+        if not self._id2tf.flags.writeable:
+            self._id2tf = numpy.array(self._id2tf, 'int')
+
+
     def freeze(self):
         '''
             Freeze the vocab
         '''
+        self._set_fast_lookup()
         self.update = False
 
 
+    def _set_fast_lookup(self):
+        '''
+            build the lookup dicts of WordIndex if fast_lookup is set, called when a new WordIndex is loaded or built
+        '''
+        if self._word2id.fast_lookup != bool(self.fast_lookup):
+            self._word2id.set_fast_lookup(self.fast_lookup)
+
+
     def doc2bow(self, wordlist = None, idlist=None):
         '''
             convert tokens to bow
@@ -81,7 +166,7 @@ class Vocab(object):
                 - idlist: the token id list
             
             Output:
-                - bow: [(id, tf), ...]
+                - bow: [(id, tf), ...], tf is the term frequency in whole vocab. For the counts in documents, use corpus2bow
         '''
         if wordlist is None and idlist is None: 
             return []
@@ -100,25 +185,87 @@ class Vocab(object):
                 ids = self.words2id(wordlist)
             else:
                 raise('docbow input is not supported!  your input is:' + str(wordlist))
-        tfs = [self._id2tf[i] for i in ids]
+        tfs = self.ids2tf(ids)
         return list(zip(ids, tfs))
 
 
+    def corpus2bow(self, corpus, lengths=None, count=None):
+        '''
+            convert a corpus to bag of words sparse matrix, the value is the count of word in each document
+
+            Input:
+                - corpus: list of token lists, or flat token list with *lengths*
+                - lengths: list of int, document lengths of the flat token list. Default is None
+                - count: bool, if accumulate term frequency to vocab, default is None, see words2id_csr
+
+            Output:
+                - scipy.sparse.csr_matrix with shape (number of documents, vocab_size), can be used by topicmodel.Corpus and TFIDF.load_bow
+        '''
+        ids, offsets = self.words2id_csr(corpus, lengths, count)
+        return self.ids2bow(ids, offsets)
+
+
+    def ids2bow(self, ids, offsets=None):
+        '''
+            convert token ids to bag of words sparse matrix
+
+            Input:
+                - ids: list of id arrays, or flat id array with *offsets* (the output of words2id_csr)
+                - offsets: int array, ids of document i are ids[offsets[i]:offsets[i+1]]. Default is None
+
+            Output:
+                - scipy.sparse.csr_matrix with shape (number of documents, vocab_size)
+        '''
+        from scipy.sparse import csr_matrix
+        if offsets is None:
+            offsets = numpy.zeros(len(ids)+1, 'int64')
+            numpy.cumsum([len(i) for i in ids], out=offsets[1:])
+            ids = numpy.concatenate([numpy.asarray(i, 'int64') for i in ids]) if len(ids) > 0 else numpy.zeros(0, 'int64')
+        ids = numpy.asarray(ids, 'int64')
+        ncols = max(self.vocab_size, int(ids.max())+1 if len(ids) > 0 else 0)
+        # duplicated ids in a row are summed to the count
+        bow = csr_matrix((numpy.ones(len(ids), 'int'), ids, offsets), shape=(len(offsets)-1, ncols))
+        bow.sum_duplicates()
+        return bow
+
+
     def _get_cached_vocab(self):
         ifinit = True
         if os.path.exists(self.cached_vocab):
+            with open(self.cached_vocab, 'rb') as f:
+                binary = f.read(len(_MAGIC)) == _MAGIC
+            if binary:
+                # a broken binary vocab raises ValueError instead of building a new vocab silently
+                self._load_binary(self.cached_vocab)
+                self._set_fast_lookup()
+                return
             try:
                 data = zload(self.cached_vocab)
                 self._word2id = data['word2id']
+                if not isinstance(self._word2id, WordIndex):
+                    # old cached vocab saved with bidict
+                    self._word2id = WordIndex(self._word2id)
                 self._id2tf = data['id2tf']
                 if len(self._word2id) > 0:
                     ifinit = False
-                self.vocab_size = len(self._id2tf)
+                self.vocab_size = data.get('vocab_size', len(self._id2tf))
             except Exception as err:
-                print('warning!!! cached vocab read failed!!! will build a new vocab. ' + err)
+                print('warning!!! cached vocab read failed!!! will build a new vocab. ' + str(err))
         if ifinit:
-            self._word2id = bidict()
-            self._id2tf = numpy.zeros(self.vocab_size, 'int')
+            self._word2id = WordIndex()
+            self._id2tf = numpy.zeros(min(self.vocab_size, 1024), 'int')
+        self._set_fast_lookup()
+
+
+    def _grow_tf(self, size):
+        '''
+            tf array grows with the vocab instead of allocating *vocab_size* at the beginning
+        '''
+        if size > len(self._id2tf):
+            size = min(max(size, 2*len(self._id2tf)), max(self.vocab_size, size))
+            id2tf = numpy.zeros(size, 'int')
+            id2tf[:len(self._id2tf)] = self._id2tf
+            self._id2tf = id2tf
 
     
     @classmethod
@@ -131,54 +278,163 @@ class Vocab(object):
         '''
         vocab_size = len(word2idx)
         vocab = cls(vocab_size=vocab_size, special_char=False, **args)
-        vocab._word2id = bidict(word2idx)
-        vocab._id2tf = numpy.zeros(vocab_size, 'int')
+        vocab._word2id = WordIndex(word2idx)
+        vocab._id2tf = numpy.zeros(max(word2idx.values(), default=-1)+1, 'int')
         vocab.freeze()
         return vocab
 
 
     @classmethod
-    def load_from_text(cls, filename, special_words=None, **args):
+    def load_from_text(cls, filename, special_words=None, chunk_size=2**24, **args):
         '''
-            load from vocab text file
+            load from vocab text file, each line is "word tf". The file is parsed in big chunks, the WordIndex is built directly from the utf-8 bytes of all words. For duplicated words, the first one is kept
 
             Input:
                 - filename: string
                 - special_words: word list like pad, bos ,eos ,unk, default is None
-        '''
-        word2id, id2tf = {}, []
-        for w in special_words:
-            word2id[w] = len(word2id)
-            id2tf.append(0)
-        with open(filename) as f:
-            for l in f:
-                try:
-                    word, tf = tuple(re.split('\s', l.strip()))
-                    word = word.strip()
-                    if len(word) < 1:
-                        continue
-                    tf = int(tf)
-                    word2id[word] = len(word2id)
-                    id2tf.append(int(tf))
-                except Exception as err:
-                    print(err)
-                    continue
-        vocab_size = len(word2id)
-        vocab = cls(vocab_size=vocab_size, special_char=False, **args)
-        vocab._word2id = bidict(word2id)
-        vocab._id2tf = numpy.array(id2tf, 'int')
+                - chunk_size: int, bytes read for each chunk, default is 2**24
+        '''
+        special_words = [] if special_words is None else list(special_words)
+        start_time = time.time()
+        words, tfs = [], [numpy.zeros(len(special_words), 'int')]
+        nlines = 0
+        with open(filename, 'rb') as f:
+            tail = b''
+            while True:
+                data = f.read(chunk_size)
+                chunk = tail + data
+                if data:
+                    # the last incomplete line is left to next chunk
+                    cut = chunk.rfind(b'\n') + 1
+                    chunk, tail = chunk[:cut], chunk[cut:]
+                elif chunk and not chunk.endswith(b'\n'):
+                    chunk += b'\n'
+                if chunk:
+                    nlines += chunk.count(b'\n')
+                    chunk_words, chunk_tfs = cls._parse_freq_chunk(chunk)
+                    words.extend(chunk_words)
+                    tfs.append(chunk_tfs)
+                if not data:
+                    break
+        word2id, keep = WordIndex.from_bytes([w.encode('utf-8') for w in special_words] + words)
+        id2tf = numpy.concatenate(tfs)[keep]
+
+        vocab = cls(vocab_size=len(word2id), special_char=False, **args)
+        vocab._word2id = word2id
+        vocab._id2tf = id2tf
         vocab._word_spec = special_words
         vocab._id_spec = list(range(len(special_words)))
         vocab.freeze()
+        cost = max(time.time() - start_time, 1e-6)
+        print('loaded {} words from {} lines in {:.1f} sec: {:.0f} lines/sec'.format(len(word2id), nlines, cost, nlines/cost))
         return vocab
 
 
-    def save(self):
+    @staticmethod
+    def _parse_freq_chunk(chunk):
+        '''
+            parse lines of "word tf" in a bytes chunk, return word bytes list and tf array. Lines not in this format are skipped
+        '''
+        data = numpy.frombuffer(chunk, 'uint8')
+        space = _WHITESPACE[data]
+        starts = ~space
+        starts[1:] &= space[:-1]
+        nfields = numpy.bincount(numpy.cumsum(data == 10)[starts])
+        # every non-empty line has two fields, parse the whole chunk at once
+        if (nfields[nfields > 0] == 2).all():
+            fields = chunk.split()
+            try:
+                return fields[0::2], numpy.array(fields[1::2]).astype('int')
+            except ValueError:
+                pass
+        words, tfs = [], []
+        for l in chunk.split(b'\n'):
+            l = l.split()
+            if len(l) == 0:
+                continue
+            try:
+                if len(l) != 2:
+                    raise ValueError('wrong format: ' + str(b' '.join(l), 'utf-8', 'replace'))
+                tfs.append(int(l[1]))
+                words.append(l[0])
+            except ValueError as err:
+                print(err)
+        return words, numpy.array(tfs, 'int')
+
+
+    def save(self, binary=False):
         '''
             Save the vocab dictionary to *cached_vocab*
+
+            Input:
+                - binary: bool, default is False. If False, save with zdump (compressed pickle). If True, save with a binary format which can be memory mapped without deserialization, the forked workers will share the same pages
+
+        The file is written to a temporary file in the same directory then renamed, so a vocab memory mapped from *cached_vocab* can be saved to itself.
         '''
         if len(self.cached_vocab) > 0:
-            zdump({'word2id':self._word2id, 'id2tf':self._id2tf}, self.cached_vocab)
+            fd, tmpname = tempfile.mkstemp(prefix=os.path.basename(self.cached_vocab) + '.', dir=os.path.dirname(os.path.abspath(self.cached_vocab)))
+            os.close(fd)
+            try:
+                if binary:
+                    self._save_binary(tmpname)
+                else:
+                    zdump({'word2id':self._word2id, 'id2tf':numpy.array(self._id2tf), 'vocab_size':self.vocab_size}, tmpname)
+                # mkstemp creates the file only readable by owner
+                os.chmod(tmpname, os.stat(self.cached_vocab).st_mode & 0o777 if os.path.exists(self.cached_vocab) else 0o644)
+                os.replace(tmpname, self.cached_vocab)
+            except BaseException:
+                os.remove(tmpname)
+                raise
+
+
+    def _save_binary(self, filename):
+        buffers = [memoryview(b).cast('B') for b in self._word2id.to_buffers()]
+        buffers.append(memoryview(numpy.ascontiguousarray(self._id2tf, 'int64')).cast('B'))
+        sections, offset = [], _HEADER.size
+        for b in buffers:
+            offset += -offset % 8
+            sections += [offset, b.nbytes]
+            offset += b.nbytes
+        with open(filename, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.vocab_size, *sections))
+            for b, start in zip(buffers, sections[::2]):
+                f.write(b'\0' * (start - f.tell()))
+                f.write(b)
+
+
+    def _load_binary(self, filename):
+        with open(filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError('{} is not a binary vocab file'.format(filename))
+        if len(mm) < _HEADER.size:
+            raise ValueError('binary vocab {} is truncated, file size is {}'.format(filename, len(mm)))
+        header = _HEADER.unpack_from(mm)
+        for start, nbytes in zip(header[2::2], header[3::2]):
+            if start < _HEADER.size or nbytes < 0 or start + nbytes > len(mm):
+                raise ValueError('binary vocab {} is truncated or broken, section at {} with {} bytes, file size is {}'.format(filename, start, nbytes, len(mm)))
+        if header[-1] % 8 != 0:
+            raise ValueError('binary vocab {} is broken, wrong size of term frequencies'.format(filename))
+        self.vocab_size = header[1]
+        buffers = [memoryview(mm)[start:start+nbytes] for start, nbytes in zip(header[2::2], header[3::2])]
+        self._word2id = WordIndex.from_buffers(buffers[:-1])
+        self._id2tf = numpy.frombuffer(buffers[-1], 'int64')
+        self.update = False
+
+
+    @staticmethod
+    def convert(cached_vocab, output, binary=True):
+        '''
+            Convert cached vocab between the pickle format and the binary format
+
+            Input:
+                - cached_vocab: string, input cached vocab file path, format is detected automatically
+                - output: string, output file path
+                - binary: bool, output format, default is True
+        '''
+        vocab = Vocab(cached_vocab=cached_vocab, special_char=False)
+        vocab.cached_vocab = output
+        vocab.save(binary=binary)
 
 
     def word2id(self, word):
@@ -192,13 +448,15 @@ class Vocab(object):
                 - wordid: int    
         '''
         if word is None: return None
-        if word in self._word2id:
-            if self.update: self._id2tf[self._word2id[word]] += 1
-            return self._word2id[word]
+        wordid = self._word2id.get(word)
+        if wordid is not None:
+            if self.update: self._id2tf[wordid] += 1
+            return wordid
         else:
             wordid = len(self._word2id)
             if wordid < self.vocab_size - 1 and self.update:
                 self._word2id[word] = wordid
+                self._grow_tf(wordid + 1)
                 self._id2tf[wordid] = 1
             else:
                if self.outofvocab=='random':
@@ -218,9 +476,7 @@ class Vocab(object):
             Output:
                 - string. If id not in vocab, will return None
         '''
-        if i in self._word2id.inv:
-            return self._word2id.inv[i]
-        return None
+        return self._word2id.inv.get(i)
 
 
     def __len__(self):
@@ -234,11 +490,14 @@ class Vocab(object):
 
     def reduce(self, vocab_size=None, reorder=False):
         '''
-            reduce vocab size by tf.
+            reduce vocab size by tf. The special characters are always kept at the beginning
             
             Input: 
                 - vocab_size: int, the target vocab_size, if None will reduce to the current number of words. Default is None
                 - reorder: bool, check if the dictionary reorder by tf. Default is False. Parameter only usable when vocab_size is None. If the vocab_size is not None, the dictionary will always be reordered
+
+            Output:
+                - remap: int32 numpy array, the new id of each old id, -1 for removed words. Ids encoded before can be converted by *remap[ids]*, see also TFIDF.reindex
         '''
         if vocab_size is None or vocab_size >= self.vocab_size:
             self.vocab_size = len(self._word2id)
@@ -246,24 +505,39 @@ class Vocab(object):
             vocab_size = self.vocab_size
             if not reorder:
                 self.freeze()
-                return
-        new_word2id = bidict()
+                return numpy.arange(vocab_size, dtype='int32')
+        self._writable()
+        old_ids = self._word2id.id_array()
+        tfs = self._id2tf[old_ids]
+        # sort key is tf, special characters are put before all words
+        key = tfs.astype('float64')
+        key[numpy.isin(old_ids, self._id_spec)] = numpy.inf
+        n_keep = min(vocab_size, len(old_ids))
+        if n_keep < len(old_ids):
+            # top n_keep by argpartition, ties on the boundary are broken by old id
+            kth = -numpy.partition(-key, n_keep-1)[n_keep-1]
+            larger = numpy.flatnonzero(key > kth)
+            tied = numpy.flatnonzero(key == kth)
+            tied = tied[numpy.argsort(old_ids[tied], kind='stable')][:n_keep - len(larger)]
+            keep = numpy.concatenate([larger, tied])
+        else:
+            keep = numpy.arange(len(old_ids))
+        spec_rank = numpy.zeros(len(keep), 'int64')
+        for n, i in enumerate(self._id_spec):
+            spec_rank[old_ids[keep] == i] = n
+        keep = keep[numpy.lexsort((old_ids[keep], spec_rank, -key[keep]))]
+
+        remap = numpy.full(max(len(self._id2tf), old_ids.max()+1 if len(old_ids) else 0), -1, 'int32')
+        remap[old_ids[keep]] = numpy.arange(len(keep), dtype='int32')
         new_id2tf = numpy.zeros(vocab_size, 'int')
-        maxtf = self._id2tf.max()
-        for i in range(len(self._id_spec)):
-            self._id2tf[self._id_spec[i]] = maxtf + len(self._id_spec) - i #avoid remove spec vocab
-        sortedid = numpy.argsort(self._id2tf)[::-1]
-        for old_id in sortedid:
-            new_id = len(new_word2id)
-            if old_id >= len(self._word2id) or new_id >= vocab_size: continue
-            word = self._word2id.inv[old_id]
-            new_word2id[word] = new_id
-            new_id2tf[new_id] = self._id2tf[old_id]
-
-        self._word2id = new_word2id
+        new_id2tf[:len(keep)] = tfs[keep]
+
+        self._word2id = WordIndex.from_words(self._word2id.words(old_ids[keep]))
         self._id2tf = new_id2tf
+        self._id_spec = [int(remap[i]) for i in self._id_spec]
         self.vocab_size = vocab_size
         self.freeze()
+        return remap
 
     def __str__(self):
         info = '-'*30
@@ -275,18 +549,100 @@ class Vocab(object):
         return info
 
 
+    def _add_words(self, words):
+        '''
+            add new words in one batch until the vocab is full, return the number of added words
+        '''
+        n_new = min(len(words), max(self.vocab_size - 1 - len(self._word2id), 0))
+        if n_new > 0:
+            self._writable()
+            self._word2id._extend(words[:n_new], check=False)
+            self._grow_tf(len(self._word2id))
+        return n_new
+
+
+    def update_counts(self, counts):
+        '''
+            merge term frequencies into vocab. Words not in vocab are added if vocab allows update and is not full, else ignored
+
+            Input:
+                - counts: dictionary with format {word:tf, ...}, e.g. a collections.Counter
+        '''
+        if len(counts) < 1:
+            return
+        words = list(counts.keys())
+        tfs = numpy.fromiter(counts.values(), dtype='int64', count=len(words))
+        ids = self._word2id.get_many(words)
+        missing = numpy.flatnonzero(ids < 0)
+        if len(missing) > 0 and self.update:
+            n_new = self._add_words([words[i] for i in missing])
+            ids[missing[:n_new]] = numpy.arange(len(self._word2id) - n_new, len(self._word2id))
+        known = ids >= 0
+        self._writable()
+        self._grow_tf(ids.max() + 1)
+        self._id2tf[ids[known]] += tfs[known]
+
+
+    @classmethod
+    def build(cls, filenames, tokenizer=None, vocab_size=None, n_process=None, chunk_size=2**24, batch_size=1000, **args):
+        '''
+            Build vocab from text files in parallel. Files are split to shards by byte range, tokens of each shard are counted in a worker process, the counts are merged and the vocab is reduced once at the end
+
+            Input:
+                - filenames: string or list of string, text file paths, one sentence per line
+                - tokenizer: tokenizer instance, rebuilt from its *config* in each worker. Default is None, means split by whitespace
+                - vocab_size: int, keep the most frequent *vocab_size* words (special characters included), default is None, keep all words
+                - n_process: int, number of worker processes, default is None (cpu_count - 2). If 1, will count in current process
+                - chunk_size: int, shard size in bytes, default is 16MB
+                - batch_size: int, number of lines tokenized together in worker, default is 1000
+                - **args: other arguments for Vocab, like special_char, outofvocab, embedding
+
+            Output:
+                - frozen vocab instance
+        '''
+        from tqdm import tqdm
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        if n_process is None:
+            n_process = max(multiprocessing.cpu_count()-2, 1)
+        shards = []
+        for filename in filenames:
+            size = os.path.getsize(filename)
+            shards += [(filename, s, min(s+chunk_size, size), batch_size) for s in range(0, size, chunk_size)]
+        config = None if tokenizer is None else tokenizer.config
+
+        counts, nlines, nbytes = Counter(), 0, 0
+        start_time = time.time()
+        if n_process < 2:
+            _init_count_worker(config)
+            results, pool = map(_count_shard, shards), None
+        else:
+            pool = multiprocessing.Pool(n_process, initializer=_init_count_worker, initargs=(config,))
+            results = pool.imap(_count_shard, shards)
+        try:
+            for shard_counts, shard_lines, shard_bytes in tqdm(results, total=len(shards), desc='Building vocab'):
+                counts.update(shard_counts)
+                nlines += shard_lines
+                nbytes += shard_bytes
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        cost = max(time.time() - start_time, 1e-6)
+        print('counted {} lines, {:.1f} MB, {} words in {:.1f} sec: {:.0f} lines/sec, {:.1f} MB/sec'.format(nlines, nbytes/1024/1024, len(counts), cost, nlines/cost, nbytes/1024/1024/cost))
+
+        # vocab size below 30 is read as a power of 2
+        vocab = cls(vocab_size=max(len(counts) + 5, 30), **args)
+        vocab.update_counts(dict(counts.most_common()))
+        vocab.reduce(vocab_size)
+        return vocab
+
+
     def __add__(self, other):
         '''
-            merge another vocab
+            merge another vocab, the term frequencies are summed
         '''
-        for w in other._word2id:
-            _id_other = other._word2id[w]
-            if w in self._word2id:
-                _id = self._word2id[w]
-                self._id2tf[_id] += other._id2tf[_id_other]
-            else:
-                _id = self.word2id(w)
-                self._id2tf[_id] = other._id2tf[_id_other]
+        self.update_counts({w:other._id2tf[i] for w, i in other._word2id.items()})
         return self
 
         
@@ -294,7 +650,7 @@ class Vocab(object):
         '''
             compare two vocabs
         '''
-        return self._word2id == other.__word2id
+        return self._word2id == other._word2id
     
 
     def __getitem__(self, key):
@@ -334,7 +690,18 @@ class Vocab(object):
 
         '''
         if batch:
-            return numpy.asarray([self.words2id(t) for t in tokens], dtype=numpy.object) 
+            return numpy.asarray([self.words2id(t) for t in tokens], dtype=object) 
+
+        if not self.update:
+            # frozen vocab, a sentence is too short for words2id_csr to pay off, lookup token by token
+            get = self._word2id.get
+            ids = [get(t) for t in tokens if t is not None]
+            if None in ids:
+                if self.outofvocab == 'random':
+                    ids = [random.randint(0, self.vocab_size-1) if i is None else i for i in ids]
+                else:
+                    ids = [self.UNK_ID if i is None else i for i in ids]
+            return numpy.array(ids, 'int')
 
         ids = [self.word2id(t) for t in tokens]
         ids = numpy.array([i for i in ids if i is not None], 'int')
@@ -342,6 +709,69 @@ class Vocab(object):
         return ids
 
 
+    @staticmethod
+    def _unique_tokens(tokens, lengths=None):
+        '''
+            flatten tokens to CSR format and find the distinct tokens
+
+            Output:
+                - tokens: flat token list
+                - offsets: int64 numpy array of sentence offsets
+                - uniq: list of distinct tokens, in the order of first appearance
+                - inverse: int64 numpy array, index of each token in *uniq*
+        '''
+        if len(tokens) > 0 and isinstance(tokens[0], (list, tuple)):
+            lengths = [len(t) for t in tokens]
+            tokens = [x for t in tokens for x in t]
+        if lengths is None:
+            lengths = [len(tokens)]
+        offsets = numpy.zeros(len(lengths)+1, 'int64')
+        numpy.cumsum(lengths, out=offsets[1:])
+        if offsets[-1] != len(tokens):
+            raise ValueError('sum of lengths {} is not equal to the number of tokens {}'.format(offsets[-1], len(tokens)))
+        uniq = {}
+        inverse = numpy.fromiter((uniq.setdefault(t, len(uniq)) for t in tokens), dtype='int64', count=len(tokens))
+        return tokens, offsets, list(uniq), inverse
+
+
+    def words2id_csr(self, tokens, lengths=None, count=None):
+        '''
+            Bulk tokens to token ids. Each distinct token is looked up once, the result is a ragged batch in CSR format
+
+            Input:
+                - tokens: flat token list, or list of token lists
+                - lengths: list of int, sentence lengths of the flat token list. Default is None, means one sentence for flat token list
+                - count: bool, if accumulate term frequency, default is None, means count only when vocab allows update. New words are added only when vocab allows update
+
+            Output:
+                - ids: int32 numpy array of all token ids
+                - offsets: int64 numpy array, ids of sentence i are ids[offsets[i]:offsets[i+1]]
+        '''
+        tokens, offsets, uniq, inverse = self._unique_tokens(tokens, lengths)
+        uniq_ids = self._word2id.get_many(uniq)
+        missing = numpy.flatnonzero(uniq_ids < 0)
+        if len(missing) > 0 and self.update:
+            n_new = self._add_words([uniq[i] for i in missing])
+            uniq_ids[missing[:n_new]] = numpy.arange(len(self._word2id) - n_new, len(self._word2id))
+            missing = missing[n_new:]
+        if count is None:
+            count = self.update
+        if count and len(tokens) > 0:
+            # distinct ids are unique, so the counts can be added with fancy indexing. Out of vocab tokens are not counted
+            self._writable()
+            tf = numpy.bincount(inverse, minlength=len(uniq))
+            known = uniq_ids >= 0
+            self._id2tf[uniq_ids[known]] += tf[known]
+        ids = uniq_ids[inverse]
+        if len(missing) > 0:
+            oov = ids < 0
+            if self.outofvocab == 'random':
+                ids[oov] = numpy.random.randint(0, self.vocab_size, oov.sum())
+            else:
+                ids[oov] = self.UNK_ID
+        return ids, offsets
+
+
     def id2words(self, ids, batch=False):
         '''
             convert ids to word
@@ -351,8 +781,8 @@ class Vocab(object):
                 - batch: if the input sequence is a batches, default is False
         '''
         if batch:
-            return numpy.asarray([self.id2words(i) for i in ids], dtype=numpy.object) 
-        return [self._word2id.inv[i] for i in ids if i in self._word2id.inv]
+            return numpy.asarray([self.id2words(i) for i in ids], dtype=object) 
+        return self._word2id.words(ids)
 
     
     def dense_vectors(self):
@@ -360,16 +790,32 @@ class Vocab(object):
             return a numpy array of word vectors. The index of array is the word_ids
         '''
         vectors = numpy.zeros((self.vocab_size, self.embedding.dim), 'float')
-        for w in self._word2id:
-            wordid = self._word2id[w]
-            if wordid == 0:
-                vectors[wordid] = 0
-            else:
-                vectors[wordid] = self.embedding[w]
-
+        if len(self._word2id) > 0:
+            vectors[self._word2id.id_array()] = self.embedding.get_many(list(self._word2id))
+            vectors[0] = 0
         return vectors
 
 
+    def _cached_vectors(self):
+        '''
+            return the cached float32 vector matrix, indexed by word id, row 0 is zeros like dense_vectors
+        '''
+        if self._vectors is None or self._vectors_index is not self._word2id or self._vectors_embedding is not self.embedding:
+            self._vectors = numpy.zeros((0, self.embedding.dim), 'float32')
+            self._vectors_index, self._vectors_embedding, self._vectors_count = self._word2id, self.embedding, 0
+        if self._vectors_count < len(self._word2id):
+            # only fetch vectors of the words added after last build
+            ids = self._word2id.id_array()[self._vectors_count:]
+            if ids.max() >= len(self._vectors):
+                vectors = numpy.zeros((max(ids.max() + 1, 2*len(self._vectors)), self.embedding.dim), 'float32')
+                vectors[:len(self._vectors)] = self._vectors
+                self._vectors = vectors
+            self._vectors[ids] = self.embedding.get_many(self._word2id.words(ids))
+            self._vectors[0] = 0
+            self._vectors_count = len(self._word2id)
+        return self._vectors
+
+
     def ids2tf(self, ids):
         '''
             get counts for each ids
@@ -380,7 +826,7 @@ class Vocab(object):
             Output:
                 - count list
         '''
-        return [self._id2tf[x] for x in ids]
+        return [self._id2tf[x] if x < len(self._id2tf) else 0 for x in ids]
 
 
     def ids2vec(self, ids):
@@ -391,13 +837,15 @@ class Vocab(object):
                 - ids: id list
 
             Output:
-                - numpy array. The array index is the id index in input
+                - numpy array. The array index is the id index in input. If *cache_vectors* is True, it is a float32 array gathered from the cached matrix
         '''
         if self.embedding is None:
             return None
+        if self.cache_vectors:
+            return self._cached_vectors()[numpy.asarray(ids, dtype='int64')]
         vec = numpy.zeros((len(ids), self.embedding.dim), 'float')
-        for i, sid in enumerate(ids):
-            vec[i] = self.id2vec(sid)
+        if len(ids) > 0:
+            vec[:] = self.embedding.get_many([self._word2id.inv[i] for i in ids])
         return vec
 
 
@@ -424,15 +872,14 @@ class Vocab(object):
             Output:
                 - 1d numpy array
         '''
-        vec = numpy.zeros(self.embedding.vec_len, 'float')
-        tottf = 0
-        for i, sid in enumerate(sentence_id):
-            w = numpy.log(self.Nwords/(self._id2tf[sid]))
-            vec += self.embedding[self._word2id.inv[sid]]*w
-            tottf += w
+        if len(sentence_id) < 1:
+            return numpy.zeros(self.embedding.dim)
+        nwords = max(self._id2tf.sum(), 1)
+        weights = numpy.log(nwords / numpy.maximum(numpy.asarray(self.ids2tf(sentence_id), 'float'), 1))
+        tottf = weights.sum()
         if tottf == 0:
-            return numpy.zeros(self.embedding.vec_len)
-        return vec/tottf
+            return numpy.zeros(self.embedding.dim)
+        return numpy.dot(weights, self.ids2vec(sentence_id))/tottf
 
 
 
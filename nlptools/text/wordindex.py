@@ -0,0 +1,538 @@
+#!/usr/bin/env python
+import numpy, zlib
+from array import array
+
+'''
+    Author: Pengjia Zhu (zhupengjia@gmail.com)
+'''
+
+_MAX_ID = 2**31 - 1
+# name and typecode of the arrays, in the order used by to_buffers/from_buffers
+_SECTIONS = [('_buf', 'B'), ('_offsets', 'q'), ('_hashes', 'I'), ('_ids', 'i'), ('_slots', 'i'), ('_table', 'i')]
+
+
+class _InverseIndex(object):
+    '''
+        id -> word view of WordIndex, behaves like bidict.inv
+    '''
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, i):
+        if self._index._id2word is not None:
+            return self._index._id2word[i]
+        slot = self._index._id2slot(i)
+        if slot < 0:
+            raise KeyError(i)
+        return self._index.word(slot)
+
+    def __contains__(self, i):
+        if self._index._id2word is not None:
+            return i in self._index._id2word
+        return self._index._id2slot(i) >= 0
+
+    def get(self, i, default=None):
+        if self._index._id2word is not None:
+            return self._index._id2word.get(i, default)
+        slot = self._index._id2slot(i)
+        return default if slot < 0 else self._index.word(slot)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index.values())
+
+
+class WordIndex(object):
+    '''
+        Compact word <-> id mapping, used as the storage of Vocab instead of bidict.
+
+        All words are stored utf-8 encoded in one contiguous buffer, with an int64 offsets array. Lookup uses an open addressing hash table of int32 slots with crc32 hashes. Ids are kept in int32 arrays in both directions, so one word costs about 30 bytes plus its length, compared with several hundred bytes for the two dicts of a bidict.
+
+        Input:
+            - data: dictionary with format {word:id, ...}, default is None
+
+        Some special operation:
+            - __getitem__: get id for word, raise KeyError if not exists
+            - __setitem__: add word with id
+            - __contains__: check if word in index
+            - __len__: number of words
+            - inv: the id to word view, support *[]*, *in* and *get*
+
+        The arrays can also be memoryviews of a mmap file (see from_buffers), then the index is read only and shares the pages between processes. Use copy() to get a writable one.
+
+        Probing the hash table in python is several times slower than a dict lookup, so the ids of the first *hot_size* words looked up are also kept in a dict. For zipf distributed text the frequent words come early and most lookups hit the dict.
+
+        If lookup speed matters more than memory, call set_fast_lookup() to keep all words in two dicts as bidict does. Lookups are then as fast as bidict, and the memory saving is lost.
+    '''
+    hot_size = 2**16
+
+    def __init__(self, data=None):
+        self._hot = {}
+        self._id2word = None
+        self._buf = bytearray()
+        self._offsets = array('q', [0])
+        self._hashes = array('I')
+        self._ids = array('i')
+        self._slots = array('i')
+        self._table = array('i', [-1]) * 8
+        self._mask = 7
+        if data is not None:
+            self._extend(list(data.keys()), list(data.values()))
+
+
+    @classmethod
+    def from_words(cls, words, ids=None):
+        '''
+            Build index from a list of unique words
+
+            Input:
+                - words: list of string
+                - ids: list of int, default is None, means ids are 0...len(words)-1
+        '''
+        index = cls()
+        index._extend(words, ids)
+        return index
+
+
+    @classmethod
+    def from_bytes(cls, words):
+        '''
+            Build index from a list of utf-8 encoded words, the buffer is joined without decoding and encoding every word. For duplicated words, only the first one is kept
+
+            Input:
+                - words: list of bytes
+
+            Output:
+                - index, ids are 0...number of kept words-1
+                - bool numpy array, if each word is kept
+        '''
+        index = cls()
+        if len(words) < 1:
+            return index, numpy.zeros(0, 'bool')
+        hashes = numpy.fromiter(map(zlib.crc32, words), dtype='uint32', count=len(words))
+        lengths = numpy.fromiter(map(len, words), dtype='int64', count=len(words))
+        # duplicated words must have the same hash, only compare words of repeated hashes
+        keep = numpy.ones(len(words), 'bool')
+        order = numpy.argsort(hashes, kind='stable')
+        repeated = numpy.zeros(len(words), 'bool')
+        repeated[1:] = hashes[order[1:]] == hashes[order[:-1]]
+        repeated[:-1] |= repeated[1:]
+        seen = set()
+        for i in numpy.sort(order[repeated]).tolist():
+            if words[i] in seen:
+                keep[i] = False
+            seen.add(words[i])
+        if keep.all():
+            buf = b''.join(words)
+        else:
+            buf = b''.join(w for w, k in zip(words, keep.tolist()) if k)
+        # validation only, raise UnicodeDecodeError for words not in utf-8, the decoded string is not kept
+        buf.decode('utf-8')
+        nword = int(keep.sum())
+        offsets = numpy.zeros(nword + 1, 'int64')
+        numpy.cumsum(lengths[keep], out=offsets[1:])
+        index._buf = bytearray(buf)
+        index._offsets = array('q', offsets.tobytes())
+        index._hashes = array('I', hashes[keep].tobytes())
+        index._ids = array('i', numpy.arange(nword, dtype='int32').tobytes())
+        index._slots = array('i', index._ids)
+        index._rebuild(nword)
+        return index, keep
+
+
+    def _extend(self, words, ids=None, check=True):
+        '''
+            add a batch of new words, hash table is rebuilt once. Set check to False if words are known to be new and unique
+        '''
+        self._check_writable()
+        if ids is None:
+            ids = range(len(self._ids), len(self._ids) + len(words))
+        if len(words) < 1:
+            return
+        ids = numpy.asarray(ids, dtype='int64')
+        if ids.min() < 0 or ids.max() > _MAX_ID:
+            raise ValueError('word id out of int32 range')
+        if check and (len(set(words)) < len(words) or (len(self._ids) > 0 and any(w in self for w in words))):
+            raise ValueError('duplicated word')
+        slots = numpy.full(max(int(ids.max()) + 1, len(self._slots)), -1, 'int32')
+        if len(self._slots) > 0:
+            slots[:len(self._slots)] = numpy.frombuffer(self._slots, 'int32')
+        if (slots[ids] >= 0).any() or len(numpy.unique(ids)) < len(ids):
+            raise ValueError('duplicated word id')
+        nslot = len(self._ids)
+        slots[ids] = numpy.arange(nslot, nslot + len(ids), dtype='int32')
+        if self._id2word is not None:
+            self._hot.update(zip(words, ids.tolist()))
+            self._id2word.update(zip(ids.tolist(), words))
+        words = [w.encode('utf-8') for w in words]
+        lengths = numpy.fromiter((len(w) for w in words), dtype='int64', count=len(words))
+        self._offsets.frombytes((numpy.cumsum(lengths) + len(self._buf)).tobytes())
+        self._buf += b''.join(words)
+        self._hashes.frombytes(numpy.fromiter((zlib.crc32(w) for w in words), dtype='uint32', count=len(words)).tobytes())
+        self._ids.frombytes(ids.astype('int32').tobytes())
+        self._slots = array('i', slots.tobytes())
+        self._rebuild(len(self._ids))
+
+
+    def set_fast_lookup(self, enable=True):
+        '''
+            Keep a word -> id dict and an id -> word dict of all words besides the buffers, lookups never probe the hash table. This costs a bit more memory than a bidict
+
+            Input:
+                - enable: bool, False to drop the dicts, default is True
+        '''
+        if not enable:
+            self._hot, self._id2word = {}, None
+            return
+        offsets = numpy.frombuffer(self._offsets, 'int64').tolist()
+        buf = bytes(self._buf)
+        words = [str(buf[a:b], 'utf-8') for a, b in zip(offsets[:-1], offsets[1:])]
+        ids = list(self._ids)
+        self._hot = dict(zip(words, ids))
+        self._id2word = dict(zip(ids, words))
+
+
+    @property
+    def fast_lookup(self):
+        return self._id2word is not None
+
+
+    def _rebuild(self, nslot):
+        '''
+            rebuild the hash table for nslot words, keep load factor under 0.5
+        '''
+        size = 8
+        while size < nslot * 2:
+            size <<= 1
+        mask = size - 1
+        table = numpy.full(size, -1, 'int32')
+        if len(self._ids) < 1:
+            self._table, self._mask = array('i', table.tobytes()), mask
+            return
+        pending = numpy.arange(len(self._ids), dtype='int64')
+        pos = numpy.frombuffer(self._hashes, 'uint32').astype('int64') & mask
+        while len(pending) > 0:
+            # every round each free bucket takes the first waiting slot, others move to the next bucket
+            free = numpy.flatnonzero(table[pos] < 0)
+            free_pos, first = numpy.unique(pos[free], return_index=True)
+            table[free_pos] = pending[free[first]]
+            waiting = numpy.ones(len(pending), 'bool')
+            waiting[free[first]] = False
+            pending = pending[waiting]
+            pos = (pos[waiting] + 1) & mask
+        self._table = array('i', table.tobytes())
+        self._mask = mask
+
+
+    def _find(self, word):
+        '''
+            return slot of word, -1 if not found
+        '''
+        if not isinstance(word, str):
+            return -1
+        b = word.encode('utf-8')
+        h = zlib.crc32(b)
+        table, hashes, offsets, buf = self._table, self._hashes, self._offsets, self._buf
+        mask = self._mask
+        i = h & mask
+        while True:
+            slot = table[i]
+            if slot < 0:
+                return -1
+            if hashes[slot] == h and buf[offsets[slot]:offsets[slot+1]] == b:
+                return slot
+            i = (i + 1) & mask
+
+
+    def _lookup(self, word):
+        '''
+            return id of word from the hash table, -1 if not found. The found word is added to the dict of hot words if it is not full
+        '''
+        slot = self._find(word)
+        if slot < 0:
+            return -1
+        i = self._ids[slot]
+        if len(self._hot) < self.hot_size:
+            self._hot[word] = i
+        return i
+
+
+    def get_many(self, words, default=-1):
+        '''
+            Lookup a list of words, the hash table is probed for all words together
+
+            Input:
+                - words: list of string
+                - default: int, id for the words not in index, default is -1
+
+            Output:
+                - int32 numpy array of ids
+        '''
+        if self._id2word is not None:
+            get = self._hot.get
+            return numpy.fromiter((get(w, default) for w in words), dtype='int32', count=len(words))
+        words = [w.encode('utf-8') for w in words]
+        result = numpy.full(len(words), default, 'int32')
+        if len(words) < 1 or len(self._ids) < 1:
+            return result
+        query = numpy.fromiter((zlib.crc32(w) for w in words), dtype='uint32', count=len(words))
+        qlen = numpy.fromiter((len(w) for w in words), dtype='int64', count=len(words))
+        table = numpy.frombuffer(self._table, 'int32')
+        hashes = numpy.frombuffer(self._hashes, 'uint32')
+        offsets = numpy.frombuffer(self._offsets, 'int64')
+        ids = numpy.frombuffer(self._ids, 'int32')
+        buf = self._buf
+        pending = numpy.arange(len(words))
+        pos = query.astype('int64') & self._mask
+        while len(pending) > 0:
+            slots = table[pos]
+            found = slots >= 0
+            pending, pos, slots = pending[found], pos[found], slots[found]
+            # only words with same hash and length are compared byte by byte
+            same = numpy.flatnonzero((hashes[slots] == query[pending]) & (offsets[slots+1] - offsets[slots] == qlen[pending]))
+            matched = numpy.zeros(len(pending), 'bool')
+            for i in same:
+                s = slots[i]
+                if buf[offsets[s]:offsets[s+1]] == words[pending[i]]:
+                    matched[i] = True
+            result[pending[matched]] = ids[slots[matched]]
+            pending, pos = pending[~matched], (pos[~matched] + 1) & self._mask
+        return result
+
+
+    def words(self, ids):
+        '''
+            get words for a list of ids, the ids not in index are skipped
+
+            Input:
+                - ids: list of int
+
+            Output:
+                - list of string
+        '''
+        if self._id2word is not None:
+            inv = self._id2word
+            return [inv[i] for i in numpy.asarray(ids, dtype='int64').reshape(-1).tolist() if i in inv]
+        if len(self._slots) < 1:
+            return []
+        ids = numpy.asarray(ids, dtype='int64').reshape(-1)
+        slots = numpy.frombuffer(self._slots, 'int32')
+        ids = ids[(ids >= 0) & (ids < len(slots))]
+        slots = slots[ids]
+        return [self.word(s) for s in slots[slots >= 0].tolist()]
+
+
+    def _id2slot(self, i):
+        try:
+            i = int(i)
+        except (TypeError, ValueError):
+            return -1
+        if i < 0 or i >= len(self._slots):
+            return -1
+        return self._slots[i]
+
+
+    def word(self, slot):
+        '''
+            get word via slot index
+        '''
+        return str(self._buf[self._offsets[slot]:self._offsets[slot+1]], 'utf-8')
+
+
+    def __getitem__(self, word):
+        i = self._hot.get(word)
+        if i is None:
+            if self._id2word is not None:
+                raise KeyError(word)
+            i = self._lookup(word)
+            if i < 0:
+                raise KeyError(word)
+        return i
+
+
+    def get(self, word, default=None):
+        i = self._hot.get(word)
+        if i is None:
+            if self._id2word is not None:
+                return default
+            i = self._lookup(word)
+            if i < 0:
+                return default
+        return i
+
+
+    def __setitem__(self, word, wordid):
+        self._check_writable()
+        wordid = int(wordid)
+        slot = self._find(word)
+        other = self._id2slot(wordid)
+        if other >= 0 and other != slot:
+            raise ValueError('id {} already exists'.format(wordid))
+        if slot >= 0:
+            self._slots[self._ids[slot]] = -1
+            if self._id2word is not None:
+                self._id2word.pop(self._ids[slot], None)
+            self._ids[slot] = wordid
+            self._hot.pop(word, None)
+        else:
+            if wordid < 0 or wordid > _MAX_ID:
+                raise ValueError('word id out of int32 range')
+            b = word.encode('utf-8')
+            h = zlib.crc32(b)
+            slot = len(self._ids)
+            self._buf += b
+            self._offsets.append(len(self._buf))
+            self._hashes.append(h)
+            self._ids.append(wordid)
+            if (len(self._ids) * 2 > len(self._table)):
+                self._rebuild(len(self._ids))
+            else:
+                i = h & self._mask
+                while self._table[i] >= 0:
+                    i = (i + 1) & self._mask
+                self._table[i] = slot
+        if wordid >= len(self._slots):
+            self._slots.extend(array('i', [-1]) * (max(wordid + 1, len(self._slots) * 2) - len(self._slots)))
+        self._slots[wordid] = slot
+        if self._id2word is not None:
+            self._hot[word] = wordid
+            self._id2word[wordid] = word
+
+
+    def __contains__(self, word):
+        if self._id2word is not None:
+            return word in self._hot
+        return word in self._hot or self._lookup(word) >= 0
+
+
+    def __len__(self):
+        return len(self._ids)
+
+
+    def __iter__(self):
+        return (self.word(i) for i in range(len(self._ids)))
+
+
+    def keys(self):
+        return iter(self)
+
+
+    def values(self):
+        return iter(self._ids)
+
+
+    def items(self):
+        return zip(self, self._ids)
+
+
+    def id_array(self):
+        '''
+            return int32 numpy array of all ids, in the order of insertion
+        '''
+        return numpy.array(self._ids, 'int32')
+
+
+    @property
+    def inv(self):
+        return _InverseIndex(self)
+
+
+    @property
+    def nbytes(self):
+        '''
+            memory used by the buffers, the dicts of set_fast_lookup are not counted
+        '''
+        return sum(len(x) * x.itemsize for x in [self._offsets, self._hashes, self._ids, self._slots, self._table]) + len(self._buf)
+
+
+    @property
+    def readonly(self):
+        return isinstance(self._ids, memoryview)
+
+
+    def _check_writable(self):
+        if self.readonly:
+            raise ValueError('WordIndex is read only, use copy() to get a writable one')
+
+
+    def to_buffers(self):
+        '''
+            return the internal arrays as a list of buffers, used to write the index to disk
+        '''
+        return [getattr(self, k) for k, _ in _SECTIONS]
+
+
+    @classmethod
+    def from_buffers(cls, buffers):
+        '''
+            Build index on existing buffers without copy, e.g. slices of a mmap
+
+            Input:
+                - buffers: list of buffers in the order of to_buffers
+
+            ValueError is raised if the sizes of buffers don't match
+        '''
+        index = cls.__new__(cls)
+        for (k, typecode), b in zip(_SECTIONS, buffers):
+            b = memoryview(b).cast('B')
+            if b.nbytes % array(typecode).itemsize != 0:
+                raise ValueError('wrong buffer size of {}'.format(k))
+            setattr(index, k, b.cast(typecode))
+        nword = len(index._ids)
+        table = len(index._table)
+        if len(index._offsets) != nword + 1 or len(index._hashes) != nword or table < 8 or table & (table - 1) != 0 or table < nword * 2:
+            raise ValueError('wrong buffer sizes for {} words'.format(nword))
+        offsets = numpy.frombuffer(index._offsets, 'int64')
+        if offsets[0] != 0 or offsets[-1] != len(index._buf) or (numpy.diff(offsets) < 0).any():
+            raise ValueError('word offsets out of buffer')
+        if nword > 0 and (numpy.frombuffer(index._table, 'int32').max() >= nword or numpy.frombuffer(index._slots, 'int32').max() >= nword):
+            raise ValueError('word slots out of range')
+        index._mask = table - 1
+        index._hot = {}
+        index._id2word = None
+        return index
+
+
+    def copy(self):
+        '''
+            return a writable copy
+        '''
+        index = WordIndex.__new__(WordIndex)
+        for k, typecode in _SECTIONS[1:]:
+            setattr(index, k, array(typecode))
+            getattr(index, k).frombytes(memoryview(getattr(self, k)).cast('B'))
+        index._buf = bytearray(self._buf)
+        index._mask = self._mask
+        index._hot = {}
+        index._id2word = None
+        if self._id2word is not None:
+            index._hot, index._id2word = dict(self._hot), dict(self._id2word)
+        return index
+
+
+    def __getstate__(self):
+        state = self.copy().__dict__ if self.readonly else dict(self.__dict__)
+        state.pop('_hot', None)
+        state['_id2word'] = self._id2word is not None
+        return state
+
+
+    def __setstate__(self, state):
+        fast = state.pop('_id2word', False)
+        self.__dict__.update(state)
+        self._hot = {}
+        self._id2word = None
+        if fast:
+            self.set_fast_lookup()
+
+
+    def __eq__(self, other):
+        if isinstance(other, WordIndex):
+            return len(self) == len(other) and all(other.get(w) == i for w, i in self.items())
+        return dict(self.items()) == other
+
+
+    def __repr__(self):
+        return 'WordIndex(words={}, nbytes={})'.format(len(self), self.nbytes)
@@ -1,5 +1,23 @@
 #!/usr/bin/env python
+import importlib
 
-from .utils import *
-from .config import *
-from .logger import *
+# public names are resolved lazily, so that importing nlptools.utils is cheap
+_modules = {"Config": ".config", "setLogger": ".logger"}
+for _name in ["zdump", "zload", "zdumps", "zloads", "ldumps", "lloads", "status_save", "status_check",
+              "flat_list", "hashword", "hashwords", "mix64", "normalize", "get_session", "restpost", "envread", "decode_child_id",
+              "distance2similarity", "eval_str_list", "pad_sequence", "LRUCache"]:
+    _modules[_name] = ".utils"
+
+__all__ = list(_modules)
+
+
+def __getattr__(name):
+    if name in _modules:
+        value = getattr(importlib.import_module(_modules[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
-import os, zlib, numpy, re, pickle
-from collections import Counter
-from sklearn.utils import murmurhash3_32
+import os, zlib, numpy, re, pickle, threading
+from collections import Counter, OrderedDict
 
 '''
     Author: Pengjia Zhu (zhupengjia@gmail.com)
@@ -147,9 +146,98 @@ def hashword(word, hashsize=16777216):
         output:
             - int
     '''
+    from sklearn.utils import murmurhash3_32
     return murmurhash3_32(word, positive=True) % (hashsize)
 
 
+def _murmurhash3_blocks(data, lengths, seed=0):
+    '''
+        murmurhash3_32 of rows in a zero padded uint8 matrix, computed column by column with numpy. Rows must be sorted by length
+    '''
+    c1, c2 = numpy.uint32(0xcc9e2d51), numpy.uint32(0x1b873593)
+    blocks = data.view('<u4')
+    nblocks = lengths // 4
+    h = numpy.full(len(lengths), seed, 'uint32')
+
+    def rotl(x, r):
+        return (x << numpy.uint32(r)) | (x >> numpy.uint32(32 - r))
+
+    def mix(k):
+        return rotl(k * c1, 15) * c2
+
+    for j in range(int(nblocks.max()) if len(lengths) else 0):
+        # rows are sorted by length, so the rows having block j are a tail slice
+        active = numpy.searchsorted(nblocks, j, 'right')
+        k = mix(blocks[active:, j])
+        x = rotl(h[active:] ^ k, 13)
+        h[active:] = x * numpy.uint32(5) + numpy.uint32(0xe6546b64)
+    # padding bytes are zeros, so the tail block can be read as a whole uint32
+    tail = (lengths % 4) > 0
+    h[tail] ^= mix(blocks[tail, nblocks[tail]])
+    h ^= lengths.astype('uint32')
+    h ^= h >> numpy.uint32(16)
+    h *= numpy.uint32(0x85ebca6b)
+    h ^= h >> numpy.uint32(13)
+    h *= numpy.uint32(0xc2b2ae35)
+    h ^= h >> numpy.uint32(16)
+    return h
+
+
+def mix64(h):
+    '''
+        splitmix64 finalizer, spread the bits of uint64 hashes
+
+        input:
+            - h: uint64 numpy array
+
+        output:
+            - uint64 numpy array
+    '''
+    with numpy.errstate(over='ignore'):
+        h = h ^ (h >> numpy.uint64(30))
+        h = h * numpy.uint64(0xbf58476d1ce4e5b9)
+        h = h ^ (h >> numpy.uint64(27))
+        h = h * numpy.uint64(0x94d049bb133111eb)
+        return h ^ (h >> numpy.uint64(31))
+
+
+def hashwords(words, hashsize=None, positive=True, seed=0, chunk_size=65536):
+    '''
+        vectorized murmurhash3_32 for a list of words, the same value as sklearn.utils.murmurhash3_32 of each word
+
+        input:
+            - words: list of string
+            - hashsize: int, if not None, return positive hash modulo hashsize like *hashword*, default is None
+            - positive: bool, return unsigned value if True, else signed int32, default is True
+            - seed: int, hash seed, default is 0
+            - chunk_size: int, number of words hashed together, words are sorted by length so the padding is small
+
+        output:
+            - numpy array, uint32 if positive else int32, int64 if hashsize is not None
+    '''
+    encoded = list(map(str.encode, words))
+    lengths = numpy.fromiter(map(len, encoded), dtype='int64', count=len(encoded))
+    flat = numpy.frombuffer(b''.join(encoded), 'uint8')
+    starts = numpy.cumsum(lengths) - lengths
+    hashes = numpy.zeros(len(encoded), 'uint32')
+    order = numpy.argsort(lengths, kind='stable')
+    for start in range(0, len(order), chunk_size):
+        idx = order[start:start+chunk_size]
+        chunk_lengths = lengths[idx]
+        width = (int(chunk_lengths.max()) // 4 + 1) * 4
+        data = numpy.zeros((len(idx), width), 'uint8')
+        # gather the bytes of each word into its row
+        rows = numpy.repeat(numpy.arange(len(idx)), chunk_lengths)
+        cols = numpy.arange(len(rows)) - numpy.repeat(numpy.cumsum(chunk_lengths) - chunk_lengths, chunk_lengths)
+        data[rows, cols] = flat[numpy.repeat(starts[idx], chunk_lengths) + cols]
+        hashes[idx] = _murmurhash3_blocks(data, chunk_lengths, seed)
+    if hashsize is not None:
+        return hashes.astype('int64') % hashsize
+    if positive:
+        return hashes
+    return hashes.view('int32')
+
+
 def normalize(text):
     '''
         resolve different type of unicode encodings using unicodedata.normalize
@@ -168,20 +256,56 @@ def normalize(text):
         raise(err)
 
 
+_sessions = {}
+
+def get_session(pool_size=10, retries=3, backoff_factor=0.3):
+    '''
+        get a shared keep-alive requests session with connection pool and retries. Sessions are cached per process, so each forked worker has its own connections
+        
+        input:
+            - pool_size: int, max keep-alive connections per host, default is 10
+            - retries: int, retry times for connection errors and 5xx responses, default is 3
+            - backoff_factor: float, backoff factor between retries, default is 0.3
+        
+        output:
+            - requests.Session
+    '''
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    key = (os.getpid(), pool_size, retries, backoff_factor)
+    if key not in _sessions:
+        retry_args = {"total": retries, "backoff_factor": backoff_factor, "status_forcelist": (500, 502, 503, 504)}
+        try:
+            retry = Retry(allowed_methods=False, **retry_args)
+        except TypeError:
+            retry = Retry(method_whitelist=False, **retry_args)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _sessions[key] = session
+    return _sessions[key]
+
+
 #rest client post
-def restpost(url, data):
+def restpost(url, data, session=None, timeout=None):
     '''
         rest client post using requests
         
         input:
             - url: restapi's url
             - data: python dictionary
+            - session: requests.Session, for example from get_session, default is None (new connection for each post)
+            - timeout: float, request timeout in seconds, default is None
         
         output:
             - json format post return, if failed will return None
     '''
     import requests, json
-    data = requests.post(url=url, data=json.dumps(data))
+    if session is None:
+        session = requests
+    data = session.post(url=url, data=json.dumps(data), timeout=timeout)
     try: return data.json()
     except: return None
 
@@ -272,3 +396,83 @@ def pad_sequence(M, padding_value=0, return_length=False):
         return seq
 
 
+
+
+class LRUCache(object):
+    '''
+        Bounded least-recently-used cache with hit/miss counters, optionally backed by a sqlite file which can be shared between processes and survives restarts
+
+        Input:
+            - maxsize: int, maximum number of entries kept in memory, default is 10000
+            - cache_path: string, sqlite file path for on-disk backing, default is None
+            - disk_maxsize: int, maximum number of entries kept in the sqlite file, the oldest written entries are deleted first. Default is None, means the file grows without limit
+
+        Usage:
+            - cache.get(key): return the cached value, or None if not existed
+            - cache.set(key, value): key must be a string, value must be picklable
+            - cache.info(): return a dictionary with hits, misses, disk_hits, size and maxsize
+            - len(cache): number of entries in memory
+    '''
+    def __init__(self, maxsize=10000, cache_path=None, disk_maxsize=None):
+        self.maxsize = int(maxsize)
+        self.cache_path = cache_path
+        self.disk_maxsize = disk_maxsize
+        self.hits, self.misses, self.disk_hits = 0, 0, 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_path is not None:
+            import sqlite3
+            self._db = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=OFF')
+            self._db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB)')
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            if self._db is not None:
+                row = self._db.execute('SELECT value FROM cache WHERE key=?', (key,)).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self._insert(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._insert(key, value)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?)', (key, pickle.dumps(value, -1)))
+                if self.disk_maxsize is not None:
+                    # rowids increase with writes, keep the newest disk_maxsize rowids
+                    self._db.execute('DELETE FROM cache WHERE rowid <= (SELECT MAX(rowid) FROM cache) - ?', (int(self.disk_maxsize),))
+                self._db.commit()
+
+    def _insert(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        '''
+            clear the in-memory entries and counters, the on-disk backing is kept
+        '''
+        with self._lock:
+            self._data.clear()
+            self.hits, self.misses, self.disk_hits = 0, 0, 0
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits, "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
+
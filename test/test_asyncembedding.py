@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import asyncio, time, json, base64, threading, numpy
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from nlptools.text.embedding import Embedding_Random
+from nlptools.text.asyncembedding import AsyncEmbedding_Base, AsyncEmbedding_Redis, AsyncEmbedding_Rest
+
+# asyncio embedding clients: request coalescing, concurrency limit and timeout
+
+class SlowEmbedding(AsyncEmbedding_Base, Embedding_Random):
+    def __init__(self, delay, **args):
+        super().__init__(**args)
+        self.delay, self.requests, self.running, self.max_running = delay, [], 0, 0
+
+    async def _afetch(self, words):
+        self.requests.append(words)
+        if words[0].startswith('x'):
+            raise ValueError('bad request')
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return [numpy.full(self.dim, int(w[1:]), 'float') for w in words]
+
+async def coalescing():
+    emb = SlowEmbedding(0.1, dim=8, fetch_size=10, max_concurrency=3)
+    words = ['w{}'.format(i) for i in range(100)]
+    start = time.time()
+    results = await asyncio.gather(*[emb.aget_many(words[i:i+20]) for i in range(0, 100, 5)], emb.aget('w7'))
+    print('100 words from 21 coroutines: {} requests, {:.2f} sec'.format(len(emb.requests), time.time()-start))
+    assert sorted(w for r in emb.requests for w in r) == sorted(words)
+    assert emb.max_running <= 3 and max(len(r) for r in emb.requests) <= 10
+    assert all((v[:, 0] == numpy.arange(i, i+len(v))).all() for i, v in zip(range(0, 100, 5), results[:-1]))
+    assert (results[-1] == 7).all()
+    # cached
+    nrequest = len(emb.requests)
+    await emb.aget_many(words)
+    assert len(emb.requests) == nrequest
+
+async def timeout():
+    emb = SlowEmbedding(1, dim=8, timeout=0.1)
+    try:
+        await emb.aget('w1')
+        assert False
+    except asyncio.TimeoutError:
+        pass
+    assert 'w1' not in emb.cached_vec and len(emb._inflight) == 0
+
+async def cancel():
+    # the caller starting the request is cancelled, the other caller waiting for the same word still gets it
+    emb = SlowEmbedding(0.2, dim=8)
+    first = asyncio.ensure_future(emb.aget('w3'))
+    await asyncio.sleep(0.05)
+    second = asyncio.ensure_future(emb.aget('w3'))
+    await asyncio.sleep(0.05)
+    first.cancel()
+    assert (await second == 3).all()
+    assert first.cancelled() and len(emb.requests) == 1 and 'w3' in emb.cached_vec
+
+async def failure():
+    # a failed request cancels the other requests of the same call
+    emb = SlowEmbedding(1, dim=8, fetch_size=1)
+    try:
+        await emb.aget_many(['w1', 'w2', 'x3'])
+        assert False
+    except ValueError:
+        pass
+    await asyncio.sleep(0.01)
+    assert emb.running == 0 and len(emb._inflight) == 0
+
+asyncio.run(coalescing())
+asyncio.run(timeout())
+asyncio.run(cancel())
+asyncio.run(failure())
+
+# redis with fakeredis, rest with local server
+numpy.random.seed(0)
+dim, N = 50, 10000
+words = ['w{}'.format(i) for i in range(N)]
+weights = numpy.random.randn(N, dim)
+encode = lambda i: base64.b64encode(weights[i].tobytes()).decode()
+query = [words[i] for i in numpy.random.randint(0, N, 2000)]
+
+async def check(emb, name):
+    start = time.time()
+    vectors = await asyncio.gather(*[emb.aget_many(query[i:i+50]) for i in range(0, len(query), 50)])
+    print('{}: {:.3f} sec'.format(name, time.time() - start))
+    assert numpy.allclose(numpy.concatenate(vectors), weights[[int(w[1:]) for w in query]])
+    await emb.aclose()
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        text = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['text']
+        data = json.dumps([encode(int(w[1:])) for w in text] if isinstance(text, list) else encode(int(text[1:]))).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    def log_message(self, *args):
+        pass
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+try:
+    import aiohttp
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    asyncio.run(check(AsyncEmbedding_Rest('http://127.0.0.1:{}/'.format(server.server_port), dim=dim, fetch_size=100), 'restapi'))
+    server.shutdown()
+except ImportError:
+    print('restapi: skip, aiohttp is not installed')
+
+try:
+    import fakeredis
+    emb = AsyncEmbedding_Redis('localhost', 6379, 0, dim=dim)
+    emb.aredis_ins = fakeredis.FakeAsyncRedis()
+    asyncio.run(emb.aredis_ins.mset({w:encode(i) for i, w in enumerate(words)}))
+    asyncio.run(check(emb, 'redis'))
+except ImportError:
+    print('redis: skip, redis or fakeredis is not installed')
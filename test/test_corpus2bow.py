@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+import sys, time, numpy
+from collections import Counter
+from nlptools.text.vocab import Vocab
+from nlptools.text.tfidf import TFIDF
+
+# corpus to sparse bag of words, shared by tfidf and topic model
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(20000)]
+corpus = [[words[i] for i in numpy.random.zipf(1.3, 50) % len(words)] for _ in range(20000)]
+
+vocab = Vocab()
+start = time.time()
+bow = vocab.corpus2bow(corpus)
+print('corpus2bow: {} documents, {} nonzeros, {:.3f} sec'.format(bow.shape[0], bow.nnz, time.time()-start))
+
+vocab.freeze()
+for doc, row in zip(corpus[:100], bow[:100]):
+    counts = Counter(vocab.words2id(doc).tolist())
+    assert dict(zip(row.indices.tolist(), row.data.tolist())) == counts
+
+# tfidf from bow is the same as counting corpus ids
+corpus_ids = [vocab.words2id(doc) for doc in corpus]
+tfidf = TFIDF(vocab_size=vocab.vocab_size)
+tfidf.load_bow(bow)
+count_matrix, word_idfs = TFIDF(vocab_size=vocab.vocab_size).load_index(corpus_ids, local_use=True)
+assert (tfidf.count_matrix != count_matrix).nnz == 0
+assert numpy.allclose(tfidf.word_idfs, word_idfs)
+assert (vocab.ids2bow(corpus_ids) != bow).nnz == 0
+
+# gensim streaming view over the sparse matrix
+try:
+    from nlptools.text.topicmodel import Corpus, LSI
+except ImportError as err:
+    print('skip topicmodel, gensim is not installed:', err)
+    sys.exit(0)
+docs = Corpus(bow)
+assert len(docs) == len(corpus)
+assert next(iter(docs)) == sorted(Counter(corpus_ids[0].tolist()).items())
+lsi = LSI('/tmp/test_corpus2bow.lsi', 10)
+lsi.build(docs)
+print(lsi[[next(iter(docs))]])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import time, os, json, base64, threading, numpy, h5py
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from nlptools.utils import zdump
+from nlptools.text.embedding import Embedding_File, Embedding_Rest, Embedding_Redis, Embedding_Dynamodb
+
+# get_many of each embedding backend should equal reading word by word
+
+numpy.random.seed(0)
+dim, N = 50, 100000
+words = ['w{}'.format(i) for i in range(N)]
+weights = numpy.random.randn(N, dim)
+query = [words[i] for i in numpy.random.randint(0, N, 5000)] + ['oov1', 'oov2']
+
+def encode(i):
+    return base64.b64encode(weights[i].tobytes()).decode()
+
+def check(emb, name):
+    start = time.time()
+    vectors = emb.get_many(query)
+    cost = time.time() - start
+    emb.cached_vec = {}
+    start = time.time()
+    single = [emb[w] for w in query]
+    print('{}: get_many {:.3f} sec, one by one {:.3f} sec'.format(name, cost, time.time()-start))
+    assert vectors.shape == (len(query), dim)
+    for w, v, s in zip(query, vectors, single):
+        if w.startswith('oov'):
+            continue
+        assert numpy.allclose(v, s) and numpy.allclose(v, weights[int(w[1:])])
+
+# hdf5 file
+with h5py.File('/tmp/test_embedding_bulk.h5', 'w') as f:
+    f['word2vec'] = weights
+zdump({w:i for i, w in enumerate(words)}, '/tmp/test_embedding_bulk.pkl')
+check(Embedding_File('/tmp/test_embedding_bulk.pkl', '/tmp/test_embedding_bulk.h5'), 'file')
+
+# restapi, a local server accepting one word or a word list
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        text = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['text']
+        lookup = lambda w: encode(int(w[1:])) if w in emb_words else encode(0)
+        data = [lookup(w) for w in text] if isinstance(text, list) else lookup(text)
+        data = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    def log_message(self, *args):
+        pass
+
+emb_words = set(words)
+server = HTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+check(Embedding_Rest('http://127.0.0.1:{}/'.format(server.server_port), dim=dim), 'restapi')
+server.shutdown()
+
+# redis, use fakeredis as server
+try:
+    import fakeredis
+    emb = Embedding_Redis('localhost', 6379, 0, dim=dim)
+    emb.redis_ins = fakeredis.FakeStrictRedis()
+    emb.redis_ins.mset({w:encode(i) for i, w in enumerate(words)})
+    check(emb, 'redis')
+except ImportError:
+    print('redis: skip, redis or fakeredis is not installed')
+
+# dynamodb, use moto as aws
+class Throttled:
+    # return all keys as unprocessed for the first *n* requests
+    def __init__(self, client, n):
+        self.client, self.n, self.requests = client, n, 0
+    def batch_get_item(self, RequestItems):
+        self.requests += 1
+        if self.requests <= self.n:
+            return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+        return self.client.batch_get_item(RequestItems=RequestItems)
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+    print('dynamodb: skip, boto3 or moto is not installed')
+if mock_aws is not None:
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(TableName='vectors', KeySchema=[{'AttributeName':'word', 'KeyType':'HASH'}],
+                AttributeDefinitions=[{'AttributeName':'word', 'AttributeType':'S'}], BillingMode='PAY_PER_REQUEST')
+        with table.batch_writer() as batch:
+            for i, w in enumerate(words[:20000]):
+                batch.put_item(Item={'word':w, 'vector':encode(i).encode()})
+        query = [w for w in query if w.startswith('oov') or int(w[1:]) < 20000]
+        check(Embedding_Dynamodb('vectors', dim=dim), 'dynamodb')
+
+        # unprocessed keys are retried with backoff, and fail after max_retries
+        emb = Embedding_Dynamodb('vectors', dim=dim, retry_delay=0.01, max_retries=3)
+        throttled = Throttled(emb.client, 2)
+        assert numpy.allclose(emb._get_many(['w1'], throttled)[0], weights[1]) and throttled.requests == 3
+        try:
+            emb._get_many(['w1'], Throttled(emb.client, 10))
+            assert False
+        except RuntimeError:
+            pass
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import os, time, tracemalloc, numpy
+from nlptools.text.embedding import VectorCache, Embedding_Random
+
+# bounded vector cache of embedding
+
+vec = lambda i: numpy.full(4, i, 'float64')
+
+# lru, the least recently used is evicted
+cache = VectorCache(max_entries=3)
+for i in range(3):
+    cache[i] = vec(i)
+cache.get(0)
+cache[3] = vec(3)
+assert list(cache) == [2, 0, 3] and cache.evictions == 1
+assert cache.get(1) is None and cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+# lfu, the least frequently used is evicted, ties by insert order
+cache = VectorCache(max_entries=3, policy='lfu')
+for i in range(3):
+    cache[i] = vec(i)
+for i in [0, 0, 1, 2, 2]:
+    cache.get(i)
+cache[3] = vec(3)
+assert 1 not in cache and set(cache) == {0, 2, 3}
+cache[4] = vec(4)
+assert 3 not in cache and set(cache) == {0, 2, 4}
+
+# bytes limit
+cache = VectorCache(max_bytes=100)
+for i in range(10):
+    cache[i] = vec(i)
+assert len(cache) == 3 and cache.nbytes == 96
+
+# slab, rows of evicted words are reused
+cache = VectorCache(max_entries=100, slab=True)
+for i in range(1000):
+    cache[i] = vec(i)
+assert len(cache) == 100 and cache._slab.shape == (128, 4) and cache.nbytes == 1600
+assert cache[999].dtype == numpy.float32 and (cache[999] == 999).all()
+assert all((v == k).all() for k, v in cache.items())
+
+# embedding with bounded cache
+if os.path.exists('/tmp/test_embedding_cache.pkl'):
+    os.remove('/tmp/test_embedding_cache.pkl')
+emb = Embedding_Random(dim=50, cache_size=1000, cached_data='/tmp/test_embedding_cache.pkl')
+vectors = emb.get_many(['w{}'.format(i) for i in range(500)])
+assert numpy.allclose(emb.get_many(['w{}'.format(i) for i in range(500)]), vectors)
+for i in range(5000):
+    emb['w{}'.format(i)]
+print(emb.cached_vec.stats())
+assert len(emb.cached_vec) == 1000 and emb.cached_vec.evictions == 4000
+emb.save()
+emb = Embedding_Random(dim=50, cache_size=1000, cached_data='/tmp/test_embedding_cache.pkl')
+assert len(emb.cached_vec) == 1000 and 'w4999' in emb
+
+# memory of separate arrays and slab
+for slab in [False, True]:
+    tracemalloc.start()
+    cache = VectorCache(slab=slab)
+    start = time.time()
+    for i in range(100000):
+        cache[i] = numpy.random.randn(300)
+    cost = time.time() - start
+    print('slab={}: {:.1f} MB, {:.2f} sec'.format(slab, tracemalloc.get_traced_memory()[0]/1024/1024, cost))
+    tracemalloc.stop()
+    del cache
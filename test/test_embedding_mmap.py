@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import time, numpy, h5py, multiprocessing
+from nlptools.utils import zdump
+from nlptools.text.embedding import Embedding, Embedding_File, Embedding_Mmap
+
+# memory mapped embedding converted from hdf5 file
+
+numpy.random.seed(0)
+dim, N = 100, 200000
+words = ['w{}'.format(i) for i in range(N)]
+weights = numpy.random.randn(N, dim)
+with h5py.File('/tmp/test_embedding_mmap.h5', 'w') as f:
+    f['word2vec'] = weights
+zdump({w:i for i, w in enumerate(words)}, '/tmp/test_embedding_mmap.pkl')
+
+start = time.time()
+Embedding_Mmap.convert('/tmp/test_embedding_mmap.pkl', '/tmp/test_embedding_mmap.h5', '/tmp/test_embedding_mmap.vocab', '/tmp/test_embedding_mmap.npy')
+print('convert: {:.2f} sec'.format(time.time() - start))
+
+cfg = {'w2v_mmap_word2idx':'/tmp/test_embedding_mmap.vocab', 'w2v_mmap_idx2vec':'/tmp/test_embedding_mmap.npy'}
+emb = Embedding(**cfg)
+assert isinstance(emb, Embedding_Mmap) and emb.dim == dim
+assert 'w5' in emb and 'oov' not in emb
+assert numpy.allclose(emb['w5'], weights[5], atol=1e-6)
+assert numpy.allclose(emb['oov'], emb['oov'])
+
+query = [words[i] for i in numpy.random.randint(0, N, 50000)] + ['oov']
+file_emb = Embedding_File('/tmp/test_embedding_mmap.pkl', '/tmp/test_embedding_mmap.h5')
+start = time.time()
+for w in query:
+    file_emb[w]
+print('hdf5 one by one: {:.3f} sec'.format(time.time() - start))
+start = time.time()
+vectors = emb.get_many(query)
+print('mmap get_many: {:.3f} sec'.format(time.time() - start))
+assert numpy.allclose(vectors[:-1], weights[[int(w[1:]) for w in query[:-1]]], atol=1e-6)
+assert numpy.allclose(vectors[-1], emb['oov'])
+
+# forked workers read the same mapped pages
+def worker(w):
+    return emb[w]
+
+with multiprocessing.Pool(4) as pool:
+    result = pool.map(worker, words[:1000])
+assert numpy.allclose(numpy.stack(result), weights[:1000], atol=1e-6)
+
+# missing vocab file is an error, not an empty lookup
+try:
+    Embedding_Mmap('/tmp/test_embedding_mmap_missing.vocab', '/tmp/test_embedding_mmap.npy')
+    assert False
+except FileNotFoundError:
+    pass
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+import time, sys, subprocess, numpy
+from nlptools.text.embedding import Embedding_Random
+
+# deterministic vectors for words not in data source
+
+def other_process(oov, words):
+    code = 'from nlptools.text.embedding import Embedding_Random; print(Embedding_Random(dim=100, oov="{}").get_many({}).tolist())'.format(oov, words)
+    return numpy.array(eval(subprocess.check_output([sys.executable, '-c', code])))
+
+def cosine(a, b):
+    return numpy.dot(a, b) / numpy.linalg.norm(a) / numpy.linalg.norm(b)
+
+words = ['running', 'runner', 'banana']
+for oov in ['hash', 'subword']:
+    emb = Embedding_Random(dim=100, oov=oov)
+    vectors = emb.get_many(words)
+    assert len(emb.cached_vec) == 0
+    # same vectors on other processes
+    assert numpy.allclose(vectors, other_process(oov, words))
+    assert numpy.allclose(emb['running'], vectors[0])
+    assert not numpy.allclose(vectors[0], vectors[1])
+    assert not numpy.allclose(Embedding_Random(dim=100, oov=oov, oov_seed=1)['running'], vectors[0])
+    print('{}: cosine(running, runner)={:.3f}, cosine(running, banana)={:.3f}'.format(oov, cosine(vectors[0], vectors[1]), cosine(vectors[0], vectors[2])))
+    # scale like random vectors
+    assert 0.7 < numpy.std(emb.get_many(['w{}'.format(i) for i in range(1000)])) < 1.3
+
+emb = Embedding_Random(dim=100, oov='subword')
+vectors = emb.get_many(words)
+assert cosine(vectors[0], vectors[1]) > 0.15 > abs(cosine(vectors[0], vectors[2]))
+assert Embedding_Random(dim=100, oov='subword', additional_dim=1)['a'].shape == (101,)
+assert isinstance(Embedding_Random(dim=100, oov='hash', base64=True)['a'], str)
+
+# speed compared with random vectors in cache
+query = ['w{}'.format(i) for i in range(20000)]
+for oov in ['random', 'hash', 'subword']:
+    emb = Embedding_Random(dim=300, oov=oov)
+    start = time.time()
+    emb.get_many(query)
+    print('{}: {:.2f} sec, {} cached'.format(oov, time.time()-start, len(emb.cached_vec)))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import time, numpy
+from nlptools.text.vocab import Vocab
+from nlptools.text.tokenizer import Tokenizer_Simple, format_sentences, pad_ids, _trim_punctuation
+
+# format_sentences and pad_ids compared with padding sentence by sentence
+
+# pad_ids
+encoded = pad_ids([[5, 6, 7], [], [8]], 6, 1, 2, offsets=[[(0, 1), (2, 3), (4, 6)], [], [(1, 2)]])
+assert encoded['ids'].tolist() == [[1, 5, 6, 7, 2, 0], [1, 2, 0, 0, 0, 0], [1, 8, 2, 0, 0, 0]]
+assert encoded['mask'].tolist() == [[1, 1, 1, 1, 1, 0], [1, 1, 0, 0, 0, 0], [1, 1, 1, 0, 0, 0]]
+assert encoded['lengths'].tolist() == [3, 0, 1]
+assert encoded['offsets'][0, :5].tolist() == [[0, 0], [0, 1], [2, 3], [4, 6], [0, 0]] and encoded['offsets'][2, 1].tolist() == [1, 2]
+encoded = pad_ids([[5, 6], [7]], 3)
+assert encoded['ids'].tolist() == [[5, 6, 0], [7, 0, 0]] and encoded['mask'].tolist() == [[1, 1, 0], [1, 0, 0]]
+assert pad_ids([], 4)['ids'].shape == (0, 4)
+
+def reference(tokens, vocab, max_seq_len):
+    ids = list(vocab.words2id(_trim_punctuation(tokens, max_seq_len-2))[:max_seq_len-2]) if len(tokens) > 0 else []
+    row = [vocab.BOS_ID] + ids + [vocab.EOS_ID]
+    return row + [0] * (max_seq_len - len(row))
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(100)] + ['.', ',', '!']
+sentences = [' '.join(numpy.random.choice(words, numpy.random.randint(0, 30))) for _ in range(2000)]
+sentences += ['', 'a b c d e f g h i j k', 'x y z']
+tokenizer = Tokenizer_Simple()
+vocab = Vocab()
+max_seq_len = 12
+tokens = [tokenizer(s) for s in sentences]
+expected = numpy.array([reference(t, vocab, max_seq_len) for t in tokens])
+vocab.freeze()
+
+# truncation and padding, from strings, tokens and token ids
+start = time.time()
+ids, mask = format_sentences(sentences, vocab, tokenizer, max_seq_len)
+print('format_sentences: {:.3f} sec'.format(time.time() - start))
+assert ids.dtype == numpy.int32 and ids.shape == (len(sentences), max_seq_len)
+assert (ids == expected).all()
+assert (mask == (expected != 0)).all()
+# punctuations at the end of a too long token list are removed before truncation
+ids, mask = format_sentences([['a', 'b', 'c', 'd', ',', '.'], ['a', '.']], vocab, tokenizer, 6)
+assert ids.tolist() == [[1] + vocab.words2id(['a', 'b', 'c', 'd']).tolist() + [2], [1] + vocab.words2id(['a', '.']).tolist() + [2, 0, 0]]
+ids2, mask2 = format_sentences([vocab.words2id(t)[:max_seq_len-2].tolist() for t in tokens], vocab, None, max_seq_len)
+assert (ids2[:, 0] == vocab.BOS_ID).all() and (mask2.sum(1) == numpy.array([min(len(t), max_seq_len-2) + 2 for t in tokens])).all()
+
+# buckets are sorted by length, each padded to its longest sentence
+buckets = format_sentences(sentences, vocab, tokenizer, max_seq_len, bucket_size=64)
+indexes = numpy.concatenate([b[0] for b in buckets])
+assert sorted(indexes.tolist()) == list(range(len(sentences)))
+lengths = expected.astype('bool').sum(1)
+assert (numpy.diff(lengths[indexes]) >= 0).all()
+for idx, bucket_ids, bucket_mask in buckets:
+    assert len(idx) <= 64 and bucket_ids.shape[1] == lengths[idx].max()
+    assert (bucket_ids == expected[idx, :bucket_ids.shape[1]]).all()
+    assert (bucket_mask.sum(1) == lengths[idx]).all()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import os, tempfile, time, numpy
+from sklearn.utils import murmurhash3_32
+from nlptools.utils import hashwords
+from nlptools.text import HashVocab, Vocab
+from nlptools.text.tfidf import TFIDF
+
+# hashing trick vocab, the vectorized hash is the same as sklearn murmurhash3_32
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(1000000)] + ['中文', '']
+assert (hashwords(words) == numpy.array([murmurhash3_32(w, positive=True) for w in words], 'uint32')).all()
+assert (hashwords(words, positive=False, seed=3) == numpy.array([murmurhash3_32(w, seed=3) for w in words], 'int32')).all()
+
+vocab = HashVocab(vocab_size=2**18, reverse_sample=100)
+sentences = [[words[i] for i in numpy.random.zipf(1.2, 20) % len(words)] for _ in range(50000)]
+ntokens = sum(len(s) for s in sentences)
+
+start = time.time()
+ids, offsets = vocab.words2id_csr(sentences)
+print('hash vocab: {:.0f} tokens/sec, tf memory {:.1f} MB'.format(ntokens/(time.time()-start), vocab._id2tf.nbytes/1024/1024))
+assert ids.min() >= 4 and ids.max() < vocab.vocab_size
+assert vocab._id2tf.sum() == ntokens
+assert vocab.word2id(Vocab.PAD) == Vocab.PAD_ID and vocab.word2id(Vocab.UNK) == Vocab.UNK_ID
+assert vocab.word2id('w1') == murmurhash3_32('w1', positive=True) % (vocab.vocab_size - 4) + 4
+print(vocab)
+
+# counting per sentence costs O(tokens), not O(vocab_size)
+per_sentence = HashVocab(vocab_size=2**18)
+start = time.time()
+for s in sentences[:5000]:
+    per_sentence.words2id(s)
+print('hash vocab per sentence with count: {:.3f} ms/sentence'.format((time.time()-start)/5))
+expected = numpy.bincount(numpy.concatenate([vocab.words2id_csr(s, count=False)[0] for s in sentences[:5000]]), minlength=vocab.vocab_size)
+assert (per_sentence._id2tf == expected).all()
+print(vocab.id2words(ids[:10]), [vocab.reverse_lookup(i) for i in ids[:3]])
+
+# signed hashing
+signed = HashVocab(vocab_size=2**18, signed=True)
+h = numpy.array([murmurhash3_32(w) for w in sentences[0]])
+assert (signed.words2sign(sentences[0]) == numpy.where(h >= 0, 1, -1)).all()
+assert (signed.words2id(sentences[0]) == numpy.abs(h) % (2**18 - 4) + 4).all()
+
+# ids can be used by tfidf directly
+tfidf = TFIDF(vocab_size=vocab.vocab_size)
+tfidf.load_index([ids[offsets[i]:offsets[i+1]] for i in range(1000)])
+print(tfidf.search(vocab.words2id(sentences[0]), topN=3))
+
+# save and merge
+vocab.cached_vocab = os.path.join(tempfile.mkdtemp(), 'hashvocab.pkl')
+vocab.save()
+loaded = HashVocab(cached_vocab=vocab.cached_vocab)
+assert loaded == vocab and (loaded._id2tf == vocab._id2tf).all()
+loaded = loaded + vocab
+assert (loaded._id2tf == 2*vocab._id2tf).all()
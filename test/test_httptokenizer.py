@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import json, threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from nlptools.text.tokenizer import Tokenizer_Rest
+
+# local stub of the tokenizer restapi
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        body = json.dumps({'tokens': data['text'].split()}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.ports.add(self.client_address[1])
+
+    def log_message(self, *args):
+        pass
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+server = StubServer(('127.0.0.1', 0), StubHandler)
+server.ports = set()
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+t = Tokenizer_Rest('http://127.0.0.1:{}/api/tokenize/'.format(server.server_port), pool_size=4)
+
+text = ['sentence number {}'.format(i) for i in range(100)]
+
+print(t.seg(text[0]))
+
+results = list(t.seg_batch(text, n_concurrent=4))
+assert [r['tokens'] for r in results] == [s.split() for s in text]
+print('connections used for 101 requests:', len(server.ports))
+assert len(server.ports) <= 4
+
+server.shutdown()
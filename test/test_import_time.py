@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import subprocess, sys, json
+
+# importing the package or a light class should not pull in the heavy optional dependencies
+
+heavy = ['spacy', 'sklearn', 'scipy', 'h5py', 'requests', 'pandas', 'torch', 'tqdm', 'transformers']
+
+code = '''
+import sys, time, json
+start = time.time()
+{}
+cost = time.time() - start
+print(json.dumps({{"time":cost, "loaded":[m for m in {} if m in sys.modules]}}))
+'''
+
+for stmt in ['import nlptools.text', 'from nlptools.text import Vocab', 'from nlptools.text import Tokenizer', 'from nlptools.utils import zload']:
+    output = subprocess.check_output([sys.executable, '-c', code.format(stmt, heavy)])
+    result = json.loads(output.decode('utf-8').strip().split('\n')[-1])
+    print('{:40s} {:.3f} sec'.format(stmt, result['time']))
+    assert not result['loaded'], 'heavy modules imported: {}'.format(result['loaded'])
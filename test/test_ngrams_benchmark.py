@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import time, numpy
+from nlptools.text.ngrams import Ngrams
+
+# benchmark hashed ngram ids against the ngrams joined to string, n=1..5
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(20000)]
+sentences = [[words[i] for i in numpy.random.zipf(1.3, 30) % len(words)] for _ in range(20000)]
+ntokens = sum(len(s) for s in sentences)
+
+for n in range(1, 6):
+    joined = Ngrams(ngrams=n, vocab_size=2**23)
+    start = time.time()
+    old = [joined.words2id(s) for s in sentences]
+    old_time = time.time() - start
+
+    hashed = Ngrams(ngrams=n, ngram_size=2**24)
+    start = time.time()
+    new = hashed.ngrams2id_csr(sentences)
+    new_time = time.time() - start
+    print('n={}: joined string {:.0f} tokens/sec, rolling hash {:.0f} tokens/sec'.format(n, ntokens/old_time, ntokens/new_time))
+
+    for i in range(1, n+1):
+        ids, offsets = new[i]
+        assert ids.dtype == numpy.int64 and len(offsets) == len(sentences) + 1
+        assert all(len(o[i]) == offsets[j+1] - offsets[j] for j, o in enumerate(old))
+        if i > 1:
+            assert ids.min() >= hashed.vocab_size and ids.max() < hashed.vocab_size + hashed.ngram_size
+        # same ngram always gets the same id, different ngram gets same id only when hash collides
+        old_ids, new_ids = numpy.concatenate([o[i] for o in old]), ids
+        pairs = numpy.unique(numpy.stack([old_ids, new_ids]), axis=1)
+        assert len(numpy.unique(pairs[0])) == pairs.shape[1]
+        assert pairs.shape[1] - len(numpy.unique(pairs[1])) < pairs.shape[1] * 0.02
+
+# single sentence
+vocab = Ngrams(ngrams=3, ngram_size=1000)
+ids = vocab.words2id('a b c a b c'.split())
+assert ids[2][0] == ids[2][3] and ids[3][0] == ids[3][3] and len(ids[3]) == 4
+assert vocab.ids2tf(ids[2][:1]) == [2]
+
+# batch of sentences
+batch = vocab.words2id(['a b c'.split(), 'a b'.split()], batch=True)
+assert len(batch) == 2 and (batch[0][2] == ids[2][:2]).all() and len(batch[1][3]) == 0
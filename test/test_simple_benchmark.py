@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import random, time
+from nlptools.text.tokenizer import Tokenizer_Simple
+
+# benchmark Tokenizer_Simple.seg_lines against the previous per-sentence implementation
+
+def seg_old(t, stopwords, sentence, remove_stopwords=True):
+    tokens = [s.lower() for s in t.re_punc.split(sentence) if len(s)>0]
+    if remove_stopwords:
+        tokens = [s for s in tokens if s not in stopwords]
+    return tokens
+
+random.seed(0)
+words = ['The', 'quick', 'Brown', 'fox', 'jumps', 'over', 'lazy', 'dog', 'a', 'of', 'to', 'IN', '今天', '天气']
+puncs = [' ', ' ', ' ', ', ', '. ', '? ', '(', ') ', '；', '“']
+lines = [''.join(random.choice(words) + random.choice(puncs) for _ in range(20)) for _ in range(200000)]
+
+t = Tokenizer_Simple()
+t.stopwords = frozenset(['a', 'of', 'to', 'in', 'the'])
+stopwords_dict = {w:'' for w in t.stopwords}
+
+start = time.time()
+old = [seg_old(t, stopwords_dict, l) for l in lines]
+old_time = time.time() - start
+
+start = time.time()
+new = t.seg_lines(lines)
+new_time = time.time() - start
+
+assert old == new
+print('old seg:   {:.0f} lines/sec'.format(len(lines)/old_time))
+print('seg_lines: {:.0f} lines/sec'.format(len(lines)/new_time))
+
+start = time.time()
+old = [seg_old(t, stopwords_dict, l, False) for l in lines]
+old_time = time.time() - start
+
+start = time.time()
+new = t.seg_lines(lines, False)
+new_time = time.time() - start
+
+assert old == new
+print('old seg, keep stopwords:   {:.0f} lines/sec'.format(len(lines)/old_time))
+print('seg_lines, keep stopwords: {:.0f} lines/sec'.format(len(lines)/new_time))
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+import sys, time
+from nlptools.text.tokenizer import Tokenizer_Spacy
+
+# seg_batch should return the same infos as seg, for the outputs requested
+
+try:
+    t = Tokenizer_Spacy(spacy_model='en_core_web_sm', spacy_pipes=['tagger', 'parser', 'ner'])
+except (ImportError, OSError) as err:
+    print('skip, spacy model is not available:', err)
+    sys.exit(0)
+
+sentences = ['Apple is looking at buying U.K. startup for $1 billion.', 'He was running to the stores in London.', '']
+for s, infos in zip(sentences, t.seg_batch(sentences, offsets=True, outputs=['dep', 'entities'])):
+    assert infos == t.seg(s, offsets=True)
+# parser and ner are skipped by default, tokens, tags and pos are still same as seg
+for s, infos in zip(sentences, t.seg_batch(sentences, batch_size=1)):
+    full = t.seg(s)
+    for k in ['tokens', 'texts', 'tags', 'pos']:
+        assert infos[k] == full[k]
+for s, infos in zip(sentences, t.seg_batch(sentences, entities_filter=['GPE'])):
+    full = t.seg(s, entities_filter=['GPE'])
+    assert infos['tokens'] == full['tokens'] and infos['entities'] == full['entities']
+
+sentences = sentences[:2] * 500
+for name, outputs in [('all pipes', ['dep', 'entities']), ('default', None)]:
+    start = time.time()
+    list(t.seg_batch(sentences, outputs=outputs))
+    print('seg_batch {}: {:.2f} sec'.format(name, time.time() - start))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import os, time
+from nlptools.text.tokenizer import Tokenizer
+
+cache_path = '/tmp/test_tokenizer_cache.db'
+for suffix in ['', '-wal', '-shm']:
+    if os.path.exists(cache_path + suffix):
+        os.remove(cache_path + suffix)
+
+sentences = ['今天天气 hello {}'.format(i % 100) for i in range(1000)]
+
+# hits and misses
+t = Tokenizer('simple', cache_size=1000)
+start = time.time()
+tokens = [t(s) for s in sentences]
+print('simple with cache: {:.3f} sec'.format(time.time() - start))
+info = t.cache_info()
+print(info)
+assert info['misses'] == 100 and info['hits'] == 900
+assert tokens == [Tokenizer('simple')(s) for s in sentences]
+t.seg(sentences[0], remove_stopwords=False)
+assert t.cache_info()['misses'] == 101
+
+# tokenizers sharing one sqlite file don't read results of each other
+simple = Tokenizer('simple', cache_size=10, cache_path=cache_path)
+char = Tokenizer('char', cache_size=10, cache_path=cache_path)
+assert simple('今天天气 hello') == ['今天天气', 'hello']
+assert char('今天天气 hello') == Tokenizer('char')('今天天气 hello')
+assert char.cache_info()['disk_hits'] == 0
+
+# persisted cache, read by a new instance
+simple = Tokenizer('simple', cache_size=10, cache_path=cache_path)
+assert simple('今天天气 hello') == ['今天天气', 'hello']
+assert simple.cache_info()['disk_hits'] == 1
+
+# on-disk size limit
+import sqlite3
+t = Tokenizer('simple', cache_size=10, cache_path=cache_path, cache_disk_size=50)
+for s in sentences[:200]:
+    t(s)
+n = sqlite3.connect(cache_path).execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+print('entries on disk:', n)
+assert n <= 50
+
+# changed stopwords don't get the results cached with the old ones
+t = Tokenizer('simple', cache_size=10, cache_path=cache_path)
+assert t('the weather is good') == ['the', 'weather', 'is', 'good']
+t.stopwords = frozenset(['the', 'is'])
+assert t('the weather is good') == ['weather', 'good']
+t = Tokenizer('simple', cache_size=10, cache_path=cache_path)
+t.stopwords = frozenset(['good'])
+assert t('the weather is good') == ['the', 'weather', 'is']
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import sys, numpy
+from nlptools.text.tokenizer import Tokenizer_BERT, format_sentence, format_sentences
+
+# encode_batch and the fast path of format_sentence should equal tokenizing sentence by sentence
+
+try:
+    t = Tokenizer_BERT(bert_model_name='bert-base-uncased', use_fast=True)
+except (ImportError, OSError) as err:
+    print('skip, bert model is not available:', err)
+    sys.exit(0)
+vocab = t.vocab
+
+sentences = ['Who was Jim Henson ? Jim Henson was a puppeteer', 'unaffable Héllo, 中文', '', ' '.join(['word'] * 100)]
+max_seq_len = 20
+encoded = t.encode_batch(sentences, max_seq_len, vocab.BOS_ID, vocab.EOS_ID)
+for i, s in enumerate(sentences):
+    infos = t.seg(s, remove_stopwords=False, offsets=True)
+    ids = t.tokenizer.convert_tokens_to_ids(infos['tokens'])[:max_seq_len-2]
+    n = len(ids)
+    assert encoded['lengths'][i] == n
+    assert encoded['ids'][i, :n+2].tolist() == [vocab.BOS_ID] + ids + [vocab.EOS_ID]
+    assert (encoded['ids'][i, n+2:] == 0).all() and encoded['mask'][i].sum() == n + 2
+    assert [tuple(x) for x in encoded['offsets'][i, 1:n+1].tolist()] == infos['offsets'][:n]
+
+    single = format_sentence(s, vocab, t, max_seq_len)
+    if n < 1:
+        assert single is None
+        continue
+    assert (single[0] == encoded['ids'][i]).all() and (single[1] == encoded['mask'][i]).all()
+
+ids, mask = format_sentences(sentences, vocab, t, max_seq_len)
+assert (ids == encoded['ids']).all() and (mask == encoded['mask']).all()
+print(encoded['ids'][0])
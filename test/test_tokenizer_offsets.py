@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import unicodedata
+from types import SimpleNamespace
+from nlptools.text.tokenizer import Tokenizer, Tokenizer_BERT
+
+# the (start, end) offsets of tokens should slice the raw sentence back to each token
+
+sentences = ['The quick (Brown) fox; jumps  over 今天天气 “lazy” dog!', '  Hello, WORLD.\tagain  ', '', '中华人民共和国成立了，你好']
+
+def check(t, normalize=lambda x: x, **args):
+    for s in sentences:
+        infos = t.seg(s, offsets=True, **args)
+        assert infos['tokens'] == t.seg(s, **args)['tokens']
+        assert len(infos['tokens']) == len(infos['offsets'])
+        for token, (start, end) in zip(infos['tokens'], infos['offsets']):
+            assert normalize(s[start:end]) == token, (token, s[start:end])
+
+for name in ['simple', 'char']:
+    t = Tokenizer(name)
+    t.stopwords = frozenset(['the', 'over', '天'])
+    check(t, str.lower)
+    check(t, str.lower, remove_stopwords=False)
+check(Tokenizer('jieba'))
+
+# wordpieces of BERT basic tokenizer aligned back to raw text, the model is not needed
+bert = Tokenizer_BERT.__new__(Tokenizer_BERT)
+bert.do_lower_case = True
+bert.tokenizer = SimpleNamespace(unk_token='[UNK]')
+s = 'Héllo, WORLD unaffable 中文 ☃ end'
+tokens = ['hello', ',', 'world', 'una', '##ffa', '##ble', '中', '文', '[UNK]', 'end']
+spans = bert._align(s, tokens)
+strip = lambda x: ''.join(c for c in unicodedata.normalize('NFD', x.lower()) if unicodedata.category(c) != 'Mn')
+assert [strip(s[a:b]) for a, b in spans] == ['hello', ',', 'world', 'una', 'ffa', 'ble', '中', '文', '☃', 'end']
+print(list(zip(tokens, spans)))
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+import time
+from nlptools.text.tokenizer import Tokenizer_Simple
+
+# Tokenizer.pipe with worker processes should keep the input order
+
+if __name__ == '__main__':
+    t = Tokenizer_Simple()
+    sentences = ['sentence {} with {} words'.format(i, i % 7) for i in range(20000)]
+    expected = [t(s) for s in sentences]
+
+    start = time.time()
+    tokens = list(t.pipe((s for s in sentences), n_process=3, batch_size=97))
+    print('pipe with 3 processes: {:.2f} sec'.format(time.time() - start))
+    assert tokens == expected
+
+    assert list(t.pipe(sentences[:10], n_process=1, batch_size=3)) == expected[:10]
+    assert list(t.pipe([], n_process=2)) == []
+
+    batch = t(sentences[:3] + [''], batch=True)
+    assert len(batch) == 4 and list(batch[:3]) == expected[:3] and batch[3] == []
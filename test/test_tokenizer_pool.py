@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+from nlptools.text.tokenizer import Tokenizer_Simple
+
+# Tokenizer_Pool keeps its queues across seg_batch calls, a call closed early must not leak results into the next call
+
+if __name__ == '__main__':
+    t = Tokenizer_Simple()
+    with t.pool(n_process=2, batch_size=1, max_pending=4) as pool:
+        first = pool.seg_batch(['s{}'.format(i) for i in range(6)])
+        assert next(first)['tokens'] == ['s0']
+        first.close()
+
+        tokens = [x['tokens'] for x in pool.seg_batch(['t{}'.format(i) for i in range(6)])]
+        print(tokens)
+        assert tokens == [['t{}'.format(i)] for i in range(6)]
+
+        sentences = ['sentence {} of the pool'.format(i) for i in range(1000)]
+        tokens = [x['tokens'] for x in pool.seg_batch(sentences, remove_stopwords=False)]
+        assert tokens == [t.seg(s, remove_stopwords=False)['tokens'] for s in sentences]
+
+    # a pool failed in __init__ is garbage collected without error
+    import gc, sys
+    from nlptools.text.tokenizer import Tokenizer_Pool
+    errors = []
+    sys.unraisablehook = errors.append
+    try:
+        Tokenizer_Pool(t.config, n_process=2, max_pending='x')
+        assert False
+    except TypeError:
+        pass
+    gc.collect()
+    assert errors == []
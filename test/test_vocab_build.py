@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import os, tempfile, numpy
+from nlptools.text.vocab import Vocab
+from nlptools.text.tokenizer import Tokenizer
+
+# build vocab from file in parallel and compare with the sequential word2id
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(50000)]
+filename = os.path.join(tempfile.mkdtemp(), 'corpus.txt')
+with open(filename, 'w') as f:
+    for _ in range(200000):
+        f.write(' '.join(words[i] for i in numpy.random.zipf(1.3, 15) % len(words)) + '\n')
+
+tokenizer = Tokenizer('simple')
+vocab = Vocab.build(filename, tokenizer=tokenizer, n_process=4, chunk_size=2**20)
+
+sequential = Vocab()
+with open(filename) as f:
+    for l in f:
+        sequential.words2id(tokenizer.seg(l.strip())['tokens'])
+
+print(vocab)
+assert len(vocab) == len(sequential)
+assert all(vocab._id2tf[vocab._word2id[w]] == sequential._id2tf[i] for w, i in sequential._word2id.items())
+
+# most frequent 1000 words, special characters keep their ids
+small = Vocab.build(filename, vocab_size=1000, n_process=4, chunk_size=2**20)
+assert len(small) == 1000
+assert small.id2words(range(4)) == [Vocab.PAD, Vocab.BOS, Vocab.EOS, Vocab.UNK]
+top = sorted(sequential._word2id, key=lambda w: -sequential._id2tf[sequential._word2id[w]])
+assert set(top[4:100]) <= set(small._word2id)
+
+# merge vocabs without changing the other one
+a, b = Vocab(), Vocab()
+a.words2id(['x', 'y', 'y'])
+b.words2id(['y', 'z'])
+a = a + b
+a.freeze(); b.freeze()
+assert a.ids2tf(a.words2id(['x', 'y', 'z'])) == [1, 3, 1]
+assert b.ids2tf(b.words2id(['y', 'z'])) == [1, 1]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import time, numpy
+from bidict import bidict
+from nlptools.text.vocab import Vocab
+
+# benchmark bulk words2id_csr and frozen words2id against the per token lookup of the bidict storage used before WordIndex
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(200000)]
+sentences = [[words[i] for i in numpy.random.zipf(1.3, 20) % len(words)] for _ in range(50000)]
+ntokens = sum(len(s) for s in sentences)
+
+vocab = Vocab()
+start = time.time()
+for s in sentences:
+    [vocab.word2id(t) for t in s]
+print('{:38s} {:.0f} tokens/sec'.format('word2id with update:', ntokens/(time.time()-start)))
+
+vocab_bulk = Vocab()
+start = time.time()
+ids, offsets = vocab_bulk.words2id_csr(sentences)
+print('{:38s} {:.0f} tokens/sec'.format('words2id_csr with update:', ntokens/(time.time()-start)))
+assert vocab_bulk._word2id == vocab._word2id
+assert (vocab_bulk._id2tf[:len(vocab)] == vocab._id2tf[:len(vocab)]).all()
+
+vocab.freeze()
+# sentences after the first 1000 words are looked up in a vocab of only these words, so some tokens are out of vocab
+small = Vocab.load_from_dict(dict(list(vocab._word2id.items())[:1000]))
+small_fast = Vocab.load_from_dict(dict(list(vocab._word2id.items())[:1000]), fast_lookup=True)
+vocab_fast = Vocab.load_from_dict(dict(vocab._word2id.items()), fast_lookup=True)
+
+def baseline(v):
+    # the frozen words2id before WordIndex: bidict storage, and word2id for each token
+    word2id = bidict(v._word2id.items())
+    def old_word2id(word):
+        if word is None: return None
+        if word in word2id:
+            return word2id[word]
+        return v.UNK_ID
+    def old_words2id(tokens):
+        ids = [old_word2id(t) for t in tokens]
+        return numpy.array([i for i in ids if i is not None], 'int')
+    return old_words2id
+
+def timeit(name, f):
+    start = time.time()
+    result = f()
+    print('{:38s} {:.0f} tokens/sec'.format(name, ntokens/(time.time()-start)))
+    return result
+
+for name, v, v_fast in [('', vocab, vocab_fast), ('with oov, ', small, small_fast)]:
+    old_words2id = baseline(v)
+    old = timeit(name + 'bidict words2id:', lambda: [old_words2id(s) for s in sentences])
+    old = [x.tolist() for x in old]
+    new = timeit(name + 'words2id:', lambda: [v.words2id(s) for s in sentences])
+    assert [x.tolist() for x in new] == old
+    new = timeit(name + 'words2id fast_lookup:', lambda: [v_fast.words2id(s) for s in sentences])
+    assert [x.tolist() for x in new] == old
+    for x, y in [(v, 'words2id batch:'), (v_fast, 'words2id batch fast_lookup:')]:
+        new = timeit(name + y, lambda: x.words2id(sentences, batch=True))
+        assert [b.tolist() for b in new] == old
+    ids, offsets = timeit(name + 'words2id_csr:', lambda: v.words2id_csr(sentences))
+    assert all(old[i] == ids[offsets[i]:offsets[i+1]].tolist() for i in range(len(sentences)))
+
+batch = vocab.words2id(sentences[:3] + [[]], batch=True)
+assert [b.tolist() for b in batch] == [vocab.words2id(s).tolist() for s in sentences[:3]] + [[]]
+assert vocab.words2id(['w1', None, 'not a word']).tolist() == [vocab['w1'], vocab.UNK_ID]
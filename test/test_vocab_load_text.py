@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import time
+from nlptools.text.vocab import Vocab
+from nlptools.text.wordindex import WordIndex
+
+# fast loader for word frequency file, compared with parsing line by line
+
+def load_by_line(filename, special_words):
+    word2id, id2tf = {}, []
+    for w in special_words:
+        word2id[w] = len(word2id)
+        id2tf.append(0)
+    with open(filename) as f:
+        for l in f:
+            l = l.split()
+            if len(l) != 2 or l[0] in word2id:
+                continue
+            try:
+                id2tf.append(int(l[1]))
+            except ValueError:
+                continue
+            word2id[l[0]] = len(word2id)
+    return word2id, id2tf
+
+filename = '/tmp/test_vocab_load_text.txt'
+with open(filename, 'w') as f:
+    f.write('词语 10\n<unk> 3\n\nbad line here\nnotf\nword x\n  spaced\t7  \nword 5\nword 9\ncancel 1 2\n3\n')
+    for i in range(20000):
+        f.write('w{}é {}\n'.format(i % 15000, 20000-i))
+    f.write('last 1')
+
+special_words = ['<pad>', '<unk>']
+word2id, id2tf = load_by_line(filename, special_words)
+for chunk_size in [17, 1000, 2**24]:
+    vocab = Vocab.load_from_text(filename, special_words, chunk_size=chunk_size)
+    assert len(vocab._word2id) == len(word2id)
+    assert all(vocab._word2id[w] == i for w, i in word2id.items())
+    assert vocab._id2tf.tolist() == id2tf
+    assert vocab.word2id('spaced') == word2id['spaced']
+
+vocab = Vocab.load_from_text(filename)
+assert vocab.word2id('词语') == 0
+
+# malformed lines with 3 and 1 fields are both skipped, even if the field count of chunk is even
+with open(filename, 'w') as f:
+    f.write('a 1 2\n3\nb 4\n')
+vocab = Vocab.load_from_text(filename, [])
+assert len(vocab) == 1 and vocab.word2id('b') == 0
+
+# benchmark
+N = 2000000
+with open(filename, 'w') as f:
+    f.write(''.join('word{} {}\n'.format(i, N-i) for i in range(N)))
+start = time.time()
+WordIndex(load_by_line(filename, special_words)[0])
+print('line by line: {:.2f} sec'.format(time.time() - start))
+start = time.time()
+vocab = Vocab.load_from_text(filename, special_words)
+print('load_from_text: {:.2f} sec'.format(time.time() - start))
+assert len(vocab) == N + 2 and vocab.word2id('word123') == 125
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import random, time, tracemalloc, pickle, numpy
+from bidict import bidict
+from nlptools.text.wordindex import WordIndex
+from nlptools.text.vocab import Vocab
+
+# memory and lookup speed of WordIndex compared with bidict, which was the previous Vocab storage
+
+random.seed(0)
+chars = 'abcdefghijklmnopqrstuvwxyz的一是在不了有和人这中大为上个国'
+raw = [w.encode('utf-8') for w in {''.join(random.choice(chars) for _ in range(random.randint(2, 10))) for _ in range(1000000)}]
+words = [w.decode('utf-8') for w in raw]
+
+# words are decoded inside the build, so the strings kept by bidict are counted
+def build_bidict():
+    index = bidict()
+    for i, w in enumerate(raw):
+        index[w.decode('utf-8')] = i
+    return index
+
+def build_wordindex():
+    index = WordIndex()
+    for i, w in enumerate(raw):
+        index[w.decode('utf-8')] = i
+    return index
+
+def build_wordindex_batch():
+    return WordIndex.from_words([w.decode('utf-8') for w in raw])
+
+# opt-in dicts of all words, lookups as fast as bidict with about the same memory
+def build_wordindex_fast():
+    index = WordIndex.from_words([w.decode('utf-8') for w in raw])
+    index.set_fast_lookup()
+    return index
+
+# each word looked up once, and words of a zipf distribution like real text
+numpy.random.seed(0)
+zipf = [words[i] for i in (numpy.random.zipf(1.2, len(words)) - 1) % len(words)]
+
+print('{} words'.format(len(words)))
+indexes = []
+ids = list(range(len(words)))
+for name, build in [('bidict', build_bidict), ('WordIndex', build_wordindex), ('WordIndex.from_words', build_wordindex_batch), ('WordIndex fast_lookup', build_wordindex_fast)]:
+    tracemalloc.start()
+    index = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del index
+    start = time.time()
+    index = build()
+    build_time = time.time() - start
+    start = time.time()
+    for w in words:
+        index[w]
+    lookup_time = time.time() - start
+    start = time.time()
+    for w in zipf:
+        index[w]
+    zipf_time = time.time() - start
+    inv = index.inv
+    start = time.time()
+    for i in ids:
+        inv[i]
+    inv_time = time.time() - start
+    indexes.append(index)
+    print('{:22s} memory: {:7.1f} MB, build: {:5.2f} sec, lookup: {:5.2f} sec, zipf lookup: {:5.2f} sec, id lookup: {:5.2f} sec'.format(name, size/1024/1024, build_time, lookup_time, zipf_time, inv_time))
+
+b, w, f = indexes[0], indexes[1], indexes[3]
+assert len(b) == len(w) == len(f)
+assert all(b[x] == w[x] == f[x] for x in words[:10000])
+assert all(b.inv[i] == w.inv[i] == f.inv[i] for i in range(10000))
+assert f.words(range(10)) == words[:10] and f.get_many(words[:10]).tolist() == list(range(10))
+
+# ids of hot words follow changes, and are not pickled
+w = WordIndex.from_words(['a', 'b'])
+assert w['a'] == 0 and w.get('b') == 1 and 'a' in w
+w['a'] = 5
+assert w['a'] == 5 and w.inv[5] == 'a' and 0 not in w.inv
+w = pickle.loads(pickle.dumps(w))
+assert '_hot' not in w.__getstate__() and w['a'] == 5 and w.copy()['b'] == 1
+assert w.get('c') is None and 'c' not in w
+
+# the dicts of fast lookup follow changes, and are rebuilt after pickle and copy
+w = WordIndex.from_words(['a', 'b'])
+w.set_fast_lookup()
+w['a'] = 5
+w['c'] = 7
+w._extend(['d'], [8])
+assert w['a'] == 5 and w.inv[5] == 'a' and 0 not in w.inv and w['c'] == 7 and w.inv.get(8) == 'd'
+for x in [pickle.loads(pickle.dumps(w)), w.copy()]:
+    assert x.fast_lookup and x == w and x.inv[7] == 'c' and x.get('e') is None and 'e' not in x
+w.set_fast_lookup(False)
+assert not w.fast_lookup and w['d'] == 8 and w.inv[1] == 'b'
+
+# Vocab keeps the fast lookup for new and reduced indexes
+v = Vocab(fast_lookup=True)
+v.words2id(['a', 'b', 'c'])
+assert v._word2id.fast_lookup and v['b'] == 5 and v.id2word(6) == 'c'
+v.reduce(6)
+assert v._word2id.fast_lookup and len(v) == 6
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import random, time, os, tempfile
+from nlptools.text.vocab import Vocab
+
+# compare loading time of the pickle cached vocab and the memory mapped binary vocab
+
+random.seed(0)
+chars = 'abcdefghijklmnopqrstuvwxyz的一是在不了有和人这中大为上个国'
+words = [''.join(random.choice(chars) for _ in range(random.randint(2, 10))) for _ in range(1000000)]
+
+tmpdir = tempfile.mkdtemp()
+pkl_path, bin_path = os.path.join(tmpdir, 'vocab.pkl'), os.path.join(tmpdir, 'vocab.bin')
+
+vocab = Vocab(cached_vocab=pkl_path)
+vocab.words2id(words)
+vocab.save()
+Vocab.convert(pkl_path, bin_path)
+
+for path in [pkl_path, bin_path]:
+    start = time.time()
+    loaded = Vocab(cached_vocab=path)
+    print('{}: {} words, {:.1f} MB, load {:.3f} sec'.format(os.path.basename(path), len(loaded), os.path.getsize(path)/1024/1024, time.time()-start))
+
+assert not loaded.update
+assert loaded._word2id == vocab._word2id
+assert (loaded._id2tf == vocab._id2tf).all()
+assert loaded.id2words(loaded.words2id(words[:100])) == words[:100]
+
+# convert back to pickle
+Vocab.convert(bin_path, pkl_path, binary=False)
+assert Vocab(cached_vocab=pkl_path)._word2id == vocab._word2id
+
+# binary vocab is copied when update is enabled
+loaded.setupdate(True)
+new_id = loaded.word2id('a new word')
+assert loaded.id2word(new_id) == 'a new word'
+assert 'a new word' not in Vocab(cached_vocab=bin_path)
+
+# a memory mapped vocab saved to its own file
+mapped = Vocab(cached_vocab=bin_path)
+mapped.save(binary=True)
+assert Vocab(cached_vocab=bin_path)._word2id == vocab._word2id
+mapped.save()
+assert Vocab(cached_vocab=bin_path)._word2id == vocab._word2id
+assert not [f for f in os.listdir(tmpdir) if f.startswith('vocab.bin.')]
+Vocab.convert(pkl_path, bin_path)
+
+# truncated or broken binary vocab
+with open(bin_path, 'rb') as f:
+    data = f.read()
+for broken in [data[:4096], data[:len(data)//2], data[:40], data[:8] + b'\xff' * 200]:
+    with open(bin_path, 'wb') as f:
+        f.write(broken)
+    try:
+        Vocab(cached_vocab=bin_path)
+        assert False
+    except ValueError as err:
+        print(err)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import time, numpy
+from nlptools.text.vocab import Vocab
+from nlptools.text.tfidf import TFIDF
+
+# vectorized reduce, and re-index encoded corpus and tfidf index with the returned remap
+
+numpy.random.seed(0)
+words = ['w{}'.format(i) for i in range(500000)]
+corpus = [[words[i] for i in numpy.random.zipf(1.2, 20) % len(words)] for _ in range(20000)]
+
+vocab = Vocab()
+corpus_ids = [vocab.words2id(s) for s in corpus]
+print('{} words before reduce'.format(len(vocab)))
+
+tfidf = TFIDF(vocab_size=vocab.vocab_size)
+tfidf.load_index(corpus_ids)
+
+start = time.time()
+remap = vocab.reduce(10000)
+print('reduce to {} words: {:.3f} sec'.format(len(vocab), time.time()-start))
+
+new_corpus_ids = [remap[ids] for ids in corpus_ids]
+for s, ids in zip(corpus[:1000], new_corpus_ids):
+    assert vocab.id2words(ids[ids >= 0]) == [w for w in s if w in vocab]
+
+# re-index tfidf and compare with the index rebuilt from the re-encoded corpus
+tfidf.reindex(remap, vocab.vocab_size)
+rebuilt = TFIDF(vocab_size=vocab.vocab_size)
+count_matrix, word_idfs = rebuilt.load_index([ids[ids >= 0] for ids in new_corpus_ids], local_use=True)
+assert (tfidf.count_matrix != count_matrix).nnz == 0
+assert numpy.allclose(tfidf.word_idfs, word_idfs)
+print(tfidf.search(vocab.words2id(corpus[0]), topN=3))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import time, numpy
+from nlptools.text.vocab import Vocab
+from nlptools.text.embedding import Embedding_Random
+
+# cached vector matrix for ids2vec, compared with fetching vectors from embedding
+
+numpy.random.seed(0)
+embedding = Embedding_Random(dim=100)
+words = ['w{}'.format(i) for i in range(50000)]
+
+vocab = Vocab(embedding=embedding)
+cached = Vocab(embedding=embedding, cache_vectors=True)
+vocab.words2id(words)
+cached.words2id(words)
+sentences = [numpy.random.randint(4, len(vocab), 30) for _ in range(10000)]
+
+start = time.time()
+old = [vocab.ids2vec(s) for s in sentences]
+print('ids2vec from embedding: {:.3f} sec'.format(time.time()-start))
+
+start = time.time()
+new = [cached.ids2vec(s) for s in sentences]
+print('ids2vec from cached matrix: {:.3f} sec'.format(time.time()-start))
+assert all(numpy.allclose(o, n, atol=1e-6) for o, n in zip(old, new))
+
+# matrix grows with vocab and is rebuilt after reduce
+new_id = cached.word2id('a new word')
+assert numpy.allclose(cached.ids2vec([new_id])[0], embedding['a new word'], atol=1e-6)
+remap = cached.reduce(1000)
+ids = numpy.arange(4, 1000)
+assert numpy.allclose(cached.ids2vec(ids), vocab.ids2vec(vocab.words2id(cached.id2words(ids))), atol=1e-6)
+
+dense = cached.dense_vectors()
+assert dense.shape == (1000, 100) and not dense[0].any()
+assert numpy.allclose(dense[ids], cached.ids2vec(ids), atol=1e-6)
+print(cached.ave_vec(ids[:10])[:5])